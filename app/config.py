@@ -2,8 +2,55 @@ import os
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-STORAGE_DIR = os.path.join(BASE_DIR, "storage")
-DATABASE_PATH = os.path.join(BASE_DIR, "birds.db")
+STORAGE_DIR = os.environ.get("STORAGE_DIR", os.path.join(BASE_DIR, "storage"))
+DATABASE_PATH = os.environ.get("DATABASE_PATH", os.path.join(BASE_DIR, "birds.db"))
+
+# SQLite connections (one per thread, kept open)
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))  # How long a writer waits for the lock
+DB_CACHE_MB = int(os.environ.get("DB_CACHE_MB", 32))                  # Page cache per connection
+
+# BirdNET inference worker processes (each holds its own copy of the model)
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", 32))       # 3s chunks per model invocation
+INFERENCE_MAX_WAIT_MS = int(os.environ.get("INFERENCE_MAX_WAIT_MS", 50))     # How long a chunk waits for batch-mates
+
+# Spectrogram images: "fast" (NumPy + Pillow) or "publication" (matplotlib, 300 DPI)
+SPECTROGRAM_RENDER_MODE = os.environ.get("SPECTROGRAM_RENDER_MODE", "fast")
+SPECTROGRAM_FORMAT = os.environ.get("SPECTROGRAM_FORMAT", "png")  # png | webp
+
+# Spectrograms are rendered on first request into a size-bounded LRU disk cache
+RENDER_CACHE_DIR = os.path.join(STORAGE_DIR, "cache")
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+# Spectrogram render worker processes, the longest a single render may take and how long it may wait for one
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", 60))  # Seconds
+RENDER_QUEUE_TIMEOUT = float(os.environ.get("RENDER_QUEUE_TIMEOUT", 30))  # Seconds to wait for a free worker
+
+# Single database writer: queued writes are committed together, up to this many rows per
+# transaction or whatever arrived within the wait of the oldest one
+DB_WRITE_MAX_ROWS = int(os.environ.get("DB_WRITE_MAX_ROWS", 5000))
+DB_WRITE_MAX_WAIT_MS = int(os.environ.get("DB_WRITE_MAX_WAIT_MS", 10))
+
+# Upload job queue
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", INFERENCE_WORKERS))  # Uploads processed concurrently
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 100))  # Pending uploads before we answer 503
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 500))        # Finished jobs kept for /api/jobs
+
+# Exports stream rows from the database in chunks of this many (also the Parquet row group size)
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 10000))
+
+# Cached dashboard responses (/api/analytics/*, /api/species-summary), one per route and query
+RESPONSE_CACHE_ENTRIES = int(os.environ.get("RESPONSE_CACHE_ENTRIES", 256))
+
+# Cold tier: `python -m app.services.archive` moves whole months of detections older than
+# this many days from SQLite into Parquet partitions under ARCHIVE_DIR
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 365))
+
+# Recent traces kept in memory for /api/debug/traces
+TRACE_HISTORY = int(os.environ.get("TRACE_HISTORY", 200))
 
 # Ensure storage directory exists
 os.makedirs(STORAGE_DIR, exist_ok=True)
+os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
@@ -1,12 +1,120 @@
+import math
 import sqlite3
-from .config import DATABASE_PATH
+import threading
+from datetime import datetime, timezone
+from typing import Optional, List, Tuple, Callable
+from .config import DATABASE_PATH, DB_BUSY_TIMEOUT_MS, DB_CACHE_MB
 
-def init_db():
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
-    
-    # Detections table
-    c.execute(
+# Applied to every new connection. WAL lets dashboard reads run while an upload writes;
+# NORMAL sync is durable across app crashes and only risks the last commit on power loss.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size = -{DB_CACHE_MB * 1024}",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Compiled statements kept per connection; every query in the app fits comfortably
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def distance_km(lat1: Optional[float], lon1: Optional[float], lat2: Optional[float], lon2: Optional[float]) -> Optional[float]:
+    """
+    Great-circle (haversine) distance between two points. Registered on every connection
+    as SQL distance_km(), since SQLite builds without math functions lack sin/cos/asin.
+    """
+    if lat1 is None or lon1 is None or lat2 is None or lon2 is None:
+        return None
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A long-lived per-thread connection. close() hands it back for the thread's next
+    caller instead of closing it, rolling back anything left uncommitted.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        super().close()
+
+
+def _connect(check_same_thread: bool = True) -> PooledConnection:
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=check_same_thread,
+        factory=PooledConnection,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.create_function("distance_km", 4, distance_km, deterministic=True)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_db_connection() -> PooledConnection:
+    """This thread's connection, opened (and tuned) on first use and reused afterwards."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
+    return conn
+
+
+def open_stream_connection() -> PooledConnection:
+    """
+    A private connection for one long read, such as a streamed response, whose rows may be
+    fetched from a different threadpool thread each time. The caller must dispose() it.
+    """
+    return _connect(check_same_thread=False)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Read a stored timestamp, with or without microseconds or a 'T' separator."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def to_epoch_ms(dt: Optional[datetime]) -> Optional[int]:
+    """
+    Integer milliseconds for ts_ms. Recording times are naive device-local wall clock, so
+    they are encoded as if UTC: SQLite's 'unixepoch' then gives back the same wall-clock hour.
+    """
+    if dt is None:
+        return None
+    return int(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    """Inverse of to_epoch_ms: the naive wall-clock time."""
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate_initial_schema(conn: sqlite3.Connection) -> None:
+    """The detections and species tables as they existed before migrations were versioned."""
+    conn.execute(
         """CREATE TABLE IF NOT EXISTS detections 
                  (id INTEGER PRIMARY KEY, 
                   timestamp TEXT, 
@@ -20,15 +128,15 @@ def init_db():
                   single_image_url TEXT,
                   bird_photo_url TEXT)"""
     )
-    
-    # Add column if it doesn't exist (for existing databases)
-    try:
-        c.execute("ALTER TABLE detections ADD COLUMN bird_photo_url TEXT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
+
+    # Older databases predate these columns
+    existing = _columns(conn, "detections")
+    for column, column_type in (("bird_photo_url", "TEXT"), ("start_time", "REAL"), ("end_time", "REAL")):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE detections ADD COLUMN {column} {column_type}")
+
     # Species cache table - stores bird info fetched from Wikipedia
-    c.execute(
+    conn.execute(
         """CREATE TABLE IF NOT EXISTS species
                  (id INTEGER PRIMARY KEY,
                   name TEXT UNIQUE,
@@ -40,11 +148,220 @@ def init_db():
                   conservation_status TEXT,
                   created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
     )
-        
-    conn.commit()
-    conn.close()
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+
+def _migrate_epoch_timestamps(conn: sqlite3.Connection) -> None:
+    """Add ts_ms (integer epoch milliseconds) and backfill it from the free-form timestamp text."""
+    conn.execute("ALTER TABLE detections ADD COLUMN ts_ms INTEGER")
+    rows = conn.execute("SELECT id, timestamp FROM detections").fetchall()
+    conn.executemany(
+        "UPDATE detections SET ts_ms = ? WHERE id = ?",
+        [(to_epoch_ms(parse_timestamp(row["timestamp"])), row["id"]) for row in rows],
+    )
+
+
+def _migrate_detection_indexes(conn: sqlite3.Connection) -> None:
+    """Indexes for time ranges, per-species timelines and loading one session's detections."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts_ms)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detections_species_ts ON detections (species, ts_ms)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detections_audio_url ON detections (audio_url)")
+
+
+def _migrate_sessions(conn: sqlite3.Connection) -> None:
+    """Add the sessions table, link detections to it and backfill one session per recording."""
+    conn.execute(
+        """CREATE TABLE sessions
+                 (id TEXT PRIMARY KEY,
+                  device TEXT,
+                  recorded_at TEXT,
+                  recorded_at_ms INTEGER,
+                  lat REAL,
+                  lon REAL,
+                  duration REAL,
+                  audio_url TEXT,
+                  image_url TEXT,
+                  status TEXT NOT NULL DEFAULT 'queued',
+                  created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+    )
+    conn.execute("CREATE INDEX idx_sessions_recorded ON sessions (recorded_at_ms, id)")
+    conn.execute("ALTER TABLE detections ADD COLUMN session_id TEXT REFERENCES sessions (id)")
+    conn.execute("CREATE INDEX idx_detections_session ON detections (session_id, id)")
+
+    # Until now a session only existed as the audio_url its detections share.
+    # Each detection is recording start + its offset, so the start is the smallest difference.
+    rows = conn.execute(
+        """SELECT audio_url, MIN(image_url) AS image_url, MIN(lat) AS lat, MIN(lon) AS lon,
+                  COALESCE(MIN(ts_ms - CAST(COALESCE(start_time, 0) * 1000 AS INTEGER)), 0) AS recorded_at_ms
+           FROM detections WHERE audio_url LIKE '/storage/%.wav' GROUP BY audio_url"""
+    ).fetchall()
+    for row in rows:
+        session_id = row["audio_url"][len("/storage/"):-len(".wav")]
+        recorded_at = from_epoch_ms(row["recorded_at_ms"]) if row["recorded_at_ms"] else None
+        conn.execute(
+            """INSERT INTO sessions (id, recorded_at, recorded_at_ms, lat, lon, audio_url, image_url, status)
+               VALUES (?, ?, ?, ?, ?, ?, ?, 'done')""",
+            (session_id, str(recorded_at) if recorded_at else None, row["recorded_at_ms"],
+             row["lat"], row["lon"], row["audio_url"], row["image_url"]),
+        )
+        conn.execute("UPDATE detections SET session_id = ? WHERE audio_url = ?", (session_id, row["audio_url"]))
+
+
+def _migrate_rollups(conn: sqlite3.Connection) -> None:
+    """Add the analytics rollup tables and fill them from the existing detections."""
+    from .services import rollups
+
+    rollups.create_tables(conn)
+    rollups.apply(conn, "1")
+
+
+def _migrate_spatial_index(conn: sqlite3.Connection) -> None:
+    """Add an R*Tree over detection coordinates, kept in step with detections by triggers."""
+    conn.execute("CREATE VIRTUAL TABLE detections_rtree USING rtree (id, min_lat, max_lat, min_lon, max_lon)")
+    # Points are stored as zero-size boxes; rows without a location stay out of the index
+    conn.execute(
+        """CREATE TRIGGER detections_rtree_insert AFTER INSERT ON detections
+           WHEN NEW.lat IS NOT NULL AND NEW.lon IS NOT NULL
+           BEGIN
+               INSERT INTO detections_rtree VALUES (NEW.id, NEW.lat, NEW.lat, NEW.lon, NEW.lon);
+           END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER detections_rtree_update AFTER UPDATE OF lat, lon ON detections
+           BEGIN
+               DELETE FROM detections_rtree WHERE id = OLD.id;
+               INSERT INTO detections_rtree SELECT NEW.id, NEW.lat, NEW.lat, NEW.lon, NEW.lon
+                   WHERE NEW.lat IS NOT NULL AND NEW.lon IS NOT NULL;
+           END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER detections_rtree_delete AFTER DELETE ON detections
+           BEGIN
+               DELETE FROM detections_rtree WHERE id = OLD.id;
+           END"""
+    )
+    conn.execute(
+        """INSERT INTO detections_rtree
+           SELECT id, lat, lat, lon, lon FROM detections WHERE lat IS NOT NULL AND lon IS NOT NULL"""
+    )
+
+
+def _migrate_species_search(conn: sqlite3.Connection) -> None:
+    """Add the FTS5 species search index and fill it from the species cache."""
+    from .services import species_search
+
+    species_search.create_index(conn)
+    species_search.index_all(conn)
+
+
+def _migrate_archive(conn: sqlite3.Connection) -> None:
+    """Add the list of archived Parquet partitions."""
+    conn.execute(
+        """CREATE TABLE archive_partitions
+                 (path TEXT PRIMARY KEY,
+                  month TEXT NOT NULL,
+                  rows INTEGER NOT NULL,
+                  min_ts_ms INTEGER NOT NULL,
+                  max_ts_ms INTEGER NOT NULL,
+                  created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+    )
+
+
+def _migrate_monotonic_ids(conn: sqlite3.Connection) -> None:
+    """Rebuild detections with AUTOINCREMENT so ids freed by archiving are never handed out again."""
+    # Plain INTEGER PRIMARY KEY reuses MAX(id) + 1, so archiving the newest rows of a month
+    # would give their ids to new detections and `since` pollers would skip those
+    dependents = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'detections' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    ).fetchall()
+    conn.execute(
+        """CREATE TABLE detections_new
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  timestamp TEXT,
+                  lat REAL,
+                  lon REAL,
+                  species TEXT,
+                  confidence REAL,
+                  audio_url TEXT,
+                  single_audio_url TEXT,
+                  image_url TEXT,
+                  single_image_url TEXT,
+                  bird_photo_url TEXT,
+                  start_time REAL,
+                  end_time REAL,
+                  ts_ms INTEGER,
+                  session_id TEXT REFERENCES sessions (id))"""
+    )
+    columns = ", ".join(_columns(conn, "detections"))
+    conn.execute(f"INSERT INTO detections_new ({columns}) SELECT {columns} FROM detections")
+    conn.execute("DROP TABLE detections")
+    conn.execute("ALTER TABLE detections_new RENAME TO detections")
+    for row in dependents:
+        conn.execute(row[0])
+
+    # Start above every id ever issued, including those already moved to the archive
+    high_water = conn.execute("SELECT COALESCE(MAX(id), 0) FROM detections").fetchone()[0]
+    if conn.execute("SELECT 1 FROM archive_partitions LIMIT 1").fetchone():
+        from .services import archive
+
+        high_water = max(high_water, archive.max_archived_id(conn))
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'detections'")
+    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('detections', ?)", (high_water,))
+
+
+def _migrate_species_search_triggers(conn: sqlite3.Connection) -> None:
+    """Keep the species search index in step with the species table through triggers."""
+    from .services import species_search
+
+    species_search.create_index(conn)
+    # Writers that bypassed save_species_info (e.g. the backfill script) left it stale
+    conn.execute("DELETE FROM species_fts")
+    species_search.index_all(conn)
+
+
+def _migrate_response_cache_version(conn: sqlite3.Connection) -> None:
+    """Add a shared version that lets offline jobs invalidate a running server's cached responses."""
+    conn.execute(
+        """CREATE TABLE response_cache_version (
+               id INTEGER PRIMARY KEY CHECK (id = 1),
+               version INTEGER NOT NULL)"""
+    )
+    conn.execute("INSERT INTO response_cache_version (id, version) VALUES (1, 0)")
+
+
+# Applied in order; PRAGMA user_version records the last one that ran. Append only.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migrate_initial_schema),
+    (2, _migrate_epoch_timestamps),
+    (3, _migrate_detection_indexes),
+    (4, _migrate_sessions),
+    (5, _migrate_rollups),
+    (6, _migrate_spatial_index),
+    (7, _migrate_species_search),
+    (8, _migrate_archive),
+    (9, _migrate_monotonic_ids),
+    (10, _migrate_species_search_triggers),
+    (11, _migrate_response_cache_version),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """Bring the schema up to date, each migration in its own transaction."""
+    current = schema_version(conn)
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        with conn:
+            conn.execute("BEGIN")  # DDL does not open a transaction implicitly
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        print(f"🗄️ Applied migration {version}: {migration.__doc__.splitlines()[0]}")
+    if current < MIGRATIONS[-1][0]:
+        conn.execute("ANALYZE")
+
+
+def init_db():
+    migrate(get_db_connection())
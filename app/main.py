@@ -1,13 +1,48 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+import time
 
-from .config import STORAGE_DIR
 from .database import init_db
-from .routers import upload, detections, analytics, species
+from .routers import upload, detections, analytics, species, jobs, media, sessions, metrics, debug
+from .services.jobs import upload_jobs, recover_jobs
+from .services import analyzer, render_pool
+from .services.inference_scheduler import scheduler
+from .services.db_writer import db_writer
+from .services.metrics import HTTP_REQUEST_SECONDS, CACHE_REQUESTS_TOTAL
+from .services.response_cache import response_cache, CachedResponse, is_cacheable, cache_key, etag_matches
 
 app = FastAPI(title="Bird Classification API", version="1.0.0")
 
+
+# Registered before CORS so cached responses and 304s still get CORS headers
+@app.middleware("http")
+async def cache_responses(request: Request, call_next):
+    if not is_cacheable(request.method, request.url.path):
+        return await call_next(request)
+
+    key = cache_key(request.url.path, request.query_params.multi_items())
+    entry = response_cache.get(key)
+    if entry is None:
+        version = response_cache.version  # Read first: a bump during the call discards the result
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = CachedResponse(version, body, response.headers.get("content-type"), request.scope.get("route"))
+        response_cache.put(key, entry)
+        CACHE_REQUESTS_TOTAL.inc(cache="response", result="miss")
+    else:
+        request.scope["route"] = entry.route
+        CACHE_REQUESTS_TOTAL.inc(cache="response", result="hit")
+
+    # no-cache: browsers keep the copy but revalidate it with If-None-Match on every poll
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    if entry.content_type:
+        headers["Content-Type"] = entry.content_type
+    return Response(entry.body, headers=headers)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -17,19 +52,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
-app.mount("/storage", StaticFiles(directory=STORAGE_DIR), name="storage")
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/api/jobs/{job_id}), not the raw path, to keep series bounded
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
 
 # Include routers
 app.include_router(upload.router)
 app.include_router(detections.router)
 app.include_router(analytics.router)
 app.include_router(species.router)
+app.include_router(jobs.router)
+app.include_router(sessions.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
+app.include_router(media.router)  # /storage: stored files plus on-demand spectrograms
 
 # Initialize database on startup
 @app.on_event("startup")
 def startup_event():
     init_db()
     print("🗄️ Database initialized.")
+    analyzer.start_workers()
+    scheduler.start()
+    db_writer.start()
+    upload_jobs.start()
+    print(f"🧵 Upload workers started ({upload_jobs.workers}), {recover_jobs()} interrupted uploads re-queued.")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    upload_jobs.stop()
+    db_writer.stop()  # After the workers, so their last inserts are committed
+    scheduler.stop()
+    analyzer.stop_workers()
+    render_pool.stop_workers()
 
 
@@ -1,11 +1,96 @@
-from fastapi import APIRouter
-from collections import Counter
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Query
+from contextlib import contextmanager
+from typing import Optional, List, Tuple, Iterator
+import sqlite3
 
 from ..database import get_db_connection
+from ..services import archive
+from ..services.detections import DetectionFilter
+from ..services.rollups import HOUR_MS, CONFIDENCE_BINS, CONFIDENCE_BIN_SQL
+from .filters import time_bound
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
+# Trend bucket labels computed in SQL from t_ms (wall-clock ms, see to_epoch_ms).
+# Weeks are labelled by their Monday: step back 6 days, then forward to the next Monday.
+PERIOD_BUCKETS = {
+    "hour": "strftime('%Y-%m-%d %H:00', t_ms / 1000, 'unixepoch')",
+    "day": "strftime('%Y-%m-%d', t_ms / 1000, 'unixepoch')",
+    "week": "date(t_ms / 1000, 'unixepoch', '-6 days', 'weekday 1')",
+    "month": "strftime('%Y-%m', t_ms / 1000, 'unixepoch')",
+}
+
+
+def _window(from_ms: Optional[int], to_ms: Optional[int]) -> Tuple[List[str], list, List[Tuple[int, int]]]:
+    """
+    Split [from, to) into the whole hours the rollups can answer and the partial hours at
+    either end, which have to come from detections. Returns (rollup conditions, params,
+    [start, end) ranges of detections); there are no ranges without sub-hour bounds.
+    """
+    lo = -(-from_ms // HOUR_MS) * HOUR_MS if from_ms is not None else None  # Round up
+    hi = to_ms // HOUR_MS * HOUR_MS if to_ms is not None else None          # Round down
+    if lo is not None and hi is not None and lo >= hi:
+        # No whole hour inside the window
+        return ["0"], [], [(from_ms, to_ms)]
+
+    rollup, rollup_params, edges = [], [], []
+    if lo is not None:
+        rollup.append("hour_ms >= ?")
+        rollup_params.append(lo)
+        if from_ms < lo:
+            edges.append((from_ms, lo))
+    if hi is not None:
+        rollup.append("hour_ms < ?")
+        rollup_params.append(hi)
+        if hi < to_ms:
+            edges.append((hi, to_ms))
+    return rollup or ["1"], rollup_params, edges
+
+
+@contextmanager
+def _facts(
+    conn: sqlite3.Connection,
+    from_: Optional[str],
+    to: Optional[str],
+    species: Optional[List[str]],
+    confidence: bool = False,
+) -> Iterator[Tuple[str, list]]:
+    """
+    A subquery of (t_ms, species[, bin], detections) rows covering the filters, to be
+    grouped by the caller on `conn` inside the block: hourly rollup rows plus single
+    detections in partial hours, from SQLite and, for archived months, from their Parquet
+    partitions (loaded into a temp table that is dropped when the block exits).
+    """
+    rollup, rollup_params, edges = _window(time_bound(from_, "from"), time_bound(to, "to"))
+    raw = [f"({' OR '.join('(ts_ms >= ? AND ts_ms < ?)' for _ in edges)})" if edges else "0"]
+    raw_params = [bound for edge in edges for bound in edge]
+    if species:
+        condition = f"species IN ({', '.join('?' * len(species))})"
+        rollup, rollup_params = rollup + [condition], rollup_params + species
+        raw, raw_params = raw + [condition], raw_params + species
+
+    table = "rollup_confidence_hourly" if confidence else "rollup_species_hourly"
+    rollup_bin = ", bin" if confidence else ""
+    raw_bin = f", {CONFIDENCE_BIN_SQL} AS bin" if confidence else ""
+    sql = f"""SELECT hour_ms AS t_ms, species{rollup_bin}, detections FROM {table} WHERE {' AND '.join(rollup)}
+              UNION ALL
+              SELECT ts_ms AS t_ms, species{raw_bin}, 1 AS detections FROM detections WHERE {' AND '.join(raw)}"""
+
+    # The rollups still count archived rows; only partial hours in archived months need a scan
+    columns = ["ts_ms", "species", "confidence"]
+    cold = [
+        stream
+        for start_ms, end_ms in edges
+        for stream in archive.iter_cold(conn, DetectionFilter(species=species, start_ms=start_ms, end_ms=end_ms), columns)
+    ]
+    if not cold:
+        yield sql, rollup_params + raw_params
+        return
+    with archive.temp_table(conn, "archived", cold, columns):
+        yield sql + f"""
+              UNION ALL
+              SELECT ts_ms AS t_ms, species{raw_bin}, 1 AS detections FROM temp.archived""", rollup_params + raw_params
+
 
 @router.get("/summary")
 def get_summary():
@@ -13,20 +98,14 @@ def get_summary():
     conn = get_db_connection()
     c = conn.cursor()
     
-    # Total detections
-    c.execute("SELECT COUNT(*) FROM detections")
-    total_detections = c.fetchone()[0]
-    
-    # Unique species
-    c.execute("SELECT COUNT(DISTINCT species) FROM detections")
-    unique_species = c.fetchone()[0]
-    
-    # Average confidence
-    c.execute("SELECT AVG(confidence) FROM detections")
-    avg_confidence = c.fetchone()[0] or 0
+    # Totals, unique species and average confidence from the per-species rollup
+    c.execute("SELECT TOTAL(detections), COUNT(*), TOTAL(confidence_sum) FROM rollup_species")
+    total_detections, unique_species, confidence_sum = c.fetchone()
+    total_detections = int(total_detections)
+    avg_confidence = confidence_sum / total_detections if total_detections else 0
     
     # Most recent detection
-    c.execute("SELECT timestamp, species FROM detections ORDER BY timestamp DESC LIMIT 1")
+    c.execute("SELECT timestamp, species FROM detections ORDER BY ts_ms DESC LIMIT 1")
     recent = c.fetchone()
     
     conn.close()
@@ -48,7 +127,7 @@ def get_species_distribution():
     conn = get_db_connection()
     c = conn.cursor()
     
-    c.execute("SELECT species, COUNT(*) as count FROM detections GROUP BY species ORDER BY count DESC")
+    c.execute("SELECT species, detections FROM rollup_species ORDER BY detections DESC")
     rows = c.fetchall()
     conn.close()
     
@@ -56,119 +135,64 @@ def get_species_distribution():
 
 
 @router.get("/trends")
-def get_trends(period: str = "day"):
-    """Get detection trends over time for line/bar charts."""
+def get_trends(
+    period: str = "day",
+    from_: Optional[str] = Query(None, alias="from", description="Inclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    to: Optional[str] = Query(None, description="Exclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    species: Optional[List[str]] = Query(None),
+):
+    """Get detection trends over time for line/bar charts (period: hour, day, week or month)."""
+    bucket = PERIOD_BUCKETS.get(period, PERIOD_BUCKETS["day"])
+
     conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Get all detections with timestamps
-    c.execute("SELECT timestamp, species FROM detections ORDER BY timestamp")
-    rows = c.fetchall()
+    with _facts(conn, from_, to, species) as (facts, params):
+        rows = conn.execute(
+            f"""SELECT {bucket} AS date, species, SUM(detections)
+                FROM ({facts}) GROUP BY date, species ORDER BY date""",
+            params,
+        ).fetchall()
     conn.close()
-    
-    # Group by period
+
+    # One row per period and species; nest the species counts under each period
     trends = {}
-    for row in rows:
-        try:
-            dt = datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-        except:
-            try:
-                dt = datetime.fromisoformat(row[0])
-            except:
-                continue
-        
-        if period == "day":
-            key = dt.strftime("%Y-%m-%d")
-        elif period == "week":
-            # Get the Monday of the week
-            week_start = dt - timedelta(days=dt.weekday())
-            key = week_start.strftime("%Y-%m-%d")
-        elif period == "month":
-            key = dt.strftime("%Y-%m")
-        elif period == "hour":
-            key = dt.strftime("%Y-%m-%d %H:00")
-        else:
-            key = dt.strftime("%Y-%m-%d")
-        
-        if key not in trends:
-            trends[key] = {"date": key, "count": 0, "species": {}}
-        trends[key]["count"] += 1
-        
-        species = row[1]
-        if species not in trends[key]["species"]:
-            trends[key]["species"][species] = 0
-        trends[key]["species"][species] += 1
-    
-    # Convert to list and sort
-    result = sorted(trends.values(), key=lambda x: x["date"])
-    return result
+    for date, name, count in rows:
+        trend = trends.setdefault(date, {"date": date, "count": 0, "species": {}})
+        trend["count"] += count
+        trend["species"][name] = count
+    return list(trends.values())
 
 
 @router.get("/hourly-activity")
-def get_hourly_activity():
+def get_hourly_activity(
+    from_: Optional[str] = Query(None, alias="from", description="Inclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    to: Optional[str] = Query(None, description="Exclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    species: Optional[List[str]] = Query(None),
+):
     """Get detection activity by hour of day."""
     conn = get_db_connection()
-    c = conn.cursor()
-    
-    c.execute("SELECT timestamp FROM detections")
-    rows = c.fetchall()
+    with _facts(conn, from_, to, species) as (facts, params):
+        hours = dict(conn.execute(
+            f"""SELECT (t_ms / {HOUR_MS}) % 24 AS hour, SUM(detections)
+                FROM ({facts}) GROUP BY hour""",
+            params,
+        ).fetchall())
     conn.close()
-    
-    hours = Counter()
-    for row in rows:
-        try:
-            dt = datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-        except:
-            try:
-                dt = datetime.fromisoformat(row[0])
-            except:
-                continue
-        hours[dt.hour] += 1
-    
+
     # Fill in missing hours with 0
-    result = []
-    for h in range(24):
-        result.append({
-            "hour": f"{h:02d}:00",
-            "count": hours.get(h, 0)
-        })
-    
-    return result
+    return [{"hour": f"{h:02d}:00", "count": hours.get(h, 0)} for h in range(24)]
 
 
 @router.get("/confidence-distribution")
-def get_confidence_distribution():
+def get_confidence_distribution(
+    from_: Optional[str] = Query(None, alias="from", description="Inclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    to: Optional[str] = Query(None, description="Exclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    species: Optional[List[str]] = Query(None),
+):
     """Get distribution of confidence scores."""
     conn = get_db_connection()
-    c = conn.cursor()
-    
-    c.execute("SELECT confidence FROM detections")
-    rows = c.fetchall()
+    with _facts(conn, from_, to, species, confidence=True) as (facts, params):
+        counts = dict(conn.execute(f"SELECT bin, SUM(detections) FROM ({facts}) GROUP BY bin", params).fetchall())
     conn.close()
-    
-    # Create buckets: 70-75, 75-80, 80-85, 85-90, 90-95, 95-100
-    buckets = {
-        "70-75%": 0,
-        "75-80%": 0,
-        "80-85%": 0,
-        "85-90%": 0,
-        "90-95%": 0,
-        "95-100%": 0
-    }
-    
-    for row in rows:
-        conf = row[0] * 100
-        if conf < 75:
-            buckets["70-75%"] += 1
-        elif conf < 80:
-            buckets["75-80%"] += 1
-        elif conf < 85:
-            buckets["80-85%"] += 1
-        elif conf < 90:
-            buckets["85-90%"] += 1
-        elif conf < 95:
-            buckets["90-95%"] += 1
-        else:
-            buckets["95-100%"] += 1
-    
-    return [{"range": k, "count": v} for k, v in buckets.items()]
+
+    # Buckets: 70-75, 75-80, 80-85, 85-90, 90-95, 95-100
+    return [{"range": label, "count": counts.get(i, 0)} for i, (label, _) in enumerate(CONFIDENCE_BINS)]
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Dict, Any, Optional
+
+from ..services.tracing import traces
+
+router = APIRouter(prefix="/api/debug", tags=["debug"])
+
+
+@router.get("/traces")
+def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    name: Optional[str] = None,
+    min_duration_ms: float = 0,
+) -> List[Dict[str, Any]]:
+    """Recent traces, newest first, optionally only those named `name` (upload, render ...) or slower than min_duration_ms."""
+    results = []
+    for trace in traces.recent():
+        summary = trace.to_dict(spans=False)
+        if name and not summary["name"].startswith(name):
+            continue
+        if min_duration_ms and (summary["duration_ms"] or 0) < min_duration_ms:
+            continue
+        results.append(summary)
+        if len(results) >= limit:
+            break
+    return results
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(trace_id: str) -> Dict[str, Any]:
+    """One trace as a waterfall: spans ordered by start with offsets, durations, nesting depth and thread."""
+    trace = traces.get(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail=f"Trace '{trace_id}' not found")
+    return trace.to_dict()
@@ -1,31 +1,126 @@
-from fastapi import APIRouter
-from fastapi.responses import FileResponse
-import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional, List
+from datetime import datetime
 
-from ..database import get_db_connection, DATABASE_PATH
+from ..services.detections import (
+    DetectionFilter, MAX_HEATMAP_ZOOM, list_detections, heatmap, decode_cursor, parse_bbox, parse_near,
+)
+from ..services.export import FORMATS, EXPORTERS, negotiate_format
+from .filters import time_bound
 
 router = APIRouter()
 
-@router.get("/api/detections")
-def get_detections():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT * FROM detections ORDER BY timestamp DESC")
-    rows = c.fetchall()
-    conn.close()
-    
-    # Convert to list of dicts
-    detections = [dict(row) for row in rows]
-    return detections
+# Served a bare list of rows before paging existed; clients that need the cursors use /api/v2
+LEGACY_DETECTIONS_PATH = "/api/detections"
+
+
+@router.get("/api/v2/detections")
+@router.get(LEGACY_DETECTIONS_PATH, deprecated=True)
+def get_detections(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    since: Optional[int] = Query(None, ge=0, description="latest_id from the previous poll; returns only newer rows"),
+    species: Optional[List[str]] = Query(None),
+    from_: Optional[str] = Query(None, alias="from", description="Inclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    to: Optional[str] = Query(None, description="Exclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    session_id: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Centre of a radius search"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Centre of a radius search"),
+    radius_km: Optional[float] = Query(None, gt=0),
+):
+    """
+    Detections newest first, one page at a time, or only those added since the last poll.
+    The unversioned route returns just the page's rows, as a list.
+    """
+    filters = DetectionFilter(
+        species=species,
+        start_ms=time_bound(from_, "from"),
+        end_ms=time_bound(to, "to"),
+        min_confidence=min_confidence,
+        session_id=session_id,
+        bbox=_bbox(bbox),
+    )
+    try:
+        filters.near = parse_near(lat, lon, radius_km)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    page = list_detections(filters, limit, cursor=position, since=since)
+    if request.scope["route"].path == LEGACY_DETECTIONS_PATH:
+        return page["detections"]
+    return page
+
+
+@router.get("/api/detections/heatmap")
+def get_heatmap(
+    zoom: int = Query(..., ge=0, le=MAX_HEATMAP_ZOOM, description="Grid cells are 360 / 2^zoom degrees"),
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat; the visible map area"),
+    species: Optional[List[str]] = Query(None),
+    from_: Optional[str] = Query(None, alias="from", description="Inclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    to: Optional[str] = Query(None, description="Exclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+):
+    """Detection counts per grid cell and species, for map overlays."""
+    filters = DetectionFilter(
+        species=species,
+        start_ms=time_bound(from_, "from"),
+        end_ms=time_bound(to, "to"),
+        min_confidence=min_confidence,
+        bbox=_bbox(bbox),
+    )
+    return heatmap(filters, zoom)
+
+
+def _bbox(value: Optional[str]):
+    if value is None:
+        return None
+    bbox = parse_bbox(value)
+    if bbox is None:
+        raise HTTPException(status_code=400, detail="Invalid bbox, expected min_lon,min_lat,max_lon,max_lat")
+    return bbox
+
+
+def _export(fmt: str, filters: DetectionFilter, filename: str) -> StreamingResponse:
+    media_type, _ = FORMATS[fmt]
+    return StreamingResponse(
+        EXPORTERS[fmt](filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/api/export")
+def export_detections(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv | ndjson | parquet | xlsx (default: from the Accept header, else csv)"),
+    species: Optional[List[str]] = Query(None),
+    from_: Optional[str] = Query(None, alias="from", description="Inclusive, YYYY-MM-DD[ HH:MM:SS]"),
+    to: Optional[str] = Query(None, description="Exclusive, YYYY-MM-DD[ HH:MM:SS]"),
+):
+    """Stream detections in time order as a file download."""
+    if format is None:
+        format = negotiate_format(request.headers.get("accept"))
+        if format is None:
+            raise HTTPException(status_code=406, detail=f"Supported types: {', '.join(t for t, _ in FORMATS.values())}")
+    elif format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format, expected one of: {', '.join(FORMATS)}")
+
+    filters = DetectionFilter(species=species, start_ms=time_bound(from_, "from"), end_ms=time_bound(to, "to"))
+    _, extension = FORMATS[format]
+    return _export(format, filters, f"detections-{datetime.now():%Y%m%d-%H%M%S}.{extension}")
 
 
 @router.get("/download-excel")
 def download_excel():
-    conn = get_db_connection()
-    df = pd.read_sql_query("SELECT * FROM detections", conn)
-    conn.close()
-    
-    excel_file = "bird_data.xlsx"
-    df.to_excel(excel_file, index=False)
-    
-    return FileResponse(excel_file, filename="bird_report.xlsx")
+    """The full history as an .xlsx report. Kept for existing links; /api/export is the general form."""
+    return _export("xlsx", DetectionFilter(), "bird_report.xlsx")
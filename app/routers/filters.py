@@ -0,0 +1,15 @@
+"""Query parameter parsing shared by the routers."""
+from fastapi import HTTPException
+from typing import Optional
+
+from ..database import parse_timestamp, to_epoch_ms
+
+
+def time_bound(value: Optional[str], name: str) -> Optional[int]:
+    """A from/to query parameter as ts_ms, or 400 if it is not a timestamp."""
+    if value is None:
+        return None
+    ts = parse_timestamp(value)
+    if ts is None:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}' timestamp")
+    return to_epoch_ms(ts)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+
+from ..services.jobs import upload_jobs
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str) -> Dict[str, Any]:
+    """Get the state, stage timings and detections of a queued upload."""
+    job = upload_jobs.get(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    return job.to_dict()
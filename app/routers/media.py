@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+import os
+
+from ..config import STORAGE_DIR
+from ..services.media import get_image, get_mel_sidecar
+from ..services.render_pool import RenderError
+
+router = APIRouter()
+
+
+@router.get("/storage/{filename}")
+def get_storage_file(filename: str):
+    """
+    Serve stored audio and sidecars as-is.
+    Spectrogram images are rendered on first request and served from the render cache.
+    """
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    path = os.path.join(STORAGE_DIR, filename)
+    if os.path.isfile(path):
+        return FileResponse(path)
+
+    try:
+        image_path = get_image(filename) or get_mel_sidecar(filename)
+    except RenderError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if not image_path:
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(image_path)
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+from typing import Optional
+
+from ..config import SPECTROGRAM_FORMAT
+from ..services.media import get_tile_info, get_tile
+from ..services.render_pool import RenderError
+from ..services.sessions import list_sessions, decode_cursor, get_session_with_detections
+
+router = APIRouter(prefix="/api/sessions")
+
+# Tiles are a pure function of the stored audio and the format their URL names, so clients may keep them
+TILE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Tiles requested without an extension follow SPECTROGRAM_FORMAT, which can change, so clients revalidate them
+DEFAULT_FORMAT_TILE_CACHE_CONTROL = "no-cache"
+
+
+@router.get("")
+def get_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """Recording sessions, newest first, with their detection counts."""
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return list_sessions(limit, position)
+
+
+@router.get("/{session_id}")
+def get_session(session_id: str):
+    """One session and its detections."""
+    session = get_session_with_detections(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+@router.get("/{session_id}/tiles")
+def get_session_tiles(session_id: str):
+    """Zoom levels, tile counts and detections of a session's spectrogram pyramid."""
+    try:
+        info = get_tile_info(session_id)
+    except RenderError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if info is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return info
+
+
+@router.get("/{session_id}/tiles/{z}/{x}.{ext}")
+def get_session_tile(session_id: str, z: int, x: int, ext: str):
+    """
+    One spectrogram tile, encoded as its extension names (png or webp). Zoom 0 shows the
+    whole recording in a single tile; each level doubles the horizontal resolution up
+    to one mel frame per pixel.
+    """
+    return _tile_response(session_id, z, x, ext, TILE_CACHE_CONTROL)
+
+
+@router.get("/{session_id}/tiles/{z}/{x}")
+def get_session_tile_default_format(session_id: str, z: int, x: int):
+    """One spectrogram tile in SPECTROGRAM_FORMAT. Kept for URLs without an extension."""
+    return _tile_response(session_id, z, x, SPECTROGRAM_FORMAT, DEFAULT_FORMAT_TILE_CACHE_CONTROL)
+
+
+def _tile_response(session_id: str, z: int, x: int, fmt: str, cache_control: str) -> FileResponse:
+    try:
+        path = get_tile(session_id, z, x, fmt)
+    except RenderError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if not path:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    return FileResponse(path, headers={"Cache-Control": cache_control})
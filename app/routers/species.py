@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional, List, Dict, Any
 
-from ..database import get_db_connection
+from ..database import get_db_connection, from_epoch_ms
 from ..services.bird_images import get_species_info
+from ..services.species_search import search_species
 
 router = APIRouter()
 
@@ -19,6 +20,16 @@ def get_all_species() -> List[Dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
+@router.get("/api/species/search")
+def search(
+    q: str = Query(..., description="Words to match as prefixes of the name, scientific name, description or region"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, description="next_offset from the previous page"),
+) -> Dict[str, Any]:
+    """Species matching `q`, best match first."""
+    return search_species(q, limit, offset)
+
+
 @router.get("/api/species/{species_name}")
 def get_species_by_name(species_name: str) -> Dict[str, Any]:
     """
@@ -33,6 +44,10 @@ def get_species_by_name(species_name: str) -> Dict[str, Any]:
     return info
 
 
+def _seen(ms: Optional[int]) -> Optional[str]:
+    return str(from_epoch_ms(ms)) if ms is not None else None
+
+
 @router.get("/api/species-summary")
 def get_species_summary() -> List[Dict[str, Any]]:
     """
@@ -42,16 +57,15 @@ def get_species_summary() -> List[Dict[str, Any]]:
     conn = get_db_connection()
     c = conn.cursor()
     
-    # Get detection stats per species
+    # Get detection stats per species from the rollup
     c.execute("""
         SELECT 
             species,
-            COUNT(*) as detection_count,
-            AVG(confidence) as avg_confidence,
-            MAX(timestamp) as last_seen,
-            MIN(timestamp) as first_seen
-        FROM detections 
-        GROUP BY species 
+            detections as detection_count,
+            confidence_sum / detections as avg_confidence,
+            last_seen_ms,
+            first_seen_ms
+        FROM rollup_species 
         ORDER BY detection_count DESC
     """)
     detection_stats = {row['species']: dict(row) for row in c.fetchall()}
@@ -70,8 +84,8 @@ def get_species_summary() -> List[Dict[str, Any]]:
             "name": species_name,
             "detection_count": stats['detection_count'],
             "avg_confidence": round(stats['avg_confidence'] * 100, 1),
-            "last_seen": stats['last_seen'],
-            "first_seen": stats['first_seen'],
+            "last_seen": _seen(stats['last_seen_ms']),
+            "first_seen": _seen(stats['first_seen_ms']),
             "image_url": info.get('image_url'),
             "description": info.get('description'),
             "region": info.get('region'),
@@ -1,5 +1,132 @@
-from birdnetlib.analyzer import Analyzer
+"""
+BirdNET Inference Workers - Runs BirdNET in a pool of worker processes.
+Each worker loads the model once at startup and keeps it warm, so uploads are
+analyzed in parallel across cores instead of queueing behind the GIL.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Optional, List, Tuple
+import multiprocessing
+import os
+import threading
 
-print("🦅 Loading BirdNET Model...")
-analyzer = Analyzer()
-print("✅ BirdNET Ready.")
+import numpy as np
+
+from ..config import INFERENCE_WORKERS, INFERENCE_BATCH_SIZE
+
+# The model instance owned by this process (only set inside workers)
+analyzer = None
+
+# Input buffer of INFERENCE_BATCH_SIZE chunks, allocated with the interpreter's tensors (workers only)
+_batch_input: Optional[np.ndarray] = None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    """Load the model once per worker process."""
+    global analyzer, _batch_input
+    from birdnetlib.analyzer import Analyzer
+
+    print(f"🦅 Loading BirdNET Model (pid {os.getpid()})...")
+    analyzer = Analyzer()
+    # Every batch is padded to this one shape, so tensors are allocated once per worker
+    shape = [INFERENCE_BATCH_SIZE, *analyzer.interpreter.get_input_details()[0]["shape"][1:]]
+    analyzer.interpreter.resize_tensor_input(analyzer.input_layer_index, shape)
+    analyzer.interpreter.allocate_tensors()
+    _batch_input = np.zeros(shape, dtype=np.float32)
+    print(f"✅ BirdNET Ready (pid {os.getpid()}).")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _predict_batch(batch: np.ndarray, min_conf: float) -> List[List[Tuple[str, float]]]:
+    """
+    Runs inside a worker: one interpreter invocation for a whole batch of 3s chunks.
+    Returns, per chunk, the (label, score) pairs at or above min_conf, best first.
+    Short batches are zero-padded to INFERENCE_BATCH_SIZE and the padding rows dropped.
+    """
+    n = len(batch)
+    _batch_input[:n] = batch
+    _batch_input[n:] = 0
+
+    interpreter = analyzer.interpreter
+    interpreter.set_tensor(analyzer.input_layer_index, _batch_input)
+    interpreter.invoke()
+    prediction = interpreter.get_tensor(analyzer.output_layer_index)[:n]
+    scores = analyzer.flat_sigmoid(np.array(prediction), sensitivity=-1.0)
+
+    results = []
+    for row in scores:
+        hits = np.flatnonzero(row >= min_conf)
+        hits = hits[np.argsort(row[hits])[::-1]]
+        results.append([(analyzer.labels[i], float(row[i])) for i in hits])
+    return results
+
+
+def _predicted_species(lat: float, lon: float, date: datetime) -> List[str]:
+    """Runs inside a worker: species expected at this location and week."""
+    from birdnetlib.analyzer import LOCATION_FILTER_THRESHOLD
+    from birdnetlib.utils import return_week_48_from_datetime
+
+    return analyzer.return_predicted_species_list(
+        lon=lon, lat=lat, week_48=return_week_48_from_datetime(date),
+        filter_threshold=LOCATION_FILTER_THRESHOLD,
+    )
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the web process already runs threads
+            _pool = ProcessPoolExecutor(
+                max_workers=INFERENCE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def start_workers() -> None:
+    """Start every worker and wait until each has loaded the model."""
+    pool = get_pool()
+    futures = [pool.submit(_ping) for _ in range(INFERENCE_WORKERS)]
+    pids = {f.result() for f in futures}
+    print(f"🧠 Inference workers ready ({len(pids)} processes).")
+
+
+def stop_workers() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def submit(fn, *args) -> Future:
+    """Submit a task to the worker pool, rebuilding the pool if a worker has died."""
+    global _pool
+    pool = get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); drop the pool so the next call rebuilds it
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+    return future
+
+
+def predict_batch(batch: np.ndarray, min_conf: float) -> Future:
+    """Score a (n, 144000) float32 batch of chunks on the next free worker."""
+    return submit(_predict_batch, batch, min_conf)
+
+
+def predicted_species(lat: float, lon: float, date: datetime) -> Future:
+    return submit(_predicted_species, lat, lon, date)
@@ -0,0 +1,298 @@
+"""
+Detection Archive - Moves detections older than ARCHIVE_AFTER_DAYS out of SQLite into
+month-partitioned Parquet files (archive/detections/month=YYYY-MM/part-*.parquet) with
+compact column types. The archive_partitions table lists every committed file and the
+time range it covers; exports, analytics and session pages read just the partitions
+their time range overlaps, push time and species filters down into the Parquet scan and
+union the result with the rows still in SQLite. The rollups keep counting archived rows.
+
+Archive every whole month older than ARCHIVE_AFTER_DAYS (e.g. nightly from cron):
+
+    python -m app.services.archive [--older-than-days N] [--vacuum]
+"""
+import argparse
+import calendar
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterator
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ..config import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS
+from ..database import get_db_connection, to_epoch_ms, from_epoch_ms
+from .db_writer import db_writer
+from . import response_cache
+from .detections import DetectionFilter
+
+PARTITIONS_DIR = os.path.join(ARCHIVE_DIR, "detections")
+
+# Rows per Parquet row group, and per batch when reading one back
+ROW_GROUP_ROWS = 65536
+
+_STRINGS = pa.dictionary(pa.int32(), pa.string())
+
+# The detections columns. Time is typed and millisecond precise (the text timestamp is
+# rebuilt from it); values repeated across rows are dictionary-encoded; clip offsets,
+# multiples of the 3 s chunk, are exact in float32. Confidence stays float64 so it lands
+# in the same histogram bin as before archiving.
+COLD_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("timestamp", pa.timestamp("ms")),
+    ("species", _STRINGS),
+    ("confidence", pa.float64()),
+    ("lat", pa.float64()),
+    ("lon", pa.float64()),
+    ("start_time", pa.float32()),
+    ("end_time", pa.float32()),
+    ("session_id", _STRINGS),
+    ("audio_url", _STRINGS),
+    ("single_audio_url", pa.string()),
+    ("image_url", _STRINGS),
+    ("single_image_url", pa.string()),
+    ("bird_photo_url", _STRINGS),
+])
+
+# SQLite columns read for each archived column, in schema order
+_SOURCE_COLUMNS = ["ts_ms" if field.name == "timestamp" else field.name for field in COLD_SCHEMA]
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month: datetime) -> datetime:
+    return month + timedelta(days=calendar.monthrange(month.year, month.month)[1])
+
+
+def partitions(conn: sqlite3.Connection, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[str]:
+    """
+    Committed partition files holding rows in [start_ms, end_ms), oldest first. Read on the
+    caller's connection, inside whatever transaction it has open.
+    """
+    rows = conn.execute(
+        """SELECT path FROM archive_partitions WHERE max_ts_ms >= ? AND min_ts_ms < ?
+           ORDER BY min_ts_ms, path""",
+        (start_ms if start_ms is not None else -(2 ** 63), end_ms if end_ms is not None else 2 ** 63 - 1),
+    ).fetchall()
+    return [os.path.join(ARCHIVE_DIR, row[0]) for row in rows]
+
+
+def max_archived_id(conn: sqlite3.Connection) -> int:
+    """The largest detection id in any committed partition, 0 if there are none."""
+    high = 0
+    for path in partitions(conn):
+        ids = pq.read_table(path, columns=["id"])["id"]
+        high = max(high, pc.max(ids).as_py() or 0)
+    return high
+
+
+def _expression(filters: DetectionFilter) -> Optional[ds.Expression]:
+    """The filters as a Parquet scan predicate, so row groups outside them are skipped."""
+    if filters.near is not None:
+        raise ValueError("Radius filters are not supported on archived detections")
+    conditions = []
+    if filters.species:
+        conditions.append(ds.field("species").isin(filters.species))
+    if filters.start_ms is not None:
+        conditions.append(ds.field("timestamp") >= pa.scalar(filters.start_ms, pa.timestamp("ms")))
+    if filters.end_ms is not None:
+        conditions.append(ds.field("timestamp") < pa.scalar(filters.end_ms, pa.timestamp("ms")))
+    if filters.min_confidence is not None:
+        conditions.append(ds.field("confidence") >= filters.min_confidence)
+    if filters.session_id is not None:
+        conditions.append(ds.field("session_id") == filters.session_id)
+    if filters.bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = filters.bbox
+        conditions.append((ds.field("lat") >= min_lat) & (ds.field("lat") <= max_lat))
+        conditions.append((ds.field("lon") >= min_lon) & (ds.field("lon") <= max_lon))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _values(batch: pa.RecordBatch, column: str) -> list:
+    """One detections column from a batch of archived rows, as the Python values SQLite would return."""
+    if column == "ts_ms":
+        return batch.column("timestamp").cast(pa.int64()).to_pylist()
+    if column == "timestamp":
+        times = batch.column("timestamp")
+        seconds = pc.strftime(times.cast(pa.timestamp("s"), safe=False), format="%Y-%m-%d %H:%M:%S").to_pylist()
+        ms = times.cast(pa.int64()).to_pylist()
+        # As str(datetime): a fraction only when there is one
+        return [text if text is None or value % 1000 == 0 else f"{text}.{value % 1000:03d}000" for text, value in zip(seconds, ms)]
+    values = batch.column(column)
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(pa.string())  # Far quicker than converting dictionary scalars one by one
+    return values.to_pylist()
+
+
+def iter_partition(path: str, filters: DetectionFilter, columns: List[str]) -> Iterator[tuple]:
+    """Rows of one partition file matching `filters`, as tuples of `columns`, in (ts_ms, id) order."""
+    fields = sorted({"timestamp" if column == "ts_ms" else column for column in columns})
+    dataset = ds.dataset(path, schema=COLD_SCHEMA, format="parquet")
+    for batch in dataset.to_batches(
+        columns=fields, filter=_expression(filters), batch_size=ROW_GROUP_ROWS, use_threads=False
+    ):
+        yield from zip(*(_values(batch, column) for column in columns))
+
+
+def iter_cold(conn: sqlite3.Connection, filters: DetectionFilter, columns: List[str]) -> List[Iterator[tuple]]:
+    """One sorted row stream per partition overlapping the filters' time range."""
+    return [iter_partition(path, filters, columns) for path in partitions(conn, filters.start_ms, filters.end_ms)]
+
+
+@contextmanager
+def temp_table(conn: sqlite3.Connection, table: str, streams: List[Iterator[tuple]], columns: List[str]) -> Iterator[None]:
+    """
+    TEMP table `table` with `columns` holding the rows of `streams`, so SQL can union
+    archived rows with live ones. Pooled connections outlive the request, so the table
+    is dropped again when the block exits.
+    """
+    # The inserts open a transaction unless the caller has one; close it too, or a rollback
+    # when the connection goes back to the pool would undo the drop
+    own_transaction = not conn.in_transaction
+    conn.execute(f"CREATE TEMP TABLE {table} ({', '.join(columns)})")
+    try:
+        placeholders = ", ".join("?" * len(columns))
+        for stream in streams:
+            conn.executemany(f"INSERT INTO temp.{table} VALUES ({placeholders})", stream)
+        yield
+    finally:
+        conn.execute(f"DROP TABLE temp.{table}")
+        if own_transaction:
+            conn.commit()
+
+
+def _write_partition(conn: sqlite3.Connection, month: datetime, start_ms: int, end_ms: int, max_id: int) -> Optional[Dict[str, Any]]:
+    """Copy one month's rows into a new partition file. None if the month has no rows to move."""
+    cursor = conn.execute(
+        f"""SELECT {', '.join(_SOURCE_COLUMNS)} FROM detections
+            WHERE ts_ms >= ? AND ts_ms < ? AND id <= ? ORDER BY ts_ms, id""",
+        (start_ms, end_ms, max_id),
+    )
+    relative = os.path.join("detections", f"month={month:%Y-%m}", f"part-{uuid.uuid4().hex[:12]}.parquet")
+    path = os.path.join(ARCHIVE_DIR, relative)
+    writer = None
+    rows, min_ts, max_ts = 0, None, None
+    try:
+        while True:
+            chunk = cursor.fetchmany(ROW_GROUP_ROWS)
+            if not chunk:
+                break
+            if writer is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = pq.ParquetWriter(path, COLD_SCHEMA, compression="zstd")
+            values = list(zip(*chunk))
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(values, COLD_SCHEMA)],
+                    schema=COLD_SCHEMA,
+                ),
+                row_group_size=len(chunk),
+            )
+            rows += len(chunk)
+            min_ts = chunk[0][1] if min_ts is None else min_ts
+            max_ts = chunk[-1][1]
+    finally:
+        if writer is not None:
+            writer.close()
+    if not rows:
+        return None
+    return {"path": relative, "month": f"{month:%Y-%m}", "rows": rows, "min_ts_ms": min_ts, "max_ts_ms": max_ts}
+
+
+def _commit_partition(partition: Dict[str, Any], start_ms: int, end_ms: int, max_id: int) -> None:
+    """Delete the copied rows and list the file, in one transaction: a file is only read once listed."""
+    def write(conn) -> None:
+        deleted = conn.execute(
+            "DELETE FROM detections WHERE ts_ms >= ? AND ts_ms < ? AND id <= ?",
+            (start_ms, end_ms, max_id),
+        ).rowcount
+        if deleted != partition["rows"]:
+            raise RuntimeError(f"Expected to archive {partition['rows']} rows, found {deleted}")
+        conn.execute(
+            """INSERT INTO archive_partitions (path, month, rows, min_ts_ms, max_ts_ms)
+               VALUES (:path, :month, :rows, :min_ts_ms, :max_ts_ms)""",
+            partition,
+        )
+        response_cache.bump_shared(conn)  # A running server's cached analytics include these rows
+
+    db_writer.submit(write, rows=partition["rows"]).result()
+
+
+def remove_orphans() -> int:
+    """Delete partition files left behind by an archive run that stopped before committing them."""
+    conn = get_db_connection()
+    listed = {row[0] for row in conn.execute("SELECT path FROM archive_partitions")}
+    conn.close()
+    removed = 0
+    for directory, _, files in os.walk(PARTITIONS_DIR):
+        for name in files:
+            relative = os.path.relpath(os.path.join(directory, name), ARCHIVE_DIR)
+            if relative not in listed:
+                os.remove(os.path.join(ARCHIVE_DIR, relative))
+                removed += 1
+    return removed
+
+
+def archive_detections(older_than_days: int = ARCHIVE_AFTER_DAYS) -> List[Dict[str, Any]]:
+    """
+    Move every whole month of detections that ended more than `older_than_days` ago
+    into the archive, one partition file and one transaction per month. Rows without
+    a time stay in SQLite. Returns the partitions written.
+    """
+    remove_orphans()
+    cutoff = _month_start(datetime.now() - timedelta(days=older_than_days))
+
+    conn = get_db_connection()
+    # Rows inserted from here on are left for the next run, so the delete matches the copy
+    max_id, oldest_ms = conn.execute(
+        "SELECT (SELECT COALESCE(MAX(id), 0) FROM detections), MIN(ts_ms) FROM detections"
+    ).fetchone()
+    conn.close()
+
+    written = []
+    month = _month_start(from_epoch_ms(oldest_ms)) if oldest_ms is not None else cutoff
+    while month < cutoff:
+        start_ms, end_ms = to_epoch_ms(month), to_epoch_ms(_next_month(month))
+        conn = get_db_connection()
+        try:
+            partition = _write_partition(conn, month, start_ms, end_ms, max_id)
+        finally:
+            conn.close()
+        if partition is not None:
+            try:
+                _commit_partition(partition, start_ms, end_ms, max_id)
+            except Exception:
+                os.remove(os.path.join(ARCHIVE_DIR, partition["path"]))
+                raise
+            written.append(partition)
+            print(f"🧊 Archived {partition['rows']} detections from {partition['month']} to {partition['path']}")
+        month = _next_month(month)
+    return written
+
+
+if __name__ == "__main__":
+    from ..database import init_db
+
+    parser = argparse.ArgumentParser(description="Move old detections into the Parquet archive.")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--vacuum", action="store_true", help="Shrink birds.db afterwards (blocks writers while it runs)")
+    args = parser.parse_args()
+
+    init_db()
+    start = time.time()
+    partitions_written = archive_detections(args.older_than_days)
+    db_writer.stop()
+    if args.vacuum and partitions_written:
+        get_db_connection().execute("VACUUM")
+    print(f"🧊 Archived {sum(p['rows'] for p in partitions_written)} detections "
+          f"in {len(partitions_written)} partitions in {time.time() - start:.2f}s")
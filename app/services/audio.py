@@ -1,16 +1,77 @@
-# Source - https://stackoverflow.com/a
-# Posted by siddhantsomani, modified by community. See post 'Timeline' for change history
-# Retrieved 2026-01-23, License - CC BY-SA 4.0
+import threading
+import wave
+from typing import Dict
 
-from pydub import AudioSegment
- #Exports to a wav file in the current path.
+import librosa
+import numpy as np
 
-def generate_single_audio(audio_path: str, single_audio_path : str, start_time : float, end_time : float):
-    t1 = start_time * 1000 #Works in milliseconds
-    t2 = end_time * 1000
-    newAudio = AudioSegment.from_wav(audio_path)
-    newAudio = newAudio[t1:t2]
-    newAudio.export(single_audio_path, format="wav") #Exports to a wav file in the current path.
+from . import tracing
 
 
+class AudioContext:
+    """
+    One upload's audio, decoded once into a mono float32 array at its native rate.
+    The analyzer, both spectrogram renderers and clip extraction all read from it.
+    """
 
+    def __init__(self, audio_path: str):
+        self.path = audio_path
+        with tracing.span("audio.load") as span:
+            self.samples, self.sr = librosa.load(audio_path, sr=None, mono=True)
+            span.set(sr=self.sr, seconds=round(len(self.samples) / self.sr, 1))
+        self._resampled: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sr
+
+    def resampled(self, sr: int) -> np.ndarray:
+        """The signal at another sample rate, computed once per rate."""
+        if sr == self.sr:
+            return self.samples
+        with self._lock:
+            if sr not in self._resampled:
+                with tracing.span("audio.resample", target_sr=sr):
+                    self._resampled[sr] = librosa.resample(
+                        self.samples, orig_sr=self.sr, target_sr=sr, res_type="kaiser_fast"
+                    )
+            return self._resampled[sr]
+
+    def segment(self, start_time: float, end_time: float) -> np.ndarray:
+        start = max(0, int(start_time * self.sr))
+        end = min(len(self.samples), int(end_time * self.sr))
+        return self.samples[start:end]
+
+
+@tracing.traced
+def generate_single_audio(audio: AudioContext, single_audio_path: str, start_time: float, end_time: float):
+    """
+    Write the start_time..end_time slice of the recording as a WAV. PCM WAV sources are
+    copied frame for frame, keeping their channels and bit depth; other sources are
+    written as 16-bit mono from the decoded signal.
+    """
+    try:
+        # Seeks to the slice and copies its bytes; nothing is decoded
+        with wave.open(audio.path, "rb") as source:
+            params = source.getparams()
+            start = min(max(0, int(start_time * params.framerate)), params.nframes)
+            end = min(max(start, int(end_time * params.framerate)), params.nframes)
+            source.setpos(start)
+            frames = source.readframes(end - start)
+    except (wave.Error, EOFError):
+        _write_mono_clip(audio, single_audio_path, start_time, end_time)
+        return
+    with wave.open(single_audio_path, "wb") as out:
+        out.setparams(params)
+        out.writeframes(frames)
+
+
+def _write_mono_clip(audio: AudioContext, single_audio_path: str, start_time: float, end_time: float):
+    pcm = np.clip(audio.segment(start_time, end_time), -1.0, 1.0)
+    pcm = (pcm * 32767).astype("<i2")
+    with wave.open(single_audio_path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(audio.sr)
+        out.writeframes(pcm.tobytes())
@@ -3,10 +3,13 @@ Bird Image Service - Fetches bird info from Wikipedia API with database caching.
 Stores species data permanently so future lookups are instant.
 """
 import requests
-import sqlite3
 import re
 from typing import Optional, Dict, Any
-from ..config import DATABASE_PATH
+from ..database import get_db_connection
+from .metrics import SPECIES_LOOKUPS_TOTAL
+from .response_cache import response_cache
+from .db_writer import db_writer
+from . import tracing
 
 # Wikipedia requires a proper User-Agent header
 HEADERS = {
@@ -19,8 +22,7 @@ def get_cached_species_info(species: str) -> Optional[Dict[str, Any]]:
     Check if we have cached info for this species in the database.
     Returns full species info dict if found, None otherwise.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         "SELECT * FROM species WHERE name = ?",
@@ -35,14 +37,20 @@ def get_cached_species_info(species: str) -> Optional[Dict[str, Any]]:
 
 
 def save_species_info(species_info: Dict[str, Any]) -> None:
-    """Save species info to the database cache."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
-    try:
-        c.execute(
-            """INSERT OR REPLACE INTO species 
+    """Save species info to the database cache, through the database writer."""
+    def write(conn) -> None:
+        # Upsert rather than replace, so the row keeps its id (and its search index entry)
+        conn.execute(
+            """INSERT INTO species 
                (name, scientific_name, image_url, description, region, habitat, conservation_status)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (name) DO UPDATE SET
+                   scientific_name = excluded.scientific_name,
+                   image_url = excluded.image_url,
+                   description = excluded.description,
+                   region = excluded.region,
+                   habitat = excluded.habitat,
+                   conservation_status = excluded.conservation_status""",
             (
                 species_info.get("name"),
                 species_info.get("scientific_name"),
@@ -53,11 +61,12 @@ def save_species_info(species_info: Dict[str, Any]) -> None:
                 species_info.get("conservation_status"),
             )
         )
-        conn.commit()
+
+    try:
+        db_writer.submit(write).result()
+        response_cache.bump()  # /api/species-summary shows this info
     except Exception as e:
         print(f"❌ Error saving species info: {e}")
-    finally:
-        conn.close()
 
 
 def extract_region_from_text(text: str) -> str:
@@ -83,6 +92,7 @@ def extract_region_from_text(text: str) -> str:
     return "Widespread"
 
 
+@tracing.traced
 def fetch_species_info_from_wikipedia(species: str) -> Optional[Dict[str, Any]]:
     """
     Fetch full species info from Wikipedia API.
@@ -174,6 +184,7 @@ def fetch_species_info_from_wikipedia(species: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+@tracing.traced
 def get_species_info(species: str) -> Optional[Dict[str, Any]]:
     """
     Main function to get species info.
@@ -183,6 +194,7 @@ def get_species_info(species: str) -> Optional[Dict[str, Any]]:
     cached_info = get_cached_species_info(species)
     if cached_info:
         print(f"📦 Using cached info for {species}")
+        SPECIES_LOOKUPS_TOTAL.inc(result="cached")
         return cached_info
     
     # Fetch from Wikipedia
@@ -193,6 +205,9 @@ def get_species_info(species: str) -> Optional[Dict[str, Any]]:
         # Save to cache
         save_species_info(species_info)
         print(f"💾 Cached info for {species}")
+        SPECIES_LOOKUPS_TOTAL.inc(result="fetched")
+    else:
+        SPECIES_LOOKUPS_TOTAL.inc(result="not_found")
     
     return species_info
 
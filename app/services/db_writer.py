@@ -0,0 +1,127 @@
+"""
+Database Writer - One thread owns the write connection and applies every detection
+insert, session update and species info save. Callers queue a write and get a future
+back; the writer takes whatever is pending (up to DB_WRITE_MAX_ROWS rows, or whatever arrived within
+DB_WRITE_MAX_WAIT_MS of the oldest write) and commits it as one transaction, so a burst
+of uploads costs one lock acquisition and one commit instead of one each.
+"""
+from concurrent.futures import Future
+from typing import Optional, List, Any, Callable
+import queue
+import sqlite3
+import threading
+import time
+
+from ..config import DB_WRITE_MAX_ROWS, DB_WRITE_MAX_WAIT_MS
+from ..database import get_db_connection
+from .metrics import QUEUE_DEPTH, DB_WRITE_BATCH_SIZE
+from . import rollups
+
+
+class _Write:
+    """One queued write: a function run against the write connection inside the shared transaction."""
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any], rows: int):
+        self.fn = fn
+        self.rows = rows
+        self.queued_at = time.monotonic()
+        self.future: Future = Future()
+
+
+class DatabaseWriter:
+    """Single writer thread that coalesces queued writes into group transactions."""
+
+    def __init__(self, max_rows: int, max_wait: float):
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Commit everything already queued, then stop."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join(timeout=30)
+                self._thread = None
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any], rows: int = 1) -> Future:
+        """
+        Queue fn(conn) to run in the next transaction; the future resolves to its return
+        value once committed. fn must not commit. `rows` is its size for batching purposes.
+        """
+        # Started on first use too, so scripts and benchmarks work without the app's startup hook
+        self.start()
+        write = _Write(fn, rows)
+        self._queue.put(write)
+        return write.future
+
+    def _run(self) -> None:
+        while True:
+            write = self._queue.get()
+            if write is None:
+                break
+
+            # Fill the transaction until it is big enough or the oldest write has waited long enough.
+            # Writes that queued up during the previous commit are usually past their deadline already.
+            batch = [write]
+            rows = write.rows
+            deadline = write.queued_at + self.max_wait
+            stopping = False
+            while rows < self.max_rows:
+                try:
+                    write = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if write is None:
+                    stopping = True
+                    break
+                batch.append(write)
+                rows += write.rows
+
+            self._commit(batch)
+            if stopping:
+                break
+
+    def _commit(self, batch: List[_Write]) -> None:
+        DB_WRITE_BATCH_SIZE.observe(len(batch))
+        try:
+            results = self._transaction(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            # Rolled back as a whole; redo each write on its own so only the bad one fails
+            print(f"❌ Write transaction failed ({len(batch)} writes), retrying one by one: {e}")
+            for write in batch:
+                self._commit([write])
+            return
+        for write, result in zip(batch, results):
+            write.future.set_result(result)
+
+    def _transaction(self, batch: List[_Write]) -> List[Any]:
+        conn = get_db_connection()
+        try:
+            with conn:
+                # Take the write lock up front so every detection id above the current maximum is this transaction's
+                conn.execute("BEGIN IMMEDIATE")
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM detections").fetchone()[0]
+                results = [write.fn(conn) for write in batch]
+                rollups.apply(conn, "id > ?", (last_id,))
+            return results
+        finally:
+            conn.close()
+
+
+db_writer = DatabaseWriter(DB_WRITE_MAX_ROWS, DB_WRITE_MAX_WAIT_MS / 1000)
+QUEUE_DEPTH.set_function(db_writer.pending, queue="db_writer")
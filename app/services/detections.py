@@ -0,0 +1,207 @@
+"""
+Detection Queries - Filtered, keyset-paginated reads of the detections table.
+Every page is a walk along an index ((ts_ms), (species, ts_ms) or (session_id, id))
+that stops after `limit` rows, so its cost depends on the page, not on the table.
+Location filters and the heatmap start from the detections_rtree spatial index.
+"""
+import math
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Tuple
+
+from ..database import get_db_connection, EARTH_RADIUS_KM
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+# Great-circle distance in km from the row's lat/lon to a (lat, lon) parameter pair; the
+# function is registered by the connection factory, so it works on any SQLite build
+DISTANCE_KM_SQL = "distance_km(lat, lon, ?, ?)"
+
+# Ids whose stored point lies in a box. The R*Tree keeps 32-bit coordinates rounded outwards,
+# so this is a slight superset and the exact comparison is made against detections.
+RTREE_SQL = "id IN (SELECT id FROM detections_rtree WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?)"
+
+MAX_HEATMAP_ZOOM = 20
+
+
+@dataclass
+class DetectionFilter:
+    """Optional constraints on detections. Times are ts_ms; the end bound is exclusive."""
+    species: Optional[List[str]] = None
+    start_ms: Optional[int] = None
+    end_ms: Optional[int] = None
+    min_confidence: Optional[float] = None
+    session_id: Optional[str] = None
+    bbox: Optional[Tuple[float, float, float, float]] = None  # min_lon, min_lat, max_lon, max_lat
+    near: Optional[Tuple[float, float, float]] = None  # lat, lon, radius in km
+
+    def where(self) -> Tuple[List[str], List[Any]]:
+        """SQL conditions and their parameters, to be joined with AND."""
+        clauses, params = [], []
+        if self.species:
+            clauses.append(f"species IN ({', '.join('?' * len(self.species))})")
+            params.extend(self.species)
+        if self.start_ms is not None:
+            clauses.append("ts_ms >= ?")
+            params.append(self.start_ms)
+        if self.end_ms is not None:
+            clauses.append("ts_ms < ?")
+            params.append(self.end_ms)
+        if self.min_confidence is not None:
+            clauses.append("confidence >= ?")
+            params.append(self.min_confidence)
+        if self.session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(self.session_id)
+        if self.bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = self.bbox
+            clauses.append(RTREE_SQL)
+            params.extend([min_lat, max_lat, min_lon, max_lon])
+            clauses.append("lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?")
+            params.extend([min_lat, max_lat, min_lon, max_lon])
+        if self.near is not None:
+            lat, lon, radius_km = self.near
+            min_lon, min_lat, max_lon, max_lat = radius_bbox(lat, lon, radius_km)
+            clauses.append(RTREE_SQL)
+            params.extend([min_lat, max_lat, min_lon, max_lon])
+            clauses.append(f"{DISTANCE_KM_SQL} <= ?")
+            params.extend([lat, lon, radius_km])
+        return clauses, params
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """The min_lon, min_lat, max_lon, max_lat box enclosing a circle, for the index prefilter."""
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    # Longitude degrees shrink towards the poles; near one (or across the antimeridian) take every longitude
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    dlon = dlat / cos_lat if cos_lat > 1e-6 else 360.0
+    if lon - dlon < -180 or lon + dlon > 180:
+        return -180.0, min_lat, 180.0, max_lat
+    return lon - dlon, min_lat, lon + dlon, max_lat
+
+
+def parse_bbox(value: str) -> Optional[Tuple[float, float, float, float]]:
+    """'min_lon,min_lat,max_lon,max_lat' as floats, or None if malformed."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(","))
+    except ValueError:
+        return None
+    if min_lon > max_lon or min_lat > max_lat:
+        return None
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_near(lat: Optional[float], lon: Optional[float], radius_km: Optional[float]) -> Optional[Tuple[float, float, float]]:
+    """The radius filter if all three parts are given, None if none are; ValueError if only some are."""
+    parts = (lat, lon, radius_km)
+    if all(part is None for part in parts):
+        return None
+    if any(part is None for part in parts):
+        raise ValueError("lat, lon and radius_km must be given together")
+    return lat, lon, radius_km
+
+
+def encode_cursor(ts_ms: int, detection_id: int) -> str:
+    return f"{ts_ms}_{detection_id}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, int]]:
+    """(ts_ms, id) of the last detection on the previous page, or None if malformed."""
+    ms, _, detection_id = cursor.partition("_")
+    try:
+        return int(ms), int(detection_id)
+    except ValueError:
+        return None
+
+
+def list_detections(
+    filters: DetectionFilter,
+    limit: int,
+    cursor: Optional[Tuple[int, int]] = None,
+    since: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    One page of detections matching `filters`.
+
+    Without `since` the page is newest first and `next_cursor` continues it. With `since`
+    it is the rows inserted after detection id `since`, oldest first, for pollers.
+    `latest_id` is what the client passes as `since` next time.
+    """
+    clauses, params = filters.where()
+    conn = get_db_connection()
+    # Read first: rows committed after this are always picked up by the next poll. The id
+    # high-water mark rather than MAX(id), which drops when the newest rows are archived
+    latest_id = conn.execute(
+        "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'detections'), 0)"
+    ).fetchone()[0]
+
+    if since is not None:
+        clauses += ["id > ?", "id <= ?"]
+        params += [since, latest_id]
+        order = "id"
+    else:
+        if cursor is not None:
+            clauses.append("(ts_ms, id) < (?, ?)")
+            params.extend(cursor)
+        order = "ts_ms DESC, id DESC"
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT * FROM detections {where} ORDER BY {order} LIMIT ?",
+        (*params, limit + 1),
+    ).fetchall()
+    conn.close()
+
+    page = [dict(row) for row in rows[:limit]]
+    has_more = len(rows) > limit
+    next_cursor = None
+    if since is not None:
+        # A full page means more new rows are waiting; resume right after it
+        if has_more:
+            latest_id = page[-1]["id"]
+    elif has_more and page[-1]["ts_ms"] is not None:
+        next_cursor = encode_cursor(page[-1]["ts_ms"], page[-1]["id"])
+
+    return {"detections": page, "next_cursor": next_cursor, "latest_id": latest_id}
+
+
+def heatmap(filters: DetectionFilter, zoom: int) -> Dict[str, Any]:
+    """
+    Detection counts per grid cell and species. The grid splits longitude into 2^zoom
+    columns and latitude into rows of the same size in degrees; cell (x, y) starts at
+    lon = x * size - 180, lat = y * size - 90. Pass a bbox to count only the visible area,
+    which is read through the spatial index.
+    """
+    size = 360.0 / 2 ** zoom
+    columns, rows = 2 ** zoom, math.ceil(180 / size)
+    clauses, params = filters.where()
+    clauses.append("lat IS NOT NULL AND lon IS NOT NULL")
+
+    conn = get_db_connection()
+    counts = conn.execute(
+        f"""SELECT MIN(CAST((lon + 180) / ? AS INTEGER), ?) AS x,
+                   MIN(CAST((lat + 90) / ? AS INTEGER), ?) AS y,
+                   species, COUNT(*) AS detections
+            FROM detections WHERE {' AND '.join(clauses)}
+            GROUP BY x, y, species
+            ORDER BY x, y, detections DESC""",
+        (size, columns - 1, size, rows - 1, *params),
+    ).fetchall()
+    conn.close()
+
+    cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for row in counts:
+        cell = cells.get((row["x"], row["y"]))
+        if cell is None:
+            min_lon, min_lat = row["x"] * size - 180, row["y"] * size - 90
+            cell = cells[(row["x"], row["y"])] = {
+                "x": row["x"],
+                "y": row["y"],
+                "bbox": [min_lon, min_lat, min(min_lon + size, 180.0), min(min_lat + size, 90.0)],
+                "detections": 0,
+                "species": {},
+            }
+        cell["detections"] += row["detections"]
+        cell["species"][row["species"]] = row["detections"]
+
+    return {"zoom": zoom, "cell_size": size, "cells": list(cells.values())}
@@ -0,0 +1,228 @@
+"""
+Export Service - Streams detections as CSV, NDJSON, Parquet or XLSX.
+Rows come off a single server-side cursor EXPORT_CHUNK_ROWS at a time and each chunk
+is encoded and sent before the next is fetched, so memory does not grow with the export.
+Archived months are merged in from their Parquet partitions, in the same time order.
+"""
+import csv
+import heapq
+import io
+import itertools
+import json
+import tempfile
+from typing import Optional, List, Dict, Iterator, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from ..config import EXPORT_CHUNK_ROWS
+from ..database import open_stream_connection
+from .detections import DetectionFilter
+from . import archive
+
+EXPORT_COLUMNS = [
+    "id", "timestamp", "species", "confidence", "lat", "lon", "start_time", "end_time",
+    "session_id", "audio_url", "single_audio_url", "image_url", "single_image_url", "bird_photo_url",
+]
+
+# Parquet keeps the timestamp typed (from ts_ms); numbers stay SQLite doubles, so the
+# values read back are exactly those a CSV or NDJSON export of the same rows contains
+PARQUET_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("timestamp", pa.timestamp("ms")),
+    ("species", pa.string()),
+    ("confidence", pa.float64()),
+    ("lat", pa.float64()),
+    ("lon", pa.float64()),
+    ("start_time", pa.float64()),
+    ("end_time", pa.float64()),
+    ("session_id", pa.string()),
+    ("audio_url", pa.string()),
+    ("single_audio_url", pa.string()),
+    ("image_url", pa.string()),
+    ("single_image_url", pa.string()),
+    ("bird_photo_url", pa.string()),
+])
+
+# format -> (media type, file extension)
+FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+# Accept header types that select a format, besides the canonical ones above
+ACCEPT_ALIASES = {
+    "application/csv": "csv",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+    "application/x-parquet": "parquet",
+}
+
+XLSX_READ_SIZE = 1024 * 1024
+
+
+def negotiate_format(accept: Optional[str], default: str = "csv") -> Optional[str]:
+    """
+    The export format an Accept header asks for, honouring q-values. Missing or
+    wildcard headers get `default`; None if nothing acceptable is offered.
+    """
+    if not accept:
+        return default
+    by_type = {media_type: name for name, (media_type, _) in FORMATS.items()}
+    by_type.update(ACCEPT_ALIASES)
+
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(ranked):
+        if media_type in by_type:
+            return by_type[media_type]
+        if media_type in ("*/*", "text/*", "application/*"):
+            return default
+    return None
+
+
+def _sort_key(row: tuple) -> tuple:
+    # (ts_ms, id) lead each merged row; SQLite sorts rows without a time first
+    return row[0] is not None, row[0] or 0, row[1]
+
+
+def iter_chunks(filters: DetectionFilter, columns: List[str]) -> Iterator[List[tuple]]:
+    """
+    Matching rows in time order, EXPORT_CHUNK_ROWS at a time, from one cursor plus one
+    scan per archived partition in range. `columns` are detections column names.
+    """
+    clauses, params = filters.where()
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = open_stream_connection()
+    try:
+        cold = archive.iter_cold(conn, filters, ["ts_ms", "id", *columns])
+        if cold:
+            columns = ["ts_ms", "id", *columns]
+        cursor = conn.execute(
+            f"SELECT {', '.join(columns)} FROM detections {where} ORDER BY ts_ms, id",
+            params,
+        )
+        if not cold:
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+            return
+
+        # Archived months mostly precede the live rows, but late uploads can overlap them
+        merged = heapq.merge(map(tuple, cursor), *cold, key=_sort_key)
+        while True:
+            rows = list(itertools.islice(merged, EXPORT_CHUNK_ROWS))
+            if not rows:
+                break
+            yield [row[2:] for row in rows]
+    finally:
+        conn.dispose()
+
+
+def export_csv(filters: DetectionFilter) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in iter_chunks(filters, EXPORT_COLUMNS):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # Header of an empty export
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_ndjson(filters: DetectionFilter) -> Iterator[bytes]:
+    for rows in iter_chunks(filters, EXPORT_COLUMNS):
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def export_parquet(filters: DetectionFilter) -> Iterator[bytes]:
+    """One row group per chunk; the footer goes out after the last one."""
+    columns = ["ts_ms" if name == "timestamp" else name for name in EXPORT_COLUMNS]
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, PARQUET_SCHEMA, compression="zstd")
+    try:
+        for rows in iter_chunks(filters, columns):
+            values = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(values, PARQUET_SCHEMA)],
+                schema=PARQUET_SCHEMA,
+            )
+            writer.write_table(table, row_group_size=len(rows))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_xlsx(filters: DetectionFilter) -> Iterator[bytes]:
+    """
+    A write-only workbook keeps just the current row in memory. The zip container can
+    only be finished at the end, so it is assembled in an anonymous temp file and then sent.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("detections")
+    sheet.append(EXPORT_COLUMNS)
+    for rows in iter_chunks(filters, EXPORT_COLUMNS):
+        for row in rows:
+            sheet.append(row)
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            data = f.read(XLSX_READ_SIZE)
+            if not data:
+                break
+            yield data
+
+
+EXPORTERS = {
+    "csv": export_csv,
+    "ndjson": export_ndjson,
+    "parquet": export_parquet,
+    "xlsx": export_xlsx,
+}
@@ -0,0 +1,260 @@
+"""
+Inference Scheduler - Micro-batches 3-second chunks across all pending recordings.
+Chunks from every upload share one queue; a dispatcher thread packs them into
+batches of up to INFERENCE_BATCH_SIZE (or whatever arrived within
+INFERENCE_MAX_WAIT_MS), runs each batch once on an inference worker and routes
+the per-chunk scores back to the recording they came from.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+import calendar
+import math
+import queue
+import threading
+import time
+
+import numpy as np
+
+from ..config import INFERENCE_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, INFERENCE_WORKERS
+from . import analyzer
+from .audio import AudioContext
+from .metrics import QUEUE_DEPTH, CACHE_REQUESTS_TOTAL
+from . import tracing
+
+# Must match birdnetlib's model input
+SAMPLE_RATE = 48000
+CHUNK_SECONDS = 3.0
+MIN_CHUNK_SECONDS = 1.5
+
+
+def split_chunks(samples: np.ndarray, rate: int = SAMPLE_RATE) -> List[np.ndarray]:
+    """Split a signal into 3s chunks the same way birdnetlib does (short tail zero-padded)."""
+    chunk_len = int(CHUNK_SECONDS * rate)
+    chunks = []
+    for i in range(0, len(samples), chunk_len):
+        split = samples[i:i + chunk_len]
+
+        # End of signal?
+        if len(split) < int(MIN_CHUNK_SECONDS * rate):
+            break
+
+        # Signal chunk too short? Fill with zeros.
+        if len(split) < chunk_len:
+            padded = np.zeros(chunk_len, dtype=np.float32)
+            padded[:len(split)] = split
+            split = padded
+
+        chunks.append(split)
+    return chunks
+
+
+class _PendingRecording:
+    """Collects the scores of one recording's chunks as batches complete."""
+
+    def __init__(self, n_chunks: int, min_conf: float):
+        self.min_conf = min_conf
+        self.scores: List[Optional[List[Tuple[str, float]]]] = [None] * n_chunks
+        self.remaining = n_chunks
+        self.future: Future = Future()
+        self._lock = threading.Lock()
+
+    def deliver(self, index: int, scores: List[Tuple[str, float]]) -> None:
+        with self._lock:
+            if self.future.done():
+                return
+            self.scores[index] = scores
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.future.set_result(self.scores)
+
+    def fail(self, error: BaseException) -> None:
+        with self._lock:
+            if not self.future.done():
+                self.future.set_exception(error)
+
+
+class InferenceScheduler:
+    """Single dispatcher thread that turns a stream of chunks into batched invocations."""
+
+    def __init__(self, batch_size: int, max_wait: float, max_in_flight: int):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[Tuple[_PendingRecording, int, np.ndarray]]]" = queue.Queue()
+        # Keep every worker busy with one batch and one queued behind it; anything
+        # beyond that waits here and gets folded into larger batches.
+        self._in_flight = threading.Semaphore(max_in_flight)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, chunks: List[np.ndarray], min_conf: float) -> Future:
+        """Queue a recording's chunks; the future resolves to per-chunk (label, score) lists."""
+        pending = _PendingRecording(len(chunks), min_conf)
+        if not chunks:
+            pending.future.set_result([])
+        for i, chunk in enumerate(chunks):
+            self._queue.put((pending, i, chunk))
+        return pending.future
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            # Fill the batch until it is full or the oldest chunk has waited long enough
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stopping = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._dispatch(batch)
+            if stopping:
+                break
+
+    def _dispatch(self, batch: List[Tuple[_PendingRecording, int, np.ndarray]]) -> None:
+        self._in_flight.acquire()
+        data = np.stack([chunk for _, _, chunk in batch]).astype(np.float32, copy=False)
+        min_conf = min(pending.min_conf for pending, _, _ in batch)
+        try:
+            future = analyzer.predict_batch(data, min_conf)
+        except Exception as e:
+            self._in_flight.release()
+            for pending, _, _ in batch:
+                pending.fail(e)
+            return
+        future.add_done_callback(lambda f: self._deliver(batch, f))
+
+    def _deliver(self, batch: List[Tuple[_PendingRecording, int, np.ndarray]], future: Future) -> None:
+        self._in_flight.release()
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"❌ Inference batch failed ({len(batch)} chunks): {e}")
+            for pending, _, _ in batch:
+                pending.fail(e)
+            return
+        for (pending, index, _), scores in zip(batch, results):
+            pending.deliver(index, scores)
+
+
+scheduler = InferenceScheduler(
+    INFERENCE_BATCH_SIZE, INFERENCE_MAX_WAIT_MS / 1000, max_in_flight=INFERENCE_WORKERS * 2
+)
+QUEUE_DEPTH.set_function(scheduler.pending, queue="inference")
+
+# Species lists depend on place and week only. Coordinates are rounded to 0.1° (about
+# 11 km) so GPS jitter from one recorder maps to one entry; the range model is far coarser.
+SPECIES_COORDINATE_DECIMALS = 1
+SPECIES_CACHE_ENTRIES = 1024
+
+
+def _week_48(date: datetime) -> int:
+    """BirdNET's week of the year, 1-48 (as birdnetlib.utils.return_week_48_from_datetime)."""
+    days_in_year = 366 if calendar.isleap(date.year) else 365
+    return math.ceil(date.timetuple().tm_yday / days_in_year * 48)
+
+
+class SpeciesListCache:
+    """
+    LRU of location/week species lists, shared by every recording from the same place.
+    Concurrent misses for one key wait on a single worker lookup instead of each asking.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[float, float, int], Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, lat: float, lon: float, date: datetime) -> List[str]:
+        lat, lon = round(lat, SPECIES_COORDINATE_DECIMALS), round(lon, SPECIES_COORDINATE_DECIMALS)
+        key = (lat, lon, _week_48(date))
+        with self._lock:
+            entry = self._entries.get(key)
+            lookup = entry is None
+            if lookup:
+                entry = self._entries[key] = Future()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+        CACHE_REQUESTS_TOTAL.inc(cache="species_list", result="miss" if lookup else "hit")
+
+        if lookup:
+            try:
+                entry.set_result(analyzer.predicted_species(lat, lon, date).result())
+            except Exception as e:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]  # Let the next recording retry
+                entry.set_exception(e)
+        return entry.result()
+
+
+_species_cache = SpeciesListCache(SPECIES_CACHE_ENTRIES)
+
+
+def _allowed_species(lat: Optional[float], lon: Optional[float], date: datetime) -> List[str]:
+    # birdnetlib only filters by location when both coordinates are set
+    if not (lat and lon):
+        return []
+    return _species_cache.get(lat, lon, date)
+
+
+def analyze_recording(
+    audio: AudioContext,
+    lat: Optional[float],
+    lon: Optional[float],
+    date: datetime,
+    min_conf: float = 0.7,
+) -> List[Dict[str, Any]]:
+    """Analyze a recording through the shared batch queue. Returns birdnetlib-style detection dicts."""
+    chunks = split_chunks(audio.resampled(SAMPLE_RATE))
+    chunk_future = scheduler.submit(chunks, min_conf)
+    with tracing.span("species_filter"):
+        allowed = set(_allowed_species(lat, lon, date))
+    # Queueing for a batch slot plus the batched model invocations
+    with tracing.span("inference", chunks=len(chunks)):
+        chunk_scores = chunk_future.result()
+
+    detections = []
+    for i, scores in enumerate(chunk_scores):
+        start = i * CHUNK_SECONDS
+        for label, confidence in scores:
+            if confidence <= min_conf or (allowed and label not in allowed):
+                continue
+            scientific_name, common_name = label.split("_", 1)
+            detections.append({
+                "common_name": common_name,
+                "scientific_name": scientific_name,
+                "start_time": start,
+                "end_time": start + CHUNK_SECONDS,
+                "confidence": confidence,
+                "label": label,
+            })
+    return detections
@@ -0,0 +1,180 @@
+"""
+Upload Job Queue - Runs the upload pipeline on a bounded pool of worker threads.
+The /upload route only saves the file and enqueues a job; clients poll /api/jobs/{id}.
+The queue itself lives in memory, so on startup recover_jobs() re-queues every session a
+restart left queued or processing from its saved recording.
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable
+
+from ..config import STORAGE_DIR, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY
+from .metrics import PIPELINE_STAGE_SECONDS, UPLOADS_TOTAL, UPLOADS_IN_FLIGHT, QUEUE_DEPTH
+from .pipeline import process_upload
+from .sessions import save_session, unfinished_sessions
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another upload."""
+
+
+class Job:
+    """State of one queued upload: lifecycle, stage timings and final detections."""
+
+    def __init__(self, job_id: str, params: Dict[str, Any]):
+        self.id = job_id
+        self.params = params
+        self.state = "queued"  # queued -> running -> done | failed
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.detections: list = []
+        self.error: Optional[str] = None
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = round(seconds, 3)
+        PIPELINE_STAGE_SECONDS.observe(seconds, stage=name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "queued_seconds": round((self.started_at or end) - self.created_at, 3),
+            "processing_seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "stages": self.stages,
+            "birds_found": len(self.detections),
+            "detections": self.detections,
+            "error": self.error,
+            "trace_url": f"/api/debug/traces/{self.id}",
+        }
+
+
+class JobQueue:
+    """A bounded FIFO of jobs drained by a fixed number of worker threads."""
+
+    def __init__(self, handler: Callable[[Job], None], workers: int, max_size: int, history: int):
+        self.handler = handler
+        self.workers = workers
+        self.history = history
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_size)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"upload-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout=30)
+        self._threads = []
+
+    def submit(self, job_id: str, params: Dict[str, Any], block: bool = False) -> Job:
+        """Queue a job. Raises QueueFullError when full, unless `block` waits for room instead."""
+        job = Job(job_id, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+        try:
+            self._queue.put(job, block=block)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            UPLOADS_TOTAL.inc(outcome="rejected")
+            raise QueueFullError("Upload queue is full")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def running(self) -> int:
+        return self._running
+
+    def _trim_history(self) -> None:
+        # Forget the oldest finished jobs once we hold more than `history`
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].state in ("done", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            job.state = "running"
+            job.started_at = time.time()
+            job.record_stage("queued", job.started_at - job.created_at)
+            with self._lock:
+                self._running += 1
+            try:
+                self.handler(job)
+                job.state = "done"
+            except Exception as e:
+                job.state = "failed"
+                job.error = str(e)
+                print(f"❌ Job {job.id} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._running -= 1
+                UPLOADS_TOTAL.inc(outcome=job.state)
+                self._queue.task_done()
+
+
+def recover_jobs() -> int:
+    """
+    Re-queue the uploads a restart interrupted: a 202 told the device not to retry, so
+    every session still queued or processing is run again from its saved recording. Those
+    whose recording is gone are marked failed. Returns how many were re-queued.
+    """
+    recovered = []
+    for session in unfinished_sessions():
+        audio_path = os.path.join(STORAGE_DIR, os.path.basename(session["audio_url"] or ""))
+        if not session["audio_url"] or not os.path.isfile(audio_path):
+            save_session(session["id"], "failed")
+            print(f"❌ Job {session['id']} lost its recording, marked failed")
+            continue
+        if session["status"] != "queued":
+            save_session(session["id"], "queued")
+        recovered.append((session["id"], {
+            "audio_path": audio_path,
+            "recorded_at": session["recorded_at"],
+            "lat": session["lat"],
+            "lon": session["lon"],
+        }))
+
+    def resubmit() -> None:
+        # Waits for room rather than rejecting: these uploads were already accepted
+        for job_id, params in recovered:
+            upload_jobs.submit(job_id, params, block=True)
+
+    if recovered:
+        threading.Thread(target=resubmit, name="upload-recovery", daemon=True).start()
+    return len(recovered)
+
+
+upload_jobs = JobQueue(process_upload, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY)
+QUEUE_DEPTH.set_function(upload_jobs.pending, queue="uploads")
+UPLOADS_IN_FLIGHT.set_function(upload_jobs.running)
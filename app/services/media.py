@@ -0,0 +1,156 @@
+"""
+Media Service - Renders session and detection spectrograms on first request.
+Images are drawn from the session's mel sidecar (computed from the stored audio if
+missing) on the render workers and kept in the render cache instead of being
+produced at upload time.
+"""
+import os
+import re
+import uuid
+from typing import Optional, Dict, Any
+
+from .audio import AudioContext
+from . import render_pool, tracing
+from .render_cache import render_cache
+from .sessions import get_session, get_session_detections
+from .spectrogram import (
+    MelSpectrogram, compute_mel, save_mel, load_mel, mel_sidecar_paths,
+    generate_session_spectrogram, generate_single_spectrogram,
+    TILE_WIDTH, tile_levels, tile_info, render_tile,
+)
+from ..config import STORAGE_DIR, SPECTROGRAM_FORMAT
+
+SESSION_ID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+# Detection columns drawn on spectrograms
+OVERLAY_COLUMNS = ["species", "start_time", "end_time"]
+
+IMAGE_FORMATS = ("png", "webp")
+
+# {session uuid}{optional detection index}.{png|webp}
+IMAGE_NAME = re.compile(r"^(?P<session>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(?P<index>\d*)\.(?P<ext>png|webp)$")
+
+# {session uuid}.mel.{npy|json}
+MEL_NAME = re.compile(r"^(?P<session>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.mel\.(?P<ext>npy|json)$")
+
+
+def get_session_mel(session_id: str) -> Optional[MelSpectrogram]:
+    """
+    The session's mel matrix from its sidecar, recomputing it from the audio if needed.
+    Runs the STFT in the calling process: use it on render workers, not request threads.
+    """
+    mel = load_mel(session_id)
+    if mel is not None:
+        return mel
+
+    audio_path = os.path.join(STORAGE_DIR, f"{session_id}.wav")
+    if not os.path.exists(audio_path):
+        return None
+    mel = compute_mel(AudioContext(audio_path))
+    save_mel(session_id, mel)
+    return mel
+
+
+def build_session_mel(session_id: str) -> None:
+    """Write the session's mel sidecar if it is missing (render worker task)."""
+    get_session_mel(session_id)
+
+
+def load_session_mel(session_id: str) -> Optional[MelSpectrogram]:
+    """
+    The session's mel matrix for a request thread: memory-mapped from its sidecar, which
+    a render worker computes first if it is missing. Raises RenderError if that fails.
+    """
+    mel = load_mel(session_id)
+    if mel is None and os.path.exists(os.path.join(STORAGE_DIR, f"{session_id}.wav")):
+        _render(f"{session_id}.mel", build_session_mel, session_id)
+        mel = load_mel(session_id)
+    return mel
+
+
+def render_image(filename: str, image_path: str) -> None:
+    """Render the spectrogram that `filename` names into image_path."""
+    match = IMAGE_NAME.match(filename)
+    session_id, index = match.group("session"), match.group("index")
+
+    mel = get_session_mel(session_id)
+    if mel is None:
+        return
+
+    rows = get_session_detections(session_id, OVERLAY_COLUMNS)
+    birds = [
+        {"common_name": row["species"], "start_time": row["start_time"], "end_time": row["end_time"]}
+        for row in rows if row["start_time"] is not None
+    ]
+    session = get_session(session_id) or {}
+    recorded_at, lat, lon = session.get("recorded_at"), session.get("lat"), session.get("lon")
+
+    if not index:
+        generate_session_spectrogram(mel, image_path, birds, recorded_at, lat, lon)
+    elif int(index) < len(birds):
+        generate_single_spectrogram(mel, image_path, birds[int(index)], recorded_at, lat, lon)
+
+
+def render_session_tile(session_id: str, z: int, x: int, image_path: str) -> None:
+    """Render one tile of the session's pyramid into image_path."""
+    render_tile(get_session_mel(session_id), z, x, image_path)
+
+
+def _render(name: str, fn, *args) -> None:
+    # Every cache miss gets its own trace so slow renders show up next to uploads
+    with tracing.trace(str(uuid.uuid4()), f"render {name}"):
+        render_pool.run(fn, *args)
+
+
+def get_image(filename: str) -> Optional[str]:
+    """
+    Path to a rendered spectrogram image, rendering it on a cache miss. None if unknown.
+    The image is encoded in the format its extension names, whatever SPECTROGRAM_FORMAT is.
+    """
+    if not IMAGE_NAME.match(filename):
+        return None
+    return render_cache.get_or_render(filename, lambda tmp_path: _render(filename, render_image, filename, tmp_path))
+
+
+def get_mel_sidecar(filename: str) -> Optional[str]:
+    """
+    Path to a session's mel sidecar file, computing it from the audio for sessions stored
+    before sidecars were kept. None if unknown.
+    """
+    match = MEL_NAME.match(filename)
+    if not match or load_session_mel(match.group("session")) is None:
+        return None
+    npy_path, json_path = mel_sidecar_paths(match.group("session"))
+    return npy_path if match.group("ext") == "npy" else json_path
+
+
+def get_tile_info(session_id: str) -> Optional[Dict[str, Any]]:
+    """Tile pyramid geometry plus the detections to overlay on it. None if unknown."""
+    if not SESSION_ID.match(session_id):
+        return None
+    mel = load_session_mel(session_id)
+    if mel is None:
+        return None
+
+    info = tile_info(mel)
+    info["format"] = SPECTROGRAM_FORMAT  # Extension of the tile URLs to request
+    info["detections"] = [
+        {"species": row["species"], "start_time": row["start_time"], "end_time": row["end_time"]}
+        for row in get_session_detections(session_id, OVERLAY_COLUMNS) if row["start_time"] is not None
+    ]
+    return info
+
+
+def get_tile(session_id: str, z: int, x: int, fmt: str = SPECTROGRAM_FORMAT) -> Optional[str]:
+    """Path to tile x of zoom level z in `fmt`, rendering it on a cache miss. None if out of range."""
+    if not SESSION_ID.match(session_id) or fmt not in IMAGE_FORMATS:
+        return None
+    mel = load_session_mel(session_id)
+    if mel is None or not 0 <= z <= tile_levels(mel):
+        return None
+    frames_per_tile = TILE_WIDTH * 2 ** (tile_levels(mel) - z)
+    if not 0 <= x * frames_per_tile < len(mel.frames):
+        return None
+
+    name = f"{session_id}.tile.{z}.{x}.{fmt}"
+    return render_cache.get_or_render(name, lambda tmp_path: _render(name, render_session_tile, session_id, z, x, tmp_path))
@@ -0,0 +1,172 @@
+"""
+Metrics - In-process counters, gauges and histograms exposed at /metrics in the
+Prometheus text format. Every metric the app reports is declared at the bottom
+of this module so the catalogue lives in one place.
+"""
+import bisect
+import threading
+from typing import Callable, Dict, List, Tuple
+
+# Seconds; spans quick API reads up to multi-minute uploads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self._samples())
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. detections stored."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down. Sampled from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set_function(self, fn: Callable[[], float], **labels: str) -> None:
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._functions.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(fn())}" for key, fn in items]
+
+
+class Histogram(_Metric):
+    """Cumulative buckets plus sum and count, from which p50/p99 can be estimated."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count in each bucket (+Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Upload pipeline
+PIPELINE_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "aviannet_pipeline_stage_seconds", "Time spent in each upload pipeline stage.", ("stage",)
+))
+UPLOADS_TOTAL = REGISTRY.register(Counter(
+    "aviannet_uploads_total", "Uploads by outcome (done, failed, rejected).", ("outcome",)
+))
+UPLOADS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "aviannet_uploads_in_flight", "Uploads currently being processed by a job worker."
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "aviannet_queue_depth", "Work items waiting in each executor queue.", ("queue",)
+))
+DETECTIONS_TOTAL = REGISTRY.register(Counter(
+    "aviannet_detections_total", "Detections stored."
+))
+DB_WRITE_BATCH_SIZE = REGISTRY.register(Histogram(
+    "aviannet_db_write_batch_size", "Queued writes committed together in one transaction.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+))
+
+# Lookups and caches
+SPECIES_LOOKUPS_TOTAL = REGISTRY.register(Counter(
+    "aviannet_species_lookups_total", "Species info lookups by result (cached, fetched, not_found).", ("result",)
+))
+CACHE_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "aviannet_cache_requests_total", "Cache lookups by cache and result (hit, miss).", ("cache", "result")
+))
+
+# HTTP API
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "aviannet_http_request_seconds", "API request latency by route template.", ("method", "route", "status")
+))
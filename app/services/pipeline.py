@@ -0,0 +1,244 @@
+"""
+Upload Pipeline - Everything that happens to a recording after it has been saved:
+AI analysis, mel sidecar and clips, bird photos and the batch insert.
+Spectrogram images are not drawn here; /storage renders them on first request.
+Runs on the job queue workers, never on the event loop.
+"""
+from typing import List, Dict, Any
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import os
+import time
+
+from ..config import STORAGE_DIR, SPECTROGRAM_FORMAT
+from ..database import parse_timestamp, to_epoch_ms, from_epoch_ms
+from .inference_scheduler import analyze_recording
+from .spectrogram import compute_mel, save_mel
+from .audio import AudioContext, generate_single_audio
+from .bird_images import get_bird_photo
+from .metrics import DETECTIONS_TOTAL, QUEUE_DEPTH
+from .sessions import save_session, get_session
+from .response_cache import response_cache
+from .db_writer import db_writer
+from . import tracing
+
+# Thread pool for parallel processing (limit to avoid overloading CPU)
+EXECUTOR = ThreadPoolExecutor(max_workers=4)
+QUEUE_DEPTH.set_function(lambda: EXECUTOR._work_queue.qsize(), queue="pipeline")
+
+
+def process_single_detection(
+    audio: AudioContext,
+    unique_id: str,
+    index: int,
+    bird: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Process a single detection: cut its audio segment. Its image is rendered lazily."""
+    single_image_filename = f"{unique_id}{index}.{SPECTROGRAM_FORMAT}"
+    single_audio_filename = f"{unique_id}{index}.wav"
+    single_audio_path = os.path.join(STORAGE_DIR, single_audio_filename)
+
+    generate_single_audio(audio, single_audio_path, bird["start_time"], bird["end_time"])
+
+    return {
+        "index": index,
+        "single_image_filename": single_image_filename,
+        "single_audio_filename": single_audio_filename,
+    }
+
+
+def fetch_bird_photos_background(unique_species: List[str]):
+    """Background task to fetch bird photos for unique species."""
+    for species in unique_species:
+        try:
+            get_bird_photo(species)
+            print(f"📸 Fetched photo for {species}")
+        except Exception as e:
+            print(f"❌ Failed to fetch photo for {species}: {e}")
+
+
+def insert_detections(session_id: str, batch_data: List[tuple]) -> Future:
+    """
+    Queue one upload's detection rows on the database writer. They are inserted, added to
+    the analytics rollups and the session marked done in one transaction, possibly shared
+    with other uploads; the future resolves once that has committed.
+    """
+    def write(conn) -> None:
+        conn.executemany(
+            """
+            INSERT INTO detections
+            (timestamp, lat, lon, species, confidence, audio_url, single_audio_url, image_url, single_image_url, bird_photo_url, start_time, end_time, ts_ms, session_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            batch_data
+        )
+        conn.execute("UPDATE sessions SET status = 'done' WHERE id = ?", (session_id,))
+
+    return db_writer.submit(write, rows=len(batch_data))
+
+
+def process_upload(job) -> None:
+    """Run the full pipeline for one queued upload under a trace named after the job."""
+    with tracing.trace(job.id, "upload", audio=os.path.basename(job.params["audio_path"])):
+        tracing.record_span("queued", job.created_at, job.started_at or time.time())
+        try:
+            _run_pipeline(job)
+        except Exception:
+            save_session(job.id, "failed")
+            raise
+
+
+def _run_pipeline(job) -> None:
+    """Every stage of one upload, recording stage timings on the job."""
+    unique_id = job.id
+    audio_path = job.params["audio_path"]
+    recorded_at = job.params["recorded_at"]
+    lat = job.params["lat"]
+    lon = job.params["lon"]
+
+    audio_filename = os.path.basename(audio_path)
+    image_filename = f"{unique_id}.{SPECTROGRAM_FORMAT}"
+
+    start_time = time.time()
+
+    # Decode once; every stage below reads this buffer
+    with tracing.span("decode"):
+        audio = AudioContext(audio_path)
+
+    decode_time = time.time()
+    job.record_stage("decode", decode_time - start_time)
+    print(f"⏱️ Decode: {decode_time - start_time:.2f}s ({audio.duration:.1f}s of audio)")
+
+    # --- B. RUN AI (FIRST) ---
+    print(f"🔍 Analyzing {unique_id}...")
+    detections = []
+
+    # Recording start as the upload parsed it (parse_timestamp, or the upload time if unreadable)
+    session = get_session(unique_id)
+    if session and session["recorded_at_ms"] is not None:
+        start_time_obj = from_epoch_ms(session["recorded_at_ms"])
+    else:
+        start_time_obj = parse_timestamp(recorded_at) or datetime.now()
+
+    save_session(
+        unique_id, "processing",
+        duration=audio.duration,
+        image_url=f"/storage/{image_filename}",
+    )
+
+    with tracing.span("analysis") as span:
+        try:
+            detections = analyze_recording(audio, lat, lon, start_time_obj, min_conf=0.7)
+        except Exception as e:
+            span.set(error=str(e))
+            print(f"❌ AI Error: {e}")
+        span.set(detections=len(detections))
+
+    ai_time = time.time()
+    job.record_stage("analysis", ai_time - decode_time)
+    print(f"⏱️ AI Analysis: {ai_time - decode_time:.2f}s - Found {len(detections)} birds")
+
+    # --- C. PARALLEL PROCESSING ---
+    with tracing.span("processing", clips=len(detections)):
+        # One STFT per session while the audio is decoded; images are later sliced from it
+        mel_future = tracing.submit(EXECUTOR, lambda: save_mel(unique_id, compute_mel(audio)), name="mel")
+
+        # Submit all audio segments in parallel
+        futures = []
+        for i, bird in enumerate(detections):
+            future = tracing.submit(EXECUTOR, process_single_detection, audio, unique_id, i, bird, name=f"clip {i}")
+            futures.append(future)
+
+        # Collect results as they complete
+        processed_detections = {}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+                processed_detections[result["index"]] = result
+            except Exception as e:
+                print(f"❌ Processing error: {e}")
+
+        # Wait for the mel sidecar to be written
+        try:
+            mel_future.result()
+        except Exception as e:
+            print(f"❌ Mel spectrogram error: {e}")
+
+    process_time = time.time()
+    job.record_stage("processing", process_time - ai_time)
+    print(f"⏱️ Parallel Processing: {process_time - ai_time:.2f}s")
+
+    # --- D. GET BIRD PHOTOS (with deduplication) ---
+    unique_species = list(set(bird.get('common_name', 'Unknown') for bird in detections))
+    species_photos = {}
+
+    with tracing.span("photos", species=len(unique_species)):
+        for species in unique_species:
+            try:
+                photo_url = get_bird_photo(species)
+                species_photos[species] = photo_url
+            except Exception as e:
+                print(f"❌ Photo error for {species}: {e}")
+                species_photos[species] = None
+
+    photo_time = time.time()
+    job.record_stage("photos", photo_time - process_time)
+    print(f"⏱️ Photo Fetching ({len(unique_species)} species): {photo_time - process_time:.2f}s")
+
+    # --- E. BATCH INSERT TO DB ---
+    batch_data = []
+    results = []
+    for i, bird in enumerate(detections):
+        species_name = bird.get('common_name') or bird.get('label', 'Unknown Bird')
+        start_seconds = bird.get('start_time', 0.0)
+        exact_time = start_time_obj + timedelta(seconds=start_seconds)
+
+        # Get processed filenames
+        processed = processed_detections.get(i, {})
+        single_image_filename = processed.get("single_image_filename", f"{unique_id}{i}.{SPECTROGRAM_FORMAT}")
+        single_audio_filename = processed.get("single_audio_filename", f"{unique_id}{i}.wav")
+
+        # Get photo from deduplicated cache
+        bird_photo_url = species_photos.get(species_name)
+
+        batch_data.append((
+            exact_time,
+            lat,
+            lon,
+            species_name,
+            bird["confidence"],
+            f"/storage/{audio_filename}",
+            f"/storage/{single_audio_filename}",
+            f"/storage/{image_filename}",
+            f"/storage/{single_image_filename}",
+            bird_photo_url,
+            bird.get("start_time"),
+            bird.get("end_time"),
+            to_epoch_ms(exact_time),
+            unique_id,
+        ))
+        results.append({
+            "timestamp": str(exact_time),
+            "species": species_name,
+            "confidence": bird["confidence"],
+            "start_time": bird.get("start_time"),
+            "end_time": bird.get("end_time"),
+            "single_audio_url": f"/storage/{single_audio_filename}",
+            "single_image_url": f"/storage/{single_image_filename}",
+        })
+        print(f"✅ Found {species_name} at {exact_time}")
+
+    # Batch insert all at once, waiting for the writer to commit it
+    with tracing.span("insert_detections", rows=len(batch_data)):
+        insert_detections(unique_id, batch_data).result()
+    DETECTIONS_TOTAL.inc(len(batch_data))
+    response_cache.bump()
+
+    db_time = time.time()
+    job.record_stage("db_insert", db_time - photo_time)
+    print(f"⏱️ DB Insert: {db_time - photo_time:.2f}s")
+
+    total_time = time.time() - start_time
+    print(f"✨ TOTAL TIME: {total_time:.2f}s for {len(detections)} detections")
+
+    job.detections = results
@@ -0,0 +1,116 @@
+"""
+Render Cache - A disk cache for generated images with LRU eviction under a byte budget.
+File mtimes double as the recency list, so the cache survives restarts without an index.
+"""
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from ..config import RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES
+from .metrics import CACHE_REQUESTS_TOTAL
+
+
+class _KeyLock:
+    """A per-name render lock and how many requests hold or wait on it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class RenderCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, _KeyLock] = {}
+        self._size = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.is_file()
+        )
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def touch(self, name: str) -> Optional[str]:
+        """Mark an entry as most recently used. Its path, or None if it is not cached."""
+        path = self.path_for(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get(self, name: str) -> Optional[str]:
+        path = self.touch(name)
+        if path:
+            CACHE_REQUESTS_TOTAL.inc(cache="render", result="hit")
+        return path
+
+    def get_or_render(self, name: str, render: Callable[[str], None]) -> Optional[str]:
+        """
+        Return the cached file, rendering it with render(tmp_path) on a miss.
+        Concurrent requests for the same name wait for a single render.
+        """
+        path = self.get(name)
+        if path:
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, _KeyLock())
+            key_lock.users += 1
+        try:
+            with key_lock.lock:
+                path = self.get(name)
+                if path:
+                    return path
+                CACHE_REQUESTS_TOTAL.inc(cache="render", result="miss")
+
+                path = self.path_for(name)
+                root, ext = os.path.splitext(path)
+                tmp_path = f"{root}.tmp{ext}"
+                try:
+                    render(tmp_path)
+                except Exception:
+                    # Don't leave a half-written file behind a failed render
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                if not os.path.exists(tmp_path):
+                    return None
+                os.replace(tmp_path, path)
+
+                with self._lock:
+                    self._size += os.path.getsize(path)
+        finally:
+            # Dropped by the last user only, so a later request cannot pair a fresh lock with one still held
+            with self._lock:
+                key_lock.users -= 1
+                if key_lock.users == 0:
+                    del self._key_locks[name]
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            files = [e for e in os.scandir(self.directory) if e.is_file()]
+            # Resync with the directory: files rewritten in place were counted twice
+            self._size = sum(e.stat().st_size for e in files)
+            entries = sorted(
+                # Skip renders still in progress
+                (e for e in files if ".tmp." not in e.name),
+                key=lambda e: e.stat().st_mtime,
+            )
+            for entry in entries:
+                if self._size <= self.max_bytes:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self._size -= size
+                except FileNotFoundError:
+                    pass
+
+
+render_cache = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES)
@@ -0,0 +1,179 @@
+"""
+Render Workers - Runs spectrogram rendering in a pool of worker processes.
+Renders run truly in parallel across cores and never share matplotlib state, so
+a slow publication-quality image cannot stall or corrupt its neighbours.
+
+Each render is handed to one idle worker over its own pipe. Waiting for a free worker
+does not count against RENDER_TIMEOUT, and a render that overruns it costs only its
+own worker, which is replaced; renders running on the other workers carry on.
+"""
+from multiprocessing.connection import Connection
+from typing import List, Any, Tuple
+import multiprocessing
+import threading
+import time
+
+from ..config import RENDER_WORKERS, RENDER_TIMEOUT, RENDER_QUEUE_TIMEOUT
+from . import tracing
+
+# Spawn rather than fork: the web process already runs threads
+_context = multiprocessing.get_context("spawn")
+
+
+class RenderError(Exception):
+    """A render timed out or its worker died; the request can be retried."""
+
+
+class RenderBusyError(RenderError):
+    """No worker became free in time; the request can be retried."""
+
+
+def _init_worker() -> None:
+    """Select the Agg backend before anything imports matplotlib."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _serve(conn: Connection) -> None:
+    """Worker process main loop: run each (fn, args) received and send back its outcome."""
+    _init_worker()
+    while True:
+        try:
+            fn, args = conn.recv()
+        except EOFError:
+            break
+        try:
+            outcome: Tuple[bool, Any] = (True, fn(*args))
+        except Exception as e:
+            outcome = (False, e)
+        try:
+            conn.send(outcome)
+        except Exception as e:
+            # The result or exception could not be pickled
+            conn.send((False, RenderError(f"{fn.__name__} failed: {e!r}")))
+
+
+class _Worker:
+    """One render process and the parent's end of its pipe."""
+
+    def __init__(self):
+        self.conn, child = _context.Pipe()
+        self.process = _context.Process(target=_serve, args=(child,), name="render-worker", daemon=True)
+        self.process.start()
+        child.close()
+
+    def call(self, fn, args: tuple, timeout: float) -> Any:
+        """fn(*args) on this worker. Raises TimeoutError, or EOFError if the worker died."""
+        self.conn.send((fn, args))
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        ok, value = self.conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def stop(self, timeout: float = 5) -> None:
+        self.conn.close()  # The worker exits on EOF once it finishes its current render
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+
+class RenderPool:
+    """
+    Up to `size` render processes, started on demand. A semaphore admits one render per
+    worker; the rest wait for a slot before their deadline starts.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[_Worker] = []
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> _Worker:
+        """
+        An idle worker, starting one if fewer than `size` are alive. Waits up to `timeout`
+        seconds while all are busy, then raises RenderBusyError.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise RenderBusyError(f"All render workers busy for {timeout}s")
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            worker = _Worker()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def release(self, worker: _Worker) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._idle.append(worker)
+        self._slots.release()
+
+    def discard(self, worker: _Worker) -> None:
+        """Kill one worker; the next render that needs it starts a fresh one."""
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.process.terminate()
+        worker.process.join()
+        worker.conn.close()
+        self._slots.release()
+
+    def call(self, worker: _Worker, fn, args: tuple, timeout: float) -> Any:
+        """fn(*args) on an acquired worker, which is released or discarded afterwards."""
+        try:
+            result = worker.call(fn, args, timeout)
+        except (TimeoutError, EOFError, OSError):
+            # Hung (it would otherwise hold its worker forever) or died (e.g. OOM)
+            self.discard(worker)
+            raise
+        except BaseException:
+            self.release(worker)  # The render itself failed; its worker is fine
+            raise
+        self.release(worker)
+        return result
+
+    def stop(self) -> None:
+        with self._lock:
+            workers, self._workers, self._idle = self._workers, [], []
+        for worker in workers:
+            worker.stop()
+
+
+_pool = RenderPool(RENDER_WORKERS)
+
+
+def stop_workers() -> None:
+    _pool.stop()
+
+
+def run(fn, *args, timeout: float = RENDER_TIMEOUT, queue_timeout: float = RENDER_QUEUE_TIMEOUT) -> None:
+    """
+    Run fn(*args) on a render worker: wait up to `queue_timeout` seconds for one to be
+    free, then up to `timeout` seconds for the render itself. Inside a trace, the worker's
+    spans are brought back and nested under this call.
+    """
+    try:
+        with tracing.span("render_pool", task=fn.__name__) as span:
+            queued = time.time()
+            worker = _pool.acquire(queue_timeout)
+            span.set(queued_ms=round((time.time() - queued) * 1000, 1))
+            if tracing.active():
+                _, spans = _pool.call(worker, tracing.collect, (fn, *args), timeout)
+                tracing.adopt(spans)
+            else:
+                _pool.call(worker, fn, args, timeout)
+    except TimeoutError:
+        print(f"❌ Render timed out after {timeout}s: {fn.__name__}{args}")
+        raise RenderError(f"Render timed out after {timeout}s")
+    except (EOFError, OSError) as e:
+        raise RenderError("Render worker died") from e
@@ -0,0 +1,102 @@
+"""
+Response Cache - Keeps rendered JSON responses of the read-only dashboard endpoints,
+tagged with the data version they were computed at. Anything that changes what those
+endpoints return calls bump(); until then repeat requests are served from memory, and
+clients that send the ETag back get a bodiless 304.
+
+Jobs that change the data from another process (archiving, rollup rebuilds) call
+bump_shared() instead, which increments a version stored in the database that every
+server checks before using an entry.
+"""
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Any, Tuple
+from urllib.parse import urlencode
+
+from ..config import RESPONSE_CACHE_ENTRIES
+from ..database import get_db_connection
+
+# Path prefixes whose GET responses are cached
+CACHED_PATHS = ("/api/analytics/", "/api/species-summary", "/api/species/search", "/api/detections/heatmap")
+
+
+class CachedResponse:
+    def __init__(self, version: Tuple[int, int], body: bytes, content_type: Optional[str], route: Any):
+        self.version = version
+        self.body = body
+        self.content_type = content_type
+        self.route = route  # Starlette route, so hits are still labelled by template in metrics
+        # From the body alone: a recomputation that changes nothing keeps clients' copies valid
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """This process's version and the one shared through the database."""
+        return self._version, shared_version()
+
+    def bump(self) -> None:
+        """Invalidate every cached response. Stale entries are replaced as they are requested."""
+        with self._lock:
+            self._version += 1
+
+    def get(self, key: Tuple[str, str]) -> Optional[CachedResponse]:
+        version = self.version
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple[str, str], entry: CachedResponse) -> None:
+        version = self.version
+        with self._lock:
+            # Computed before a bump that landed meanwhile: serving it would be stale
+            if entry.version != version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def shared_version() -> int:
+    conn = get_db_connection()
+    version = conn.execute("SELECT version FROM response_cache_version").fetchone()[0]
+    conn.close()
+    return version
+
+
+def bump_shared(conn: sqlite3.Connection) -> None:
+    """Invalidate the cached responses of every server on this database, in the caller's transaction."""
+    conn.execute("UPDATE response_cache_version SET version = version + 1")
+
+
+def is_cacheable(method: str, path: str) -> bool:
+    return method == "GET" and path.startswith(CACHED_PATHS)
+
+
+def cache_key(path: str, params: list) -> Tuple[str, str]:
+    """Route and query parameters, with parameter order normalised."""
+    return path, urlencode(sorted(params))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 weak comparison against an If-None-Match header."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_ENTRIES)
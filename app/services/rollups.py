@@ -0,0 +1,122 @@
+"""
+Analytics Rollups - Per-species totals and per-hour counts and confidence histograms,
+kept up to date in the same transaction that inserts detections. The dashboards read
+these instead of scanning detections, so their cost grows with species x hours only.
+
+Rebuild from scratch (e.g. after editing detections by hand):
+
+    python -m app.services.rollups
+"""
+import sqlite3
+import time
+from typing import Sequence, Any
+
+HOUR_MS = 3600 * 1000
+
+# Confidence histogram bins: label and lower bound. The first bin also takes anything below 75%.
+CONFIDENCE_BINS = [
+    ("70-75%", 0.70),
+    ("75-80%", 0.75),
+    ("80-85%", 0.80),
+    ("85-90%", 0.85),
+    ("90-95%", 0.90),
+    ("95-100%", 0.95),
+]
+
+# Bin index by integer division into 5% steps, clamped to the bins above
+CONFIDENCE_BIN_SQL = f"MIN(MAX(CAST(confidence * 20 AS INTEGER) - 14, 0), {len(CONFIDENCE_BINS) - 1})"
+
+ROLLUP_TABLES = ("rollup_species", "rollup_species_hourly", "rollup_confidence_hourly")
+
+SCHEMA = (
+    # Lifetime totals; first/last seen as ts_ms
+    """CREATE TABLE IF NOT EXISTS rollup_species
+             (species TEXT PRIMARY KEY,
+              detections INTEGER NOT NULL,
+              confidence_sum REAL NOT NULL,
+              first_seen_ms INTEGER,
+              last_seen_ms INTEGER) WITHOUT ROWID""",
+    # hour_ms is the start of the hour (ts_ms floored); detections without a time are left out
+    """CREATE TABLE IF NOT EXISTS rollup_species_hourly
+             (hour_ms INTEGER NOT NULL,
+              species TEXT NOT NULL,
+              detections INTEGER NOT NULL,
+              confidence_sum REAL NOT NULL,
+              PRIMARY KEY (hour_ms, species)) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_rollup_species_hourly_species ON rollup_species_hourly (species, hour_ms)",
+    """CREATE TABLE IF NOT EXISTS rollup_confidence_hourly
+             (hour_ms INTEGER NOT NULL,
+              species TEXT NOT NULL,
+              bin INTEGER NOT NULL,
+              detections INTEGER NOT NULL,
+              PRIMARY KEY (hour_ms, species, bin)) WITHOUT ROWID""",
+)
+
+
+def create_tables(conn: sqlite3.Connection) -> None:
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def apply(conn: sqlite3.Connection, where: str, params: Sequence[Any] = (), source: str = "detections") -> None:
+    """
+    Add the detections matching `where` to the rollups. Runs inside the caller's
+    transaction, so the rollups commit (or roll back) together with the rows. `source`
+    is any table with the detections' ts_ms, species and confidence columns.
+    """
+    conn.execute(
+        f"""INSERT INTO rollup_species (species, detections, confidence_sum, first_seen_ms, last_seen_ms)
+            SELECT species, COUNT(*), TOTAL(confidence), MIN(ts_ms), MAX(ts_ms)
+            FROM {source} WHERE {where} GROUP BY species
+            ON CONFLICT (species) DO UPDATE SET
+                detections = detections + excluded.detections,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                first_seen_ms = MIN(COALESCE(first_seen_ms, excluded.first_seen_ms), COALESCE(excluded.first_seen_ms, first_seen_ms)),
+                last_seen_ms = MAX(COALESCE(last_seen_ms, excluded.last_seen_ms), COALESCE(excluded.last_seen_ms, last_seen_ms))""",
+        params,
+    )
+    conn.execute(
+        f"""INSERT INTO rollup_species_hourly (hour_ms, species, detections, confidence_sum)
+            SELECT ts_ms - ts_ms % {HOUR_MS}, species, COUNT(*), TOTAL(confidence)
+            FROM {source} WHERE ({where}) AND ts_ms IS NOT NULL GROUP BY 1, 2
+            ON CONFLICT (hour_ms, species) DO UPDATE SET
+                detections = detections + excluded.detections,
+                confidence_sum = confidence_sum + excluded.confidence_sum""",
+        params,
+    )
+    conn.execute(
+        f"""INSERT INTO rollup_confidence_hourly (hour_ms, species, bin, detections)
+            SELECT ts_ms - ts_ms % {HOUR_MS}, species, {CONFIDENCE_BIN_SQL}, COUNT(*)
+            FROM {source} WHERE ({where}) AND ts_ms IS NOT NULL GROUP BY 1, 2, 3
+            ON CONFLICT (hour_ms, species, bin) DO UPDATE SET
+                detections = detections + excluded.detections""",
+        params,
+    )
+
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """Recompute every rollup from the detections table and the archive, in one transaction."""
+    from . import archive, response_cache
+    from .detections import DetectionFilter
+
+    columns = ["ts_ms", "species", "confidence"]
+    with conn:
+        conn.execute("BEGIN")
+        create_tables(conn)
+        for table in ROLLUP_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        apply(conn, "1")
+        # One archived partition at a time, so memory stays bounded by a month of rows
+        for path in archive.partitions(conn):
+            with archive.temp_table(conn, "archived", [archive.iter_partition(path, DetectionFilter(), columns)], columns):
+                apply(conn, "1", source="temp.archived")
+        response_cache.bump_shared(conn)
+
+
+if __name__ == "__main__":
+    from ..database import get_db_connection, init_db
+
+    init_db()
+    start = time.time()
+    rebuild(get_db_connection())
+    print(f"📊 Rebuilt analytics rollups in {time.time() - start:.2f}s")
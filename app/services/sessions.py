@@ -0,0 +1,161 @@
+"""
+Session Service - One row per uploaded recording, written as the upload moves through
+the pipeline (queued -> processing -> done | failed). Detections point at their session,
+so loading one recording is an indexed lookup instead of a scan of every detection.
+"""
+import json
+from typing import Optional, List, Dict, Any, Tuple
+
+from ..database import get_db_connection
+from .db_writer import db_writer
+from .detections import DetectionFilter
+
+SESSION_COLUMNS = (
+    "id", "device", "recorded_at", "recorded_at_ms", "lat", "lon",
+    "duration", "audio_url", "image_url", "status", "created_at",
+)
+
+
+def save_session(session_id: str, status: str, **fields: Any) -> None:
+    """Create the session or update its status and the given columns."""
+    columns = ["id", "status", *fields]
+    unknown = set(columns) - set(SESSION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown session columns: {sorted(unknown)}")
+
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+
+    def write(conn):
+        conn.execute(
+            f"""INSERT INTO sessions ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})
+                ON CONFLICT (id) DO UPDATE SET {updates}""",
+            (session_id, status, *fields.values()),
+        )
+
+    db_writer.submit(write).result()
+
+
+def delete_session(session_id: str) -> None:
+    """Forget a session that never made it into the queue."""
+
+    def write(conn):
+        conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    db_writer.submit(write).result()
+
+
+def unfinished_sessions() -> List[Dict[str, Any]]:
+    """Sessions still queued or processing, oldest upload first: the jobs a restart interrupted."""
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT * FROM sessions WHERE status IN ('queued', 'processing') ORDER BY created_at, id"
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def encode_cursor(recorded_at_ms: int, session_id: str) -> str:
+    return f"{recorded_at_ms}_{session_id}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, str]]:
+    """(recorded_at_ms, id) of the last session on the previous page, or None if malformed."""
+    ms, _, session_id = cursor.partition("_")
+    try:
+        return int(ms), session_id
+    except ValueError:
+        return None
+
+
+def list_sessions(limit: int, cursor: Optional[Tuple[int, str]] = None) -> Dict[str, Any]:
+    """
+    Newest recordings first with their detection count and species, one page at a time. The cursor is the sort key of the last
+    row already seen, so each page is an index range scan however deep the client pages.
+    """
+    where, params = "", []
+    if cursor is not None:
+        where = "WHERE (s.recorded_at_ms, s.id) < (?, ?)"
+        params = list(cursor)
+
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"""SELECT s.*,
+                   (SELECT COUNT(*) FROM detections d WHERE d.session_id = s.id) AS detection_count,
+                   (SELECT json_group_array(DISTINCT species) FROM detections d WHERE d.session_id = s.id) AS species
+            FROM sessions s {where}
+            ORDER BY s.recorded_at_ms DESC, s.id DESC
+            LIMIT ?""",
+        (*params, limit + 1),
+    ).fetchall()
+    conn.close()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last["recorded_at_ms"], last["id"])
+    sessions = []
+    for row in page:
+        session = dict(row)
+        session["species"] = [name for name in json.loads(session["species"]) if name is not None]
+        sessions.append(session)
+    return {"sessions": sessions, "next_cursor": next_cursor}
+
+
+def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """The session row, without its detections. None if unknown."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def get_session_detections(session_id: str, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    One session's detections (all columns, or `columns`) in the order they were found,
+    which is also their image index. Detections already moved to the archive are included.
+    """
+    conn = get_db_connection()
+    cursor = conn.execute(
+        f"SELECT {', '.join(columns) if columns else '*'}, id FROM detections WHERE session_id = ? ORDER BY id",
+        (session_id,),
+    )
+    names = [description[0] for description in cursor.description]
+    rows = [tuple(row) for row in cursor]
+    archived = _archived_detections(conn, session_id, names)
+    conn.close()
+    if archived:
+        rows = sorted(archived + rows, key=lambda row: row[-1])
+    # The trailing id is only there for ordering
+    return [dict(zip(names[:-1], row[:-1])) for row in rows]
+
+
+def _archived_detections(conn, session_id: str, columns: List[str]) -> List[tuple]:
+    session = conn.execute("SELECT recorded_at_ms, duration FROM sessions WHERE id = ?", (session_id,)).fetchone()
+    if session is None:
+        return []
+    # Only partitions overlapping the recording, when its time is known
+    start_ms, end_ms = session["recorded_at_ms"], None
+    if start_ms is not None and session["duration"] is not None:
+        end_ms = start_ms + int(session["duration"] * 1000) + 1
+    archived = conn.execute(
+        "SELECT 1 FROM archive_partitions WHERE max_ts_ms >= ? AND min_ts_ms < ? LIMIT 1",
+        (start_ms if start_ms is not None else -(2 ** 63), end_ms if end_ms is not None else 2 ** 63 - 1),
+    ).fetchone()
+    if archived is None:
+        return []
+
+    # Imported here so render workers only load pyarrow for archived sessions
+    from . import archive
+
+    filters = DetectionFilter(session_id=session_id, start_ms=start_ms, end_ms=end_ms)
+    return [row for stream in archive.iter_cold(conn, filters, columns) for row in stream]
+
+
+def get_session_with_detections(session_id: str) -> Optional[Dict[str, Any]]:
+    """The session plus its detections in the order they were found. None if unknown."""
+    session = get_session(session_id)
+    if session is None:
+        return None
+    session["detections"] = get_session_detections(session_id)
+    return session
@@ -0,0 +1,113 @@
+"""
+Species Search - An FTS5 index over the cached species info (name, scientific name,
+description, region), so the species browser can look up a few typed letters without
+downloading the whole catalog. Triggers on the species table keep it in step with every
+insert, update and delete, whoever makes them.
+
+Rebuild from scratch (e.g. after editing the species table by hand):
+
+    python -m app.services.species_search
+"""
+import re
+import sqlite3
+import time
+from typing import Optional, Dict, Any
+
+from ..database import get_db_connection
+
+INDEXED_COLUMNS = ("name", "scientific_name", "description", "region")
+
+# bm25 weight per indexed column: a hit in the name outranks one in the description
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+SCHEMA = (
+    # rowid is species.id. Diacritics are folded so "cafe" finds "Café"; 2 and 3 letter
+    # prefixes are indexed so the first keystrokes are lookups rather than term scans.
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS species_fts USING fts5
+             ({", ".join(INDEXED_COLUMNS)},
+              tokenize = 'unicode61 remove_diacritics 2',
+              prefix = '2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS species_fts_insert AFTER INSERT ON species
+        BEGIN
+            DELETE FROM species_fts WHERE rowid = NEW.id;
+            INSERT INTO species_fts (rowid, {", ".join(INDEXED_COLUMNS)})
+                VALUES (NEW.id, {", ".join(f"NEW.{column}" for column in INDEXED_COLUMNS)});
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS species_fts_update AFTER UPDATE OF id, {", ".join(INDEXED_COLUMNS)} ON species
+        BEGIN
+            DELETE FROM species_fts WHERE rowid = OLD.id;
+            INSERT INTO species_fts (rowid, {", ".join(INDEXED_COLUMNS)})
+                VALUES (NEW.id, {", ".join(f"NEW.{column}" for column in INDEXED_COLUMNS)});
+        END""",
+    # Rows removed by INSERT OR REPLACE only fire this with recursive_triggers on; the
+    # search joins species on rowid, so an entry left behind that way is never returned
+    """CREATE TRIGGER IF NOT EXISTS species_fts_delete AFTER DELETE ON species
+        BEGIN
+            DELETE FROM species_fts WHERE rowid = OLD.id;
+        END""",
+)
+
+
+def create_index(conn: sqlite3.Connection) -> None:
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def index_all(conn: sqlite3.Connection) -> None:
+    """Index every species row into an empty index. Runs inside the caller's transaction."""
+    conn.execute(
+        f"""INSERT INTO species_fts (rowid, {", ".join(INDEXED_COLUMNS)})
+            SELECT id, {", ".join(INDEXED_COLUMNS)} FROM species"""
+    )
+
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """Re-index every species, in one transaction."""
+    with conn:
+        conn.execute("BEGIN")
+        create_index(conn)
+        conn.execute("DELETE FROM species_fts")
+        index_all(conn)
+
+
+def match_query(text: str) -> Optional[str]:
+    """
+    Free text as an FTS5 query: every word must match as a prefix. Words are quoted,
+    so FTS5 syntax in the input is searched for literally. None if there are no words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_species(text: str, limit: int, offset: int = 0) -> Dict[str, Any]:
+    """One page of species matching `text`, best match first, with the offset of the next page."""
+    query = match_query(text)
+    if query is None:
+        return {"results": [], "next_offset": None}
+
+    weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"""SELECT s.*, bm25(species_fts, {weights}) AS rank
+            FROM species_fts JOIN species s ON s.id = species_fts.rowid
+            WHERE species_fts MATCH ?
+            ORDER BY rank, s.name
+            LIMIT ? OFFSET ?""",
+        (query, limit + 1, offset),
+    ).fetchall()
+    conn.close()
+
+    results = [dict(row) for row in rows[:limit]]
+    next_offset = offset + limit if len(rows) > limit else None
+    return {"results": results, "next_offset": next_offset}
+
+
+if __name__ == "__main__":
+    from ..database import init_db
+
+    init_db()
+    start = time.time()
+    rebuild(get_db_connection())
+    print(f"🔎 Rebuilt the species search index in {time.time() - start:.2f}s")
@@ -1,23 +1,319 @@
 import os
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import json
+from typing import Optional, Tuple
 import librosa
-import librosa.display
 import numpy as np
+from PIL import Image, ImageDraw
 
-def generate_session_spectrogram(audio_path: str, image_path: str, detections: list, recorded_at: str, lat, lon):
+from ..config import STORAGE_DIR, SPECTROGRAM_RENDER_MODE
+from .audio import AudioContext
+from . import tracing
+
+N_MELS = 128
+FMAX = 8000
+HOP_LENGTH = 512  # librosa's default, kept explicit so sidecar readers can map frames to seconds
+# Sidecars are kept for good, so they are stored at half precision (steps of at most 0.06 dB over the 80 dB range)
+SIDECAR_DTYPE = np.float16
+
+# Seconds of context shown either side of a detection in its own image
+SINGLE_PADDING = 2.0
+
+# Fast renderer layout (pixels)
+FAST_ROW_SCALE = 3        # Each mel bin becomes 3 rows -> 384px tall heatmap
+FAST_MIN_WIDTH = 800
+FAST_MAX_WIDTH = 6000     # Longer sessions are max-pooled down to this many columns
+FAST_HEADER = 18          # Title strip above the heatmap
+FAST_LANE_HEIGHT = 14
+
+# Zoomable tile pyramid
+TILE_WIDTH = 512
+TILE_DB_RANGE = (-80.0, 0.0)  # power_to_db(ref=max) with librosa's default top_db
+
+BOX_RGB = np.array([255, 0, 0], dtype=np.float32)
+
+# magma, sampled at 17 evenly spaced points and interpolated to a 256-entry lookup table
+_MAGMA_ANCHORS = np.array([
+    (0, 0, 4), (10, 8, 34), (29, 17, 71), (54, 16, 107), (81, 18, 124), (106, 28, 129),
+    (131, 38, 129), (156, 46, 127), (183, 55, 121), (208, 65, 111), (231, 82, 99),
+    (245, 107, 92), (252, 137, 97), (254, 167, 114), (254, 196, 136), (253, 226, 163),
+    (252, 253, 191),
+], dtype=np.float32)
+COLORMAP_LUT = np.stack([
+    np.interp(np.linspace(0, len(_MAGMA_ANCHORS) - 1, 256), np.arange(len(_MAGMA_ANCHORS)), _MAGMA_ANCHORS[:, c])
+    for c in range(3)
+], axis=1).round().astype(np.uint8)
+
+
+class MelSpectrogram:
+    """
+    A session's dB-scaled mel spectrogram.
+    Stored time-major (frames x mels) so a time range is one contiguous slice of the sidecar.
+    """
+
+    def __init__(self, frames: np.ndarray, sr: int, hop_length: int = HOP_LENGTH):
+        self.frames = frames
+        self.sr = sr
+        self.hop_length = hop_length
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) * self.hop_length / self.sr
+
+    def frame_at(self, seconds: float) -> int:
+        return int(np.clip(round(seconds * self.sr / self.hop_length), 0, len(self.frames)))
+
+    def window(self, start_time: float, end_time: float) -> Tuple[np.ndarray, np.ndarray]:
+        """The (mels x frames) dB matrix for start_time..end_time and the time of each frame."""
+        f0, f1 = self.frame_at(start_time), self.frame_at(end_time)
+        f0 = min(f0, len(self.frames) - 1)
+        f1 = max(f1, f0 + 1)
+        times = librosa.frames_to_time(np.arange(f0, f1), sr=self.sr, hop_length=self.hop_length)
+        return np.asarray(self.frames[f0:f1], dtype=np.float32).T, times
+
+
+def mel_sidecar_paths(unique_id: str) -> Tuple[str, str]:
+    base = os.path.join(STORAGE_DIR, f"{unique_id}.mel")
+    return f"{base}.npy", f"{base}.json"
+
+
+def image_format(image_path: str) -> str:
+    """Encoder for an image path, from its extension (png or webp)."""
+    return os.path.splitext(image_path)[1].lstrip(".").lower()
+
+
+@tracing.traced
+def compute_mel(audio: AudioContext) -> MelSpectrogram:
+    S = librosa.feature.melspectrogram(
+        y=audio.samples, sr=audio.sr, n_mels=N_MELS, fmax=FMAX, hop_length=HOP_LENGTH
+    )
+    S_dB = librosa.power_to_db(S, ref=np.max)
+    return MelSpectrogram(np.ascontiguousarray(S_dB.T, dtype=np.float32), audio.sr)
+
+
+@tracing.traced
+def save_mel(unique_id: str, mel: MelSpectrogram) -> None:
+    """Write the .npy sidecar (plus its .json metadata) next to the session audio."""
+    npy_path, json_path = mel_sidecar_paths(unique_id)
+    # Both written aside and moved into place, so a concurrent reader never sees half a file
+    tmp_path = f"{npy_path}.tmp.npy"
+    np.save(tmp_path, mel.frames.astype(SIDECAR_DTYPE))
+    os.replace(tmp_path, npy_path)
+    with open(f"{json_path}.tmp", "w") as f:
+        json.dump({
+            "sr": mel.sr,
+            "hop_length": mel.hop_length,
+            "n_mels": N_MELS,
+            "fmax": FMAX,
+            "layout": "frames x mels",
+            "dtype": np.dtype(SIDECAR_DTYPE).name,
+            "unit": "dB (ref=max)",
+            "duration": mel.duration,
+        }, f)
+    os.replace(f"{json_path}.tmp", json_path)
+
+
+@tracing.traced
+def load_mel(unique_id: str) -> Optional[MelSpectrogram]:
+    """Memory-map a session's mel sidecar, or None if it was never computed."""
+    npy_path, json_path = mel_sidecar_paths(unique_id)
+    if not (os.path.exists(npy_path) and os.path.exists(json_path)):
+        return None
+    with open(json_path) as f:
+        meta = json.load(f)
+    return MelSpectrogram(np.load(npy_path, mmap_mode="r"), meta["sr"], meta["hop_length"])
+
+
+@tracing.traced
+def encode_image(pixels: np.ndarray, image_path: str) -> None:
+    """Encode an RGB array straight to the path's format, favouring speed over size."""
+    image = pixels if isinstance(pixels, Image.Image) else Image.fromarray(pixels)
+    if image_format(image_path) == "webp":
+        image.save(image_path, format="WEBP", quality=80, method=0)
+    else:
+        image.save(image_path, format="PNG", compress_level=1)
+
+
+def max_pool_columns(S_dB: np.ndarray, factor: int) -> np.ndarray:
+    """Reduce the frame axis of a (mels x frames) matrix by `factor`, keeping the loudest value."""
+    if factor <= 1:
+        return S_dB
+    n_frames = S_dB.shape[1]
+    padded = np.pad(S_dB, ((0, 0), (0, factor * -(-n_frames // factor) - n_frames)), mode="edge")
+    return padded.reshape(S_dB.shape[0], -1, factor).max(axis=2)
+
+
+def colorize(
+    S_dB: np.ndarray,
+    max_width: int = FAST_MAX_WIDTH,
+    min_width: int = FAST_MIN_WIDTH,
+    vmin: Optional[float] = None,
+    vmax: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Map a (mels x frames) dB matrix to an RGB array through COLORMAP_LUT.
+    Low frequencies end up at the bottom; long inputs are max-pooled so short calls survive.
+    The colour range defaults to the matrix's own min/max.
+    """
+    n_frames = S_dB.shape[1]
+    if n_frames > max_width:
+        S_dB = max_pool_columns(S_dB, -(-n_frames // max_width))
+    elif n_frames < min_width:
+        S_dB = S_dB[:, np.arange(min_width) * n_frames // min_width]
+
+    vmin = float(S_dB.min()) if vmin is None else vmin
+    vmax = float(S_dB.max()) if vmax is None else vmax
+    scaled = (np.clip(S_dB, vmin, vmax) - vmin) * (255.0 / max(vmax - vmin, 1e-6))
+    idx = np.repeat(scaled.astype(np.uint8)[::-1], FAST_ROW_SCALE, axis=0)
+    return COLORMAP_LUT[idx]
+
+
+def render_fast(S_dB: np.ndarray, t0: float, t1: float, detections: list, title: str, image_path: str) -> None:
+    """Matplotlib-free render: LUT colouring, boxes and label lanes as array ops, direct encode."""
+    heat = colorize(S_dB)
+    height, width = heat.shape[:2]
+    px_per_sec = width / max(t1 - t0, 1e-6)
+
+    # Translucent red over every detected span, with solid 2px edges
+    spans = []
+    mask = np.zeros(width, dtype=bool)
+    for bird in detections:
+        x0 = int(np.clip((bird["start_time"] - t0) * px_per_sec, 0, width))
+        x1 = int(np.clip((bird["end_time"] - t0) * px_per_sec, 0, width))
+        if x1 <= x0:
+            spans.append(None)
+            continue
+        mask[x0:x1] = True
+        spans.append((x0, x1))
+    heat[:, mask] = (heat[:, mask] * 0.85 + BOX_RGB * 0.15).astype(np.uint8)
+    for span in spans:
+        if span:
+            heat[:, span[0]:span[0] + 2] = BOX_RGB
+            heat[:, span[1] - 2:span[1]] = BOX_RGB
+
+    canvas = np.zeros((FAST_HEADER + height, width, 3), dtype=np.uint8)
+    canvas[FAST_HEADER:] = heat
+
+    # Staggered label lanes: a red bar per label, text drawn on top
+    image = Image.fromarray(canvas)
+    draw = ImageDraw.Draw(image)
+    labels = []
+    for i, (bird, span) in enumerate(zip(detections, spans)):
+        if not span:
+            continue
+        text_width = int(draw.textlength(bird["common_name"])) + 6
+        center = (span[0] + span[1]) // 2
+        x0 = int(np.clip(center - text_width // 2, 0, max(width - text_width, 0)))
+        y0 = FAST_HEADER + 4 + (i % 4) * (FAST_LANE_HEIGHT + 4)
+        canvas[y0:y0 + FAST_LANE_HEIGHT, x0:x0 + text_width] = BOX_RGB
+        labels.append((x0 + 3, y0 + 1, bird["common_name"]))
+
+    image = Image.fromarray(canvas)
+    draw = ImageDraw.Draw(image)
+    draw.text((4, 3), title, fill=(255, 255, 255))
+    for x, y, text in labels:
+        draw.text((x, y), text, fill=(255, 255, 255))
+    encode_image(image, image_path)
+
+
+@tracing.traced
+def generate_session_spectrogram(mel: MelSpectrogram, image_path: str, detections: list, recorded_at: str, lat, lon):
     """Generate the main session spectrogram with all detection boxes."""
+    if SPECTROGRAM_RENDER_MODE == "publication":
+        return _publication_session_spectrogram(mel, image_path, detections, recorded_at, lat, lon)
     try:
-        y, sr = librosa.load(audio_path, sr=None)
-        file_duration = len(y) / sr
+        S_dB, times = mel.window(0, mel.duration)
+        render_fast(
+            S_dB, 0.0, mel.duration, detections,
+            f"Recorded: {recorded_at} | Lat: {lat}, Lon: {lon} | {mel.duration:.1f}s", image_path
+        )
+    except Exception as e:
+        print(f"❌ Spectrogram Error: {e}")
+
+
+@tracing.traced
+def generate_single_spectrogram(mel: MelSpectrogram, single_image_path: str, bird: dict, recorded_at: str, lat, lon):
+    """Generate a spectrogram for a single bird detection, sliced from the session's mel matrix."""
+    if SPECTROGRAM_RENDER_MODE == "publication":
+        return _publication_single_spectrogram(mel, single_image_path, bird, recorded_at, lat, lon)
+    try:
+        view_start = max(0.0, bird["start_time"] - SINGLE_PADDING)
+        view_end = min(mel.duration, bird["end_time"] + SINGLE_PADDING)
+        S_dB, times = mel.window(view_start, view_end)
+        render_fast(
+            S_dB, times[0], times[-1] + mel.hop_length / mel.sr, [bird],
+            f"Recorded: {recorded_at} | Lat: {lat}, Lon: {lon} | {view_start:.1f}-{view_end:.1f}s",
+            single_image_path,
+        )
+    except Exception as e:
+        print(f"❌ Single Spectrogram Error: {e}")
+
+
+def tile_levels(mel: MelSpectrogram) -> int:
+    """Highest zoom level: at max zoom one mel frame is one pixel, each level below halves that."""
+    return max(0, int(np.ceil(np.log2(max(len(mel.frames), 1) / TILE_WIDTH))))
+
+
+def tile_info(mel: MelSpectrogram) -> dict:
+    """Pyramid geometry for a session, so viewers can map time ranges to tile indices."""
+    max_zoom = tile_levels(mel)
+    frame_seconds = mel.hop_length / mel.sr
+    levels = []
+    for z in range(max_zoom + 1):
+        frames_per_tile = TILE_WIDTH * 2 ** (max_zoom - z)
+        levels.append({
+            "zoom": z,
+            "tiles": -(-len(mel.frames) // frames_per_tile),
+            "seconds_per_tile": frames_per_tile * frame_seconds,
+        })
+    return {
+        "tile_width": TILE_WIDTH,
+        "tile_height": N_MELS * FAST_ROW_SCALE,
+        "duration": mel.duration,
+        "max_zoom": max_zoom,
+        "levels": levels,
+    }
+
+
+@tracing.traced
+def render_tile(mel: MelSpectrogram, z: int, x: int, image_path: str) -> None:
+    """
+    Render tile x of zoom level z: TILE_WIDTH pixels, each the max over 2**(max_zoom - z) frames.
+    Every tile uses the same absolute dB scale so neighbouring tiles line up; the last one is padded.
+    """
+    factor = 2 ** (tile_levels(mel) - z)
+    frames_per_tile = TILE_WIDTH * factor
+    block = np.asarray(mel.frames[x * frames_per_tile:(x + 1) * frames_per_tile], dtype=np.float32).T
+    pooled = max_pool_columns(block, factor)
+
+    pixels = np.zeros((N_MELS * FAST_ROW_SCALE, TILE_WIDTH, 3), dtype=np.uint8)
+    if pooled.shape[1]:
+        width = pooled.shape[1]
+        pixels[:, :width] = colorize(pooled, max_width=width, min_width=width, vmin=TILE_DB_RANGE[0], vmax=TILE_DB_RANGE[1])
+    encode_image(pixels, image_path)
+
+
+def _publication_session_spectrogram(mel: MelSpectrogram, image_path: str, detections: list, recorded_at: str, lat, lon):
+    """Matplotlib rendering of the session spectrogram (axes, colorbar, 300 DPI)."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.patches as patches
+    import librosa.display
+
+    try:
+        file_duration = mel.duration
         dynamic_width = min(50, 10 + (file_duration / 10))
 
-        fig, ax = plt.subplots(figsize=(dynamic_width, 6))
+        # Figure/Agg directly: pyplot's global figure registry is not thread-safe
+        fig = Figure(figsize=(dynamic_width, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
 
         # Draw the Heatmap
-        S = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=128, fmax=8000)
-        S_dB = librosa.power_to_db(S, ref=np.max)
-        img = librosa.display.specshow(S_dB, x_axis='time', y_axis='mel', sr=sr, fmax=8000, ax=ax)
+        S_dB, times = mel.window(0, file_duration)
+        img = librosa.display.specshow(
+            S_dB, x_coords=times, x_axis='time', y_axis='mel',
+            sr=mel.sr, hop_length=mel.hop_length, fmax=FMAX, ax=ax
+        )
 
         # Add Colorbar
         fig.colorbar(img, ax=ax, format="%+2.0f dB", shrink=0.7, pad=0.03)
@@ -34,7 +330,7 @@ def generate_session_spectrogram(audio_path: str, image_path: str, detections: l
             duration = t_end - t_start
 
             rect = patches.Rectangle(
-                (t_start, 0), duration, 8000, 
+                (t_start, 0), duration, 8000,
                 linewidth=2, edgecolor='#FF0000', facecolor='#FF0000', alpha=0.15, zorder=10
             )
             center_x = t_start + (duration / 2)
@@ -61,29 +357,39 @@ def generate_session_spectrogram(audio_path: str, image_path: str, detections: l
         ax.set_ylabel("Frequency (Hz)")
 
         # Save
-        plt.tight_layout()
-        plt.savefig(image_path, bbox_inches='tight', pad_inches=0.1, dpi=300)
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(image_path, format=image_format(image_path), bbox_inches='tight', pad_inches=0.1, dpi=300)
         print(f"🎨 Spectrogram with highlights saved.")
 
     except Exception as e:
         print(f"❌ Spectrogram Error: {e}")
 
 
-def generate_single_spectrogram(audio_path: str, single_image_path: str, bird: dict, recorded_at: str, lat, lon):
-    """Generate a spectrogram for a single bird detection."""
+def _publication_single_spectrogram(mel: MelSpectrogram, single_image_path: str, bird: dict, recorded_at: str, lat, lon):
+    """Matplotlib rendering of one detection's spectrogram (axes, colorbar, 300 DPI)."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.patches as patches
+    import librosa.display
+
     try:
-        y, sr = librosa.load(audio_path, sr=None)
-        file_duration = len(y) / sr
-        dynamic_width = min(50, 10 + (file_duration / 10))
+        # Get start and end time of the chirp
+        t_start = bird["start_time"]
+        t_end = bird["end_time"]
+        duration = t_end - t_start
 
-        fig, ax = plt.subplots(figsize=(10, 6))
+        view_start = max(0.0, t_start - SINGLE_PADDING)
+        view_end = min(mel.duration, t_end + SINGLE_PADDING)
+
+        fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
 
         # Draw the Heatmap
-        S = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=128, fmax=8000)
-        S_dB = librosa.power_to_db(S, ref=np.max)
+        S_dB, times = mel.window(view_start, view_end)
         img = librosa.display.specshow(
-            S_dB, x_axis="time", y_axis="mel", sr=sr, fmax=8000, ax=ax
+            S_dB, x_coords=times, x_axis="time", y_axis="mel",
+            sr=mel.sr, hop_length=mel.hop_length, fmax=FMAX, ax=ax
         )
 
         # Add Colorbar
@@ -94,19 +400,14 @@ def generate_single_spectrogram(audio_path: str, single_image_path: str, bird: d
         ax.spines['top'].set_visible(False)
         ax.spines['right'].set_visible(False)
 
-        # Get start and end time of the chirp
-        t_start = bird["start_time"]
-        t_end = bird["end_time"]
-        duration = t_end - t_start
-
         rect = patches.Rectangle(
-            (t_start, 0), duration, 8000, 
+            (t_start, 0), duration, 8000,
             linewidth=2, edgecolor='#FF0000', facecolor='#FF0000', alpha=0.15, zorder=10
         )
         ax.add_patch(rect)
 
         center_x = t_start + (duration / 2)
-        safe_text_x = max(center_x, 2.0)
+        safe_text_x = min(max(center_x, times[0] + 0.5), times[-1] - 0.5)
         ax.text(
             safe_text_x,
             7500,
@@ -125,9 +426,8 @@ def generate_single_spectrogram(audio_path: str, single_image_path: str, bird: d
         ax.set_ylabel("Frequency (Hz)")
 
         # Save
-        plt.tight_layout()
-        plt.savefig(single_image_path, bbox_inches="tight", pad_inches=0.1, dpi=300)
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(single_image_path, format=image_format(single_image_path), bbox_inches="tight", pad_inches=0.1, dpi=300)
         print(f"🎨 Single spectrogram with highlights saved.")
 
     except Exception as e:
@@ -0,0 +1,226 @@
+"""
+Tracing - Lightweight per-upload traces for finding where a slow request spent its time.
+A trace is a tree of timed spans. The current span lives in a context variable, so
+`submit` carries it onto pool threads and `collect`/`adopt` bring spans back from
+worker processes. Recent traces are kept in memory for /api/debug/traces.
+"""
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Tuple
+
+from ..config import TRACE_HISTORY
+
+_span_ids = itertools.count(1)
+
+
+class Span:
+    def __init__(self, name: str, parent_id: Optional[int], attrs: Dict[str, Any], start: Optional[float] = None):
+        self.id = next(_span_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    """Stands in for a span when no trace is active, so callers never need to check."""
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, trace_id: str, name: str):
+        self.id = trace_id
+        self.name = name
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self, spans: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            items = sorted(self.spans, key=lambda s: s.start)
+        root = next((s for s in items if s.parent_id is None), None)
+        start = items[0].start if items else time.time()
+        end = root.end if root else None
+        result = {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": start,
+            "duration_ms": round((end - start) * 1000, 1) if end else None,
+            "in_progress": end is None,
+            "span_count": len(items),
+        }
+        if spans:
+            parents = {s.id: s.parent_id for s in items}
+
+            def depth(span_id: int) -> int:
+                d = 0
+                while parents.get(span_id) is not None:
+                    span_id, d = parents[span_id], d + 1
+                return d
+
+            result["spans"] = []
+            for s in items:
+                result["spans"].append({
+                    "id": s.id,
+                    "parent_id": s.parent_id,
+                    "name": s.name,
+                    "depth": depth(s.id),
+                    "thread": s.thread,
+                    "offset_ms": round((s.start - start) * 1000, 1),
+                    "duration_ms": round((s.end - s.start) * 1000, 1) if s.end else None,
+                    "attrs": s.attrs,
+                })
+        return result
+
+
+class TraceStore:
+    """The most recent traces, oldest dropped first."""
+
+    def __init__(self, max_traces: int):
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces[trace.id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def recent(self) -> List[Trace]:
+        with self._lock:
+            return list(reversed(self._traces.values()))
+
+
+traces = TraceStore(TRACE_HISTORY)
+
+# (trace, id of the span new spans should nest under)
+_current: contextvars.ContextVar[Optional[Tuple[Trace, Optional[int]]]] = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def trace(trace_id: str, name: str, store: Optional[TraceStore] = traces, **attrs: Any):
+    """Start a trace whose root span covers the block. Visible in the store while running."""
+    current = Trace(trace_id, name)
+    if store is not None:
+        store.add(current)
+    root = Span(name, None, attrs)
+    current.add(root)
+    token = _current.set((current, root.id))
+    try:
+        yield root
+    finally:
+        root.end = time.time()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any):
+    """Time the block as a child of the current span. A no-op outside a trace."""
+    ctx = _current.get()
+    if ctx is None:
+        yield NULL_SPAN
+        return
+    current, parent_id = ctx
+    s = Span(name, parent_id, attrs)
+    current.add(s)
+    token = _current.set((current, s.id))
+    try:
+        yield s
+    finally:
+        s.end = time.time()
+        _current.reset(token)
+
+
+def traced(fn):
+    """Decorator: run every call of fn inside a span named after it."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def record_span(name: str, start: float, end: float, **attrs: Any) -> None:
+    """Add an already-finished span (e.g. time spent queued) under the current span."""
+    ctx = _current.get()
+    if ctx is None:
+        return
+    current, parent_id = ctx
+    s = Span(name, parent_id, attrs, start=start)
+    s.end = end
+    current.add(s)
+
+
+def submit(executor, fn, *args, name: Optional[str] = None):
+    """
+    executor.submit(fn, *args), continuing the current trace on the pool thread.
+    The span notes how long the task waited for a free thread.
+    """
+    ctx = _current.get()
+    if ctx is None:
+        return executor.submit(fn, *args)
+    submitted = time.time()
+
+    def run():
+        token = _current.set(ctx)
+        try:
+            with span(name or fn.__name__, queued_ms=round((time.time() - submitted) * 1000, 1)):
+                return fn(*args)
+        finally:
+            _current.reset(token)
+
+    return executor.submit(run)
+
+
+def collect(fn, *args) -> Tuple[Any, List[Span]]:
+    """Runs inside a worker process: call fn under a throwaway trace and return its spans too."""
+    local = Trace("worker", fn.__name__)
+    token = _current.set((local, None))
+    try:
+        result = fn(*args)
+    finally:
+        _current.reset(token)
+    thread = f"pid {os.getpid()}"
+    for s in local.spans:
+        s.thread = thread
+    return result, local.spans
+
+
+def adopt(spans: List[Span]) -> None:
+    """Attach spans returned by `collect` under the current span, with fresh ids."""
+    ctx = _current.get()
+    if ctx is None:
+        return
+    current, parent_id = ctx
+    ids = {s.id: next(_span_ids) for s in spans}
+    for s in spans:
+        s.id, s.parent_id = ids[s.id], ids.get(s.parent_id, parent_id)
+        current.add(s)
+
+
+def active() -> bool:
+    return _current.get() is not None
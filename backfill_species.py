@@ -1,13 +1,15 @@
 """
 Backfill script to populate species table with Wikipedia info.
-Run this once to update all existing species.
+Run this once to update all existing species. Rows are saved through the app's
+save_species_info, so they go through the database writer like every other write.
 """
-import sqlite3
 import requests
 import re
 from typing import Optional, Dict, Any
 
-DATABASE_PATH = "birds.db"
+from app.database import init_db, get_db_connection
+from app.services.bird_images import save_species_info
+from app.services.db_writer import db_writer
 
 HEADERS = {
     "User-Agent": "AvianNet/1.0 (Bird Classification App; https://github.com/aviannet)"
@@ -121,34 +123,17 @@ def fetch_species_info(species: str) -> Optional[Dict[str, Any]]:
 
 def backfill_species():
     """Populate species table with Wikipedia info."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
-    
-    # Create species table if not exists
-    c.execute(
-        """CREATE TABLE IF NOT EXISTS species
-                 (id INTEGER PRIMARY KEY,
-                  name TEXT UNIQUE,
-                  scientific_name TEXT,
-                  image_url TEXT,
-                  description TEXT,
-                  region TEXT,
-                  habitat TEXT,
-                  conservation_status TEXT,
-                  created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
-    )
-    conn.commit()
-    
+    init_db()  # Creates the species table if it does not exist yet
+    conn = get_db_connection()
+
     # Get unique species from detections
-    c.execute("SELECT DISTINCT species FROM detections")
-    species_list = [row[0] for row in c.fetchall()]
+    species_list = [row[0] for row in conn.execute("SELECT DISTINCT species FROM detections")]
     
     print(f"🐦 Found {len(species_list)} unique species to process...")
     
     for species in species_list:
         # Check if already in species table
-        c.execute("SELECT id FROM species WHERE name = ?", (species,))
-        if c.fetchone():
+        if conn.execute("SELECT id FROM species WHERE name = ?", (species,)).fetchone():
             print(f"   ✅ {species} already in database, skipping...")
             continue
         
@@ -156,26 +141,13 @@ def backfill_species():
         info = fetch_species_info(species)
         
         if info:
-            c.execute(
-                """INSERT OR REPLACE INTO species 
-                   (name, scientific_name, image_url, description, region, habitat, conservation_status)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    info["name"],
-                    info["scientific_name"],
-                    info["image_url"],
-                    info["description"],
-                    info["region"],
-                    info["habitat"],
-                    info["conservation_status"],
-                )
-            )
-            conn.commit()
+            save_species_info(info)
             print(f"   💾 Saved: {info['description'][:60]}..." if info['description'] else "   💾 Saved (no description)")
         else:
-            print(f"   ⚠️ No info found")
+            print("   ⚠️ No info found")
     
     conn.close()
+    db_writer.stop()
     print("\n✅ Species backfill complete!")
 
 
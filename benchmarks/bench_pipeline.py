@@ -0,0 +1,203 @@
+"""
+Upload Pipeline Benchmark - Times each pipeline stage and the full /upload route offline.
+BirdNET and Wikipedia are stubbed (see stubs.py), the app runs in-process against a
+scratch database, and results are written as JSON that `compare.py` can diff.
+
+    python -m benchmarks.bench_pipeline --seconds 60 --detections 10
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Callable, Optional, List, Dict, Any
+
+import numpy as np
+
+from . import stubs
+from .compare import compare
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Millisecond statistics of a list of durations in seconds."""
+    ms = np.array(samples) * 1000
+    return {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def measure(fn: Callable[[Any], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    """Time fn(setup()) `repeat` times after one untimed warm-up run; setup is never timed."""
+    fn(setup() if setup else None)
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_stages(audio_path: str, detections: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    from app.services import pipeline, spectrogram
+    from app.services.audio import AudioContext, generate_single_audio
+    from app.services.bird_images import get_species_info
+    from app.services.inference_scheduler import SAMPLE_RATE, split_chunks
+    from app.config import STORAGE_DIR, SPECTROGRAM_FORMAT
+    from app.database import to_epoch_ms
+    from app.services.sessions import save_session
+
+    audio = AudioContext(audio_path)
+    resampled = audio.resampled(SAMPLE_RATE)
+    birds = stubs.stub_detections(len(split_chunks(resampled)), detections)
+    mel = spectrogram.compute_mel(audio)
+    spectrogram.save_mel("bench", mel)
+    out = os.path.join(STORAGE_DIR, "bench")
+    image = f"{out}.{SPECTROGRAM_FORMAT}"
+    recorded = datetime(2026, 1, 1, 6, 0)
+    rows = [
+        (str(recorded), 10.76, 106.66, b["common_name"], b["confidence"],
+         "/storage/bench.wav", f"/storage/bench{i}.wav", "/storage/bench.png", f"/storage/bench{i}.png",
+         None, b["start_time"], b["end_time"], to_epoch_ms(recorded), "bench")
+        for i, b in enumerate(birds)
+    ]
+    save_session("bench", "processing", recorded_at=str(recorded), recorded_at_ms=to_epoch_ms(recorded))
+    for species in {b["common_name"] for b in birds}:
+        get_species_info(species)  # Warm the species cache
+
+    results = {
+        "decode": measure(lambda _: AudioContext(audio_path), repeat),
+        "resample_48k": measure(lambda a: a.resampled(SAMPLE_RATE), repeat, setup=lambda: AudioContext(audio_path)),
+        "split_chunks": measure(lambda _: split_chunks(resampled), repeat),
+        "compute_mel": measure(lambda _: spectrogram.compute_mel(audio), repeat),
+        "save_mel": measure(lambda _: spectrogram.save_mel("bench", mel), repeat),
+        "load_mel": measure(lambda _: spectrogram.load_mel("bench"), repeat),
+        "clip_export": measure(
+            lambda _: [generate_single_audio(audio, f"{out}{i}.wav", b["start_time"], b["end_time"]) for i, b in enumerate(birds)],
+            repeat,
+        ),
+        "render_session": measure(
+            lambda _: spectrogram.generate_session_spectrogram(mel, image, birds, "2026-01-01 06:00:00", 10.76, 106.66), repeat
+        ),
+        "render_tile": measure(lambda _: spectrogram.render_tile(mel, spectrogram.tile_levels(mel), 0, image), repeat),
+        "species_info_cached": measure(lambda _: [get_species_info(b["common_name"]) for b in birds], repeat),
+        "db_insert": measure(lambda _: pipeline.insert_detections("bench", rows).result(), repeat),
+    }
+    # Uploads finishing together: their batches should share transactions, so the time per burst grows slower than its size
+    for burst in (1, 8, 32):
+        results[f"db_insert_burst_{burst}"] = measure(
+            lambda _, n=burst: [f.result() for f in [pipeline.insert_detections("bench", rows) for _ in range(n)]], repeat
+        )
+    if birds:
+        results["render_single"] = measure(
+            lambda _: spectrogram.generate_single_spectrogram(mel, image, birds[0], "2026-01-01 06:00:00", 10.76, 106.66), repeat
+        )
+    return results
+
+
+def bench_upload_route(audio_path: str, uploads: int) -> Dict[str, Dict[str, float]]:
+    """POST /upload and poll the job to completion, in-process, one upload at a time."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    totals, stages = [], {}
+    with TestClient(app) as client:
+        for i in range(uploads + 1):  # First upload is a warm-up
+            start = time.perf_counter()
+            with open(audio_path, "rb") as f:
+                response = client.post(
+                    "/upload",
+                    data={"lat": "10.762", "lon": "106.660", "recorded_at": "2026-01-01 06:00:00"},
+                    files={"file": ("bench.wav", f, "audio/wav")},
+                )
+            response.raise_for_status()
+            status_url = response.json()["status_url"]
+            while True:
+                job = client.get(status_url).json()
+                if job["state"] in ("done", "failed"):
+                    break
+                time.sleep(0.005)
+            if job["state"] == "failed":
+                raise RuntimeError(f"Upload failed: {job['error']}")
+            if i == 0:
+                continue
+            totals.append(time.perf_counter() - start)
+            for name, seconds in job["stages"].items():
+                stages.setdefault(name, []).append(seconds)
+
+    results = {"upload_route": summarize(totals)}
+    results.update({f"upload_stage_{name}": summarize(samples) for name, samples in stages.items()})
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the upload pipeline offline.")
+    parser.add_argument("--seconds", type=float, default=60, help="Length of the synthetic recording")
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--detections", type=int, default=10, help="Detections the stub analyzer returns per recording")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage")
+    parser.add_argument("--uploads", type=int, default=5, help="Timed uploads through the /upload route (0 to skip)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to compare against")
+    args = parser.parse_args()
+
+    workdir = stubs.isolate()
+    stubs.install(detections=args.detections)
+    from app.config import SPECTROGRAM_RENDER_MODE, SPECTROGRAM_FORMAT
+    from app.database import init_db
+
+    init_db()
+    audio_path = stubs.write_wav(os.path.join(workdir, "bench.wav"), args.seconds, args.sample_rate)
+    print(f"🎛️ {args.seconds:.0f}s at {args.sample_rate} Hz, {args.detections} detections, scratch dir {workdir}")
+
+    results = bench_stages(audio_path, args.detections, args.repeat)
+    if args.uploads:
+        results.update(bench_upload_route(audio_path, args.uploads))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "render_mode": SPECTROGRAM_RENDER_MODE,
+            "image_format": SPECTROGRAM_FORMAT,
+        },
+        "params": vars(args),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results.items():
+        print(f"  {name:<28} p50 {stats['p50_ms']:>10.2f} ms   p95 {stats['p95_ms']:>10.2f} ms")
+    print(f"💾 Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Benchmark Compare - Side-by-side p50 of two benchmark result files.
+
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+from typing import Dict, Any
+
+# Changes smaller than this are reported as noise
+THRESHOLD = 0.05
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], metric: str = "p50_ms") -> None:
+    before, after = baseline["results"], current["results"]
+    print(f"{'benchmark':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(set(before) | set(after)):
+        if name not in before or name not in after:
+            side = "current" if name in after else "baseline"
+            print(f"{name:<28} {'(only in ' + side + ')':>35}")
+            continue
+        old, new = before[name][metric], after[name][metric]
+        change = (new - old) / old if old else 0.0
+        verdict = "" if abs(change) < THRESHOLD else ("  faster" if change < 0 else "  SLOWER")
+        print(f"{name:<28} {old:>10.2f}ms {new:>10.2f}ms {change:>+8.1%}{verdict}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "min_ms", "p50_ms", "p95_ms", "max_ms"])
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    compare(baseline, current, args.metric)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Load Generator - Simulates a fleet of ESP32 recorders uploading to one server while
+dashboards poll the read APIs, then reports throughput, latency percentiles and errors.
+By default it starts its own stub server (see serve.py); pass --url to target another.
+
+    python -m benchmarks.loadgen --devices 50 --cadence 30 --duration 120
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Tuple
+
+import httpx
+import numpy as np
+
+from . import stubs
+
+BASE_LAT, BASE_LON = 10.762, 106.660  # Devices are scattered around this point
+
+DASHBOARD_ENDPOINTS = [
+    "/api/v2/detections",
+    "/api/sessions",
+    "/api/species-summary",
+    "/api/analytics/summary",
+    "/api/analytics/species-distribution",
+    "/api/analytics/trends",
+    "/api/analytics/hourly-activity",
+    "/api/analytics/confidence-distribution",
+]
+
+
+@dataclass
+class Device:
+    name: str
+    lat: float
+    lon: float
+    cadence: float       # Seconds between uploads
+    audio_path: str
+    audio_seconds: float
+
+
+class Stats:
+    """Latency and outcome of every request, grouped by name."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, bool]]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, seconds: float, ok: bool, status: str) -> None:
+        self.samples.setdefault(name, []).append((seconds, ok))
+        counts = self.statuses.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for name, samples in sorted(self.samples.items()):
+            ms = np.array([s for s, _ in samples]) * 1000
+            errors = sum(1 for _, ok in samples if not ok)
+            report[name] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4),
+                "throughput_per_s": round(len(samples) / elapsed, 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 1),
+                "p95_ms": round(float(np.percentile(ms, 95)), 1),
+                "p99_ms": round(float(np.percentile(ms, 99)), 1),
+                "statuses": self.statuses[name],
+            }
+        return report
+
+
+async def timed_request(client: httpx.AsyncClient, stats: Stats, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        stats.record(name, time.perf_counter() - start, False, type(e).__name__)
+        return None
+    stats.record(name, time.perf_counter() - start, response.is_success, str(response.status_code))
+    return response
+
+
+async def wait_for_job(client: httpx.AsyncClient, stats: Stats, status_url: str, started: float, deadline: float) -> None:
+    """Poll a job until it finishes; records upload-to-stored latency as `job`."""
+    while time.perf_counter() < deadline:
+        try:
+            job = (await client.get(status_url)).json()
+        except (httpx.HTTPError, ValueError):
+            await asyncio.sleep(0.5)
+            continue
+        if job.get("state") in ("done", "failed"):
+            stats.record("job", time.perf_counter() - started, job["state"] == "done", job["state"])
+            return
+        await asyncio.sleep(0.25)
+    stats.record("job", time.perf_counter() - started, False, "unfinished")
+
+
+async def run_device(client: httpx.AsyncClient, stats: Stats, device: Device, end: float, wait_jobs: bool, jobs: list) -> None:
+    with open(device.audio_path, "rb") as f:
+        audio = f.read()
+    # Devices boot at random moments, then keep their own fixed schedule regardless of server speed
+    next_upload = time.perf_counter() + random.uniform(0, device.cadence)
+    while True:
+        await asyncio.sleep(max(0.0, next_upload - time.perf_counter()))
+        if time.perf_counter() >= end:
+            return
+        next_upload += device.cadence
+        started = time.perf_counter()
+        response = await timed_request(
+            client, stats, "upload", "POST", "/upload",
+            data={
+                "lat": str(device.lat), "lon": str(device.lon),
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"), "device": device.name,
+            },
+            files={"file": (f"{device.name}.wav", audio, "audio/wav")},
+        )
+        if wait_jobs and response is not None and response.status_code == 202:
+            status_url = response.json()["status_url"]
+            jobs.append(asyncio.create_task(wait_for_job(client, stats, status_url, started, end + 120)))
+
+
+async def run_reader(client: httpx.AsyncClient, stats: Stats, interval: float, end: float, offset: int) -> None:
+    """A dashboard tab: cycles through the read endpoints every `interval` seconds."""
+    i = offset
+    while time.perf_counter() < end:
+        path = DASHBOARD_ENDPOINTS[i % len(DASHBOARD_ENDPOINTS)]
+        await timed_request(client, stats, path, "GET", path)
+        i += 1
+        await asyncio.sleep(interval)
+
+
+def make_fleet(count: int, cadence: float, durations: List[float], sample_rate: int, audio_dir: str) -> List[Device]:
+    recordings = {
+        seconds: stubs.write_wav(os.path.join(audio_dir, f"fleet-{seconds:g}s.wav"), seconds, sample_rate)
+        for seconds in durations
+    }
+    fleet = []
+    for i in range(count):
+        seconds = random.choice(durations)
+        fleet.append(Device(
+            name=f"esp32-{i:03d}",
+            lat=round(BASE_LAT + random.uniform(-0.5, 0.5), 5),
+            lon=round(BASE_LON + random.uniform(-0.5, 0.5), 5),
+            cadence=cadence * random.uniform(0.5, 1.5),
+            audio_path=recordings[seconds],
+            audio_seconds=seconds,
+        ))
+    return fleet
+
+
+async def run_load(args, base_url: str, fleet: List[Device]) -> Dict[str, Any]:
+    stats = Stats()
+    jobs: list = []
+    limits = httpx.Limits(max_connections=args.devices + args.readers + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        end = start + args.duration
+        tasks = [run_device(client, stats, d, end, not args.no_wait_jobs, jobs) for d in fleet]
+        tasks += [run_reader(client, stats, args.read_interval, end, i) for i in range(args.readers)]
+        await asyncio.gather(*tasks)
+        pending = sum(not j.done() for j in jobs)
+        if pending:
+            print(f"⏳ Waiting for {pending} queued uploads to finish...")
+        await asyncio.gather(*jobs)
+        elapsed = time.perf_counter() - start
+        try:
+            server_metrics = (await client.get("/metrics")).text
+        except httpx.HTTPError:
+            server_metrics = None
+    return {"elapsed_seconds": round(elapsed, 1), "results": stats.report(elapsed), "server_metrics": server_metrics}
+
+
+def start_server(args) -> subprocess.Popen:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serve", "--port", str(args.port),
+         "--detections", str(args.detections), "--wiki-latency-ms", str(args.wiki_latency_ms)],
+        cwd=repo_root,
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Stub server exited during startup")
+        try:
+            if httpx.get(f"{url}/metrics", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Stub server did not start within 120s")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['elapsed_seconds']}s")
+    print(f"{'endpoint':<40} {'reqs':>6} {'req/s':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, r in report["results"].items():
+        print(
+            f"{name:<40} {r['requests']:>6} {r['throughput_per_s']:>7.2f} {r['error_rate'] * 100:>5.1f}% "
+            f"{r['p50_ms']:>6.0f}ms {r['p95_ms']:>6.0f}ms {r['p99_ms']:>6.0f}ms"
+        )
+        if r["errors"]:
+            print(f"{'':<40} statuses: {r['statuses']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate a fleet of recorders against a local server.")
+    parser.add_argument("--url", help="Target an already running server instead of starting the stub server")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the stub server")
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--cadence", type=float, default=30, help="Mean seconds between uploads per device (each device varies ±50%%)")
+    parser.add_argument("--audio-seconds", default="15,30,60", help="Comma-separated recording lengths devices pick from")
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to generate load for")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent dashboard clients")
+    parser.add_argument("--read-interval", type=float, default=1.0, help="Seconds between a dashboard client's requests")
+    parser.add_argument("--detections", type=int, default=5, help="Detections per upload from the stub analyzer")
+    parser.add_argument("--wiki-latency-ms", type=float, default=0)
+    parser.add_argument("--no-wait-jobs", action="store_true", help="Do not poll jobs to measure end-to-end processing")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    audio_dir = tempfile.mkdtemp(prefix="aviannet-fleet-")
+    durations = [float(s) for s in args.audio_seconds.split(",")]
+    fleet = make_fleet(args.devices, args.cadence, durations, args.sample_rate, audio_dir)
+    print(f"📡 {args.devices} devices, ~{args.devices / args.cadence:.2f} uploads/s offered, {args.readers} dashboard clients")
+
+    server = None if args.url else start_server(args)
+    try:
+        report = asyncio.run(run_load(args, args.url or f"http://127.0.0.1:{args.port}", fleet))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report["params"] = vars(args)
+    report["devices"] = [d.__dict__ for d in fleet]
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Stub Server - Runs the app with the benchmark stubs on a scratch database, for load tests.
+
+    python -m benchmarks.serve --port 8765 --detections 5
+"""
+import argparse
+
+from . import stubs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the app with a stub analyzer and offline Wikipedia.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--detections", type=int, default=5, help="Detections the stub analyzer returns per recording")
+    parser.add_argument("--wiki-latency-ms", type=float, default=0, help="Simulated Wikipedia round trip")
+    parser.add_argument("--workdir", help="Scratch directory for the database and storage (default: a new temp dir)")
+    args = parser.parse_args()
+
+    workdir = stubs.isolate(args.workdir)
+    stubs.install(detections=args.detections, wiki_latency_ms=args.wiki_latency_ms)
+    print(f"🧪 Stub server using {workdir}")
+
+    import uvicorn
+    from app.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
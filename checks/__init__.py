@@ -0,0 +1,85 @@
+"""
+Smoke Checks - Scripts that exercise one subsystem end to end against a scratch database
+and fail loudly when one of its invariants breaks. `python -m checks.run` runs them all.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, Tuple
+
+# Sums are compared at this many decimals: SQLite adds them in a different order
+SUM_DECIMALS = 6
+
+HOUR_MS = 3600 * 1000
+
+
+class CheckFailed(AssertionError):
+    pass
+
+
+def expect(condition: bool, message: str) -> None:
+    """Fail the check with `message` unless condition holds (unlike assert, also under -O)."""
+    if not condition:
+        raise CheckFailed(message)
+
+
+def expected_rollups(rows: Iterable[Tuple[int, str, float]]) -> Dict[str, dict]:
+    """
+    The three rollup tables recomputed in Python from (ts_ms, species, confidence) rows,
+    independently of the SQL in app.services.rollups, keyed like read_rollups().
+    """
+    species = {}
+    hourly = defaultdict(lambda: [0, 0.0])
+    confidence = defaultdict(int)
+    for ts_ms, name, score in rows:
+        count, total, first, last = species.get(name, (0, 0.0, None, None))
+        if ts_ms is not None:
+            first = ts_ms if first is None else min(first, ts_ms)
+            last = ts_ms if last is None else max(last, ts_ms)
+        species[name] = (count + 1, total + score, first, last)
+        if ts_ms is None:
+            continue
+        hour = ts_ms - ts_ms % HOUR_MS
+        hourly[hour, name][0] += 1
+        hourly[hour, name][1] += score
+        confidence[hour, name, min(max(int(score * 20) - 14, 0), 5)] += 1
+
+    return {
+        "rollup_species": {
+            name: (count, round(total, SUM_DECIMALS), first, last)
+            for name, (count, total, first, last) in species.items()
+        },
+        "rollup_species_hourly": {key: (count, round(total, SUM_DECIMALS)) for key, (count, total) in hourly.items()},
+        "rollup_confidence_hourly": dict(confidence),
+    }
+
+
+def read_rollups(conn) -> Dict[str, dict]:
+    """The rollup tables as stored, in the shape expected_rollups() returns."""
+    return {
+        "rollup_species": {
+            row[0]: (row[1], round(row[2], SUM_DECIMALS), row[3], row[4])
+            for row in conn.execute(
+                "SELECT species, detections, confidence_sum, first_seen_ms, last_seen_ms FROM rollup_species"
+            )
+        },
+        "rollup_species_hourly": {
+            (row[0], row[1]): (row[2], round(row[3], SUM_DECIMALS))
+            for row in conn.execute("SELECT hour_ms, species, detections, confidence_sum FROM rollup_species_hourly")
+        },
+        "rollup_confidence_hourly": {
+            (row[0], row[1], row[2]): row[3]
+            for row in conn.execute("SELECT hour_ms, species, bin, detections FROM rollup_confidence_hourly")
+        },
+    }
+
+
+def expect_rollups(conn, rows: Iterable[Tuple[int, str, float]], when: str) -> None:
+    """Fail unless the stored rollups match those recomputed from `rows`."""
+    stored, expected = read_rollups(conn), expected_rollups(rows)
+    for table in expected:
+        differing = {
+            key for key in stored[table].keys() | expected[table].keys()
+            if stored[table].get(key) != expected[table].get(key)
+        }
+        expect(not differing, f"{table} {when}: {len(differing)} keys differ, e.g. "
+               + ", ".join(f"{key}: stored {stored[table].get(key)} expected {expected[table].get(key)}"
+                           for key in sorted(differing, key=str)[:3]))
@@ -0,0 +1,174 @@
+"""
+Migrations Check - Upgrades a database in the layout that predates versioned migrations to
+the latest schema and checks every backfill: epoch timestamps, sessions, rollups, the
+spatial and species search indexes and the id high-water mark. Running the migrations
+again must change nothing, and the upgraded schema must match a freshly created one.
+
+    python -m checks.check_migrations
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks import stubs
+from . import expect, expect_rollups
+
+SPECIES = ["Zebra Finch", "Warbler, Yellow", "Oriental Magpie-Robin", "Coppersmith Barbet", "Asian Koel"]
+
+# The text timestamps older versions stored, all of which ts_ms must be parsed from
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f")
+
+
+def create_legacy_database(path: str, rng: random.Random) -> None:
+    """Detections and species as the app stored them before migrations, without the later columns."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """CREATE TABLE detections
+                 (id INTEGER PRIMARY KEY, timestamp TEXT, lat REAL, lon REAL, species TEXT, confidence REAL,
+                  audio_url TEXT, single_audio_url TEXT, image_url TEXT, single_image_url TEXT)"""
+    )
+    conn.execute(
+        """CREATE TABLE species
+                 (id INTEGER PRIMARY KEY, name TEXT UNIQUE, scientific_name TEXT, image_url TEXT,
+                  description TEXT, region TEXT, habitat TEXT, conservation_status TEXT,
+                  created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+    )
+    conn.executemany(
+        "INSERT INTO species (name, scientific_name, description) VALUES (?, ?, ?)",
+        [(name, f"Avis {name.split()[-1].lower()}", f"The {name} is a bird.") for name in SPECIES],
+    )
+
+    rows = []
+    start = datetime(2024, 3, 1, 5, 30)
+    for recording in range(40):
+        session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        recorded = start + timedelta(days=rng.randrange(300), minutes=rng.randrange(1440))
+        for i in range(rng.randrange(1, 15)):
+            when = recorded + timedelta(seconds=3 * i, microseconds=rng.choice([0, 250000]))
+            timestamp = when.strftime(rng.choice(TIMESTAMP_FORMATS))
+            located = recording % 7 != 0
+            rows.append((
+                "not a time" if recording % 13 == 0 else timestamp,
+                10.76 + rng.uniform(-2, 2) if located else None, 106.66 + rng.uniform(-2, 2) if located else None,
+                rng.choice(SPECIES), rng.uniform(0.6, 1.0),
+                f"/storage/{session_id}.wav", f"/storage/{session_id}{i}.wav",
+                f"/storage/{session_id}.png", f"/storage/{session_id}{i}.png",
+            ))
+    # Ids with gaps, as deleted detections leave them
+    ids = sorted(rng.sample(range(1, len(rows) * 3), len(rows)))
+    conn.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [(i, *row) for i, row in zip(ids, rows)])
+    conn.commit()
+    conn.close()
+
+
+def snapshot(conn: sqlite3.Connection) -> dict:
+    """Schema and contents of every table, to tell whether anything changed."""
+    tables = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_stat%' ORDER BY name"
+        )
+    ]
+    return {
+        "schema": conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall(),
+        "version": conn.execute("PRAGMA user_version").fetchone()[0],
+        "data": {table: sorted(map(tuple, conn.execute(f"SELECT * FROM {table}")), key=repr) for table in tables},
+    }
+
+
+def layout(conn: sqlite3.Connection) -> dict:
+    """Columns of every table and the indexes and triggers, for comparing two schemas."""
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+    return {
+        "columns": {
+            table: [(row[1], row[2].upper(), row[3], row[5]) for row in conn.execute(f"PRAGMA table_info({table})")]
+            for table in tables if not table.startswith("sqlite_stat")
+        },
+        "objects": conn.execute(
+            "SELECT type, name, tbl_name FROM sqlite_master WHERE type IN ('index', 'trigger') ORDER BY name"
+        ).fetchall(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the schema migrations on a pre-migration database.")
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temporary one)")
+    args = parser.parse_args()
+
+    workdir = stubs.isolate(args.workdir)
+    from app.config import DATABASE_PATH
+    from app.database import MIGRATIONS, get_db_connection, init_db, migrate, parse_timestamp, to_epoch_ms
+    from app.services.species_search import search_species
+
+    rng = random.Random(11)
+    create_legacy_database(DATABASE_PATH, rng)
+    legacy = sqlite3.connect(DATABASE_PATH)
+    original = legacy.execute("SELECT id, timestamp, lat, lon, species, confidence, audio_url FROM detections").fetchall()
+    legacy.close()
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        init_db()
+    latest = MIGRATIONS[-1][0]
+    expect(output.getvalue().count("Applied migration") == latest, f"expected {latest} migrations to run:\n{output.getvalue()}")
+
+    conn = get_db_connection()
+    expect(conn.execute("PRAGMA user_version").fetchone()[0] == latest, "user_version is not the last migration")
+    migrated = {row["id"]: row for row in conn.execute("SELECT * FROM detections")}
+    expect(sorted(migrated) == sorted(row[0] for row in original), "detection ids changed")
+    for detection_id, timestamp, lat, lon, species, confidence, audio_url in original:
+        row = migrated[detection_id]
+        expect((row["timestamp"], row["lat"], row["lon"], row["species"], row["confidence"], row["audio_url"])
+               == (timestamp, lat, lon, species, confidence, audio_url), f"detection {detection_id} changed")
+        expect(row["ts_ms"] == to_epoch_ms(parse_timestamp(timestamp)), f"ts_ms of {timestamp!r} is {row['ts_ms']}")
+        expect(row["session_id"] == audio_url[len("/storage/"):-len(".wav")], f"detection {detection_id} not linked to its session")
+
+    recordings = {row[6] for row in original}
+    sessions = conn.execute("SELECT COUNT(*), SUM(status = 'done') FROM sessions").fetchone()
+    expect(tuple(sessions) == (len(recordings), len(recordings)), f"{tuple(sessions)} sessions for {len(recordings)} recordings")
+    for session_id, recorded_at_ms in conn.execute(
+        "SELECT s.id, s.recorded_at_ms FROM sessions s WHERE EXISTS (SELECT 1 FROM detections WHERE session_id = s.id AND ts_ms IS NOT NULL)"
+    ):
+        first = min(row["ts_ms"] for row in migrated.values() if row["session_id"] == session_id and row["ts_ms"] is not None)
+        expect(recorded_at_ms == first, f"session {session_id} recorded at {recorded_at_ms}, first detection at {first}")
+
+    expect_rollups(conn, [(row["ts_ms"], row["species"], row["confidence"]) for row in migrated.values()], "after migrating")
+
+    located = sum(1 for row in original if row[2] is not None)
+    indexed = conn.execute("SELECT COUNT(*) FROM detections_rtree").fetchone()[0]
+    expect(indexed == located, f"{indexed} detections in the spatial index, {located} with coordinates")
+
+    for name in ("Yellow", "magpie", "Barbet"):
+        found = [row["name"] for row in search_species(name, 10)["results"]]
+        expect(any(name.lower() in species.lower() for species in found), f"species search for {name!r} found {found}")
+
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'detections'").fetchone()
+    expect(sequence is not None and sequence[0] >= max(migrated), "the id high-water mark is below existing ids")
+    expect(conn.execute("SELECT version FROM response_cache_version").fetchone() is not None, "response_cache_version is empty")
+    print(f"🗄️ {len(original)} legacy detections in {len(recordings)} recordings migrated to version {latest}")
+
+    # Idempotent: a second run applies nothing and touches nothing
+    before = snapshot(conn)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        migrate(conn)
+    expect(not output.getvalue(), f"migrations ran again:\n{output.getvalue()}")
+    expect(snapshot(conn) == before, "re-running the migrations changed the database")
+
+    # The upgraded schema is the one a new install gets
+    fresh = sqlite3.connect(os.path.join(workdir, "fresh.db"))
+    fresh.row_factory = sqlite3.Row
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(fresh)
+    expect(layout(conn) == layout(fresh), "the upgraded schema differs from a fresh one")
+    fresh.close()
+    conn.close()
+    print("🔁 Re-running the migrations is a no-op; the upgraded schema matches a fresh database")
+
+
+if __name__ == "__main__":
+    main()
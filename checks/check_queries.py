@@ -0,0 +1,146 @@
+"""
+Queries Check - The detection listing and species search against plain-Python answers:
+keyset pages visit every row exactly once in order (also under filters and with many rows
+sharing a time), `since` polling returns each new row once, and the species search index
+follows inserts, renames and deletes made with raw SQL.
+
+    python -m checks.check_queries
+"""
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from benchmarks import stubs
+from . import expect
+
+SPECIES = ["Zebra Finch", "Warbler, Yellow", "Oriental Magpie-Robin", "Coppersmith Barbet", "Asian Koel"]
+
+PAGE_SIZE = 97
+
+
+def insert(rng: random.Random, count: int) -> None:
+    """One upload of `count` detections, with times drawn from a small set so many collide."""
+    from app.database import to_epoch_ms
+    from app.services import pipeline
+    from app.services.sessions import save_session
+
+    session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    save_session(session_id, "processing")
+    rows = []
+    for i in range(count):
+        when = datetime(2026, 1, 1, 6) + timedelta(seconds=3 * rng.randrange(50))
+        rows.append((
+            str(when), 10.76 + rng.uniform(-3, 3), 106.66 + rng.uniform(-3, 3), rng.choice(SPECIES),
+            rng.uniform(0.6, 1.0), f"/storage/{session_id}.wav", None, None, None, None, None, None,
+            to_epoch_ms(when), session_id,
+        ))
+    pipeline.insert_detections(session_id, rows).result()
+
+
+def walk(filters) -> List[int]:
+    """Ids of every page of the listing, following next_cursor."""
+    from app.services.detections import decode_cursor, list_detections
+
+    ids, cursor = [], None
+    while True:
+        page = list_detections(filters, PAGE_SIZE, cursor)
+        ids += [row["id"] for row in page["detections"]]
+        if page["next_cursor"] is None:
+            return ids
+        cursor = decode_cursor(page["next_cursor"])
+
+
+def poll(since: int) -> List[int]:
+    """Ids of every detection after `since`, in pages, as a client polling with latest_id would see them."""
+    from app.services.detections import DetectionFilter, list_detections
+
+    ids = []
+    while True:
+        page = list_detections(DetectionFilter(), PAGE_SIZE, since=since)
+        ids += [row["id"] for row in page["detections"]]
+        if not page["detections"]:
+            return ids
+        since = page["latest_id"]
+
+
+def expected_ids(conn, where: str = "1", params: tuple = ()) -> List[int]:
+    return [row[0] for row in conn.execute(f"SELECT id FROM detections WHERE {where} ORDER BY ts_ms DESC, id DESC", params)]
+
+
+def search_names(text: str) -> List[str]:
+    from app.services.species_search import search_species
+
+    return [row["name"] for row in search_species(text, 10)["results"]]
+
+
+def find(text: str, name: str) -> bool:
+    return name in search_names(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check detection paging, polling and species search.")
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temporary one)")
+    args = parser.parse_args()
+
+    stubs.isolate(args.workdir)
+    from app.database import distance_km, get_db_connection, init_db
+    from app.services.db_writer import db_writer
+    from app.services.detections import DetectionFilter
+
+    init_db()
+    rng = random.Random(3)
+    for _ in range(30):
+        insert(rng, rng.randrange(1, 120))
+    conn = get_db_connection()
+    rows = conn.execute("SELECT id, species, lat, lon FROM detections").fetchall()
+
+    cases = [
+        ("all", DetectionFilter(), expected_ids(conn)),
+        ("species", DetectionFilter(species=["Warbler, Yellow"]), expected_ids(conn, "species = ?", ("Warbler, Yellow",))),
+        ("bbox", DetectionFilter(bbox=(105.0, 9.0, 107.0, 11.0)),
+         expected_ids(conn, "lon BETWEEN 105 AND 107 AND lat BETWEEN 9 AND 11")),
+    ]
+    near = {row["id"] for row in rows if distance_km(row["lat"], row["lon"], 10.76, 106.66) <= 150}
+    cases.append(("near", DetectionFilter(near=(10.76, 106.66, 150.0)), [i for i in expected_ids(conn) if i in near]))
+    for name, filters, expected in cases:
+        ids = walk(filters)
+        expect(len(ids) == len(set(ids)), f"{name}: a detection appeared on two pages")
+        expect(ids == expected, f"{name}: pages hold {len(ids)} detections, expected {len(expected)} in order")
+        expect(expected, f"{name}: the filter matched nothing, so the check proves nothing")
+    print(f"📄 Keyset pages of {PAGE_SIZE} cover {len(rows)} detections exactly once, plain and filtered")
+
+    from app.services.detections import list_detections
+
+    latest_id = list_detections(DetectionFilter(), 1)["latest_id"]
+    for _ in range(5):
+        insert(rng, rng.randrange(1, 120))
+    new = [row[0] for row in conn.execute("SELECT id FROM detections WHERE id > ? ORDER BY id", (latest_id,))]
+    expect(poll(latest_id) == new, f"polling since {latest_id} did not return the {len(new)} new detections once each")
+    expect(poll(new[-1]) == [], "polling after the newest detection returned rows")
+    print(f"📡 Polling since {latest_id} returns the {len(new)} new detections once, in order")
+
+    # Raw SQL, as scripts write it: the index must follow through the triggers alone
+    def species_id(name: str) -> Optional[int]:
+        row = conn.execute("SELECT id FROM species WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    with conn:
+        conn.execute("INSERT INTO species (name, scientific_name, region) VALUES ('Streaked Spiderhunter', 'Arachnothera magna', 'Himalayas')")
+    expect(find("spiderhunter", "Streaked Spiderhunter"), "an inserted species was not found")
+    expect(find("Himalayas", "Streaked Spiderhunter"), "an inserted species was not found by region")
+    with conn:
+        conn.execute("UPDATE species SET name = 'Little Spiderhunter' WHERE id = ?", (species_id("Streaked Spiderhunter"),))
+    expect(find("little", "Little Spiderhunter"), "a renamed species was not found by its new name")
+    expect(not find("streaked", "Little Spiderhunter"), "a renamed species was still found by its old name")
+    with conn:
+        conn.execute("DELETE FROM species WHERE name = 'Little Spiderhunter'")
+    expect(not search_names("spiderhunter"), "a deleted species was still found")
+    print("🔎 Species search follows raw inserts, renames and deletes")
+    conn.close()
+    db_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Writer Check - Concurrent uploads through the database writer, with the analytics rollups
+compared against totals recomputed in Python from every row stored. Covers coalesced
+transactions, the one-by-one retry after a failed write, archiving (rows leave SQLite but
+stay in exports and rollups), rebuilds, and rollup accounting by MAX(id) once the newest
+ids have been archived.
+
+    python -m checks.check_writer
+"""
+import argparse
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks import stubs
+from . import expect, expect_rollups
+
+SPECIES = ["Zebra Finch", "Warbler, Yellow", "Oriental Magpie-Robin", "Coppersmith Barbet", "Asian Koel"]
+
+UPLOADS = 80
+
+# Long enough for the writer to coalesce uploads, which a failing write then splits up again
+FAILING_WRITES = 5
+
+
+def make_rows(rng: random.Random, session_id: str, recorded: datetime, count: int) -> List[tuple]:
+    """Detection rows as the pipeline builds them, for one recording."""
+    from app.database import to_epoch_ms
+
+    rows = []
+    for i in range(count):
+        start = 3.0 * rng.randrange(200)
+        when = recorded + timedelta(seconds=start)
+        rows.append((
+            str(when), 10.76 + rng.uniform(-1, 1), 106.66 + rng.uniform(-1, 1), rng.choice(SPECIES),
+            rng.uniform(0.6, 1.0), f"/storage/{session_id}.wav", f"/storage/{session_id}{i}.wav",
+            f"/storage/{session_id}.png", f"/storage/{session_id}{i}.png", None, start, start + 3.0,
+            to_epoch_ms(when), session_id,
+        ))
+    return rows
+
+
+def upload(session_id: str, rows: List[tuple]) -> None:
+    """Create the session and insert its detections, as a finished upload does."""
+    from app.services import pipeline
+    from app.services.sessions import save_session
+
+    save_session(session_id, "processing")
+    pipeline.insert_detections(session_id, rows).result()
+
+
+def export_rows() -> List[tuple]:
+    from app.services.detections import DetectionFilter
+    from app.services.export import EXPORT_COLUMNS, iter_chunks
+
+    return [row for chunk in iter_chunks(DetectionFilter(), EXPORT_COLUMNS) for row in chunk]
+
+
+def stored_rows() -> List[tuple]:
+    """(ts_ms, species, confidence) of every detection, live or archived."""
+    from app.services.detections import DetectionFilter
+    from app.services.export import iter_chunks
+
+    return [row for chunk in iter_chunks(DetectionFilter(), ["ts_ms", "species", "confidence"]) for row in chunk]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the database writer and the rollups it maintains.")
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temporary one)")
+    args = parser.parse_args()
+
+    stubs.isolate(args.workdir)
+    from app.database import get_db_connection, init_db
+    from app.services import archive, rollups
+    from app.services.db_writer import db_writer
+
+    init_db()
+    rng = random.Random(7)
+    now = datetime.now().replace(microsecond=0)
+    # Mostly months old enough to archive, some this month, and a few without a usable time
+    months = [now - timedelta(days=days) for days in (400, 250, 120, 70)] + [now.replace(day=1, hour=0, minute=0, second=0)]
+    uploads = []
+    for i in range(UPLOADS):
+        session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        rows = make_rows(rng, session_id, rng.choice(months) + timedelta(hours=rng.randrange(48)), rng.randrange(40))
+        if i % 10 == 0:
+            rows = [row[:12] + (None,) + row[13:] for row in rows]
+        uploads.append((session_id, rows))
+    inserted = [(row[12], row[3], row[4]) for _, rows in uploads for row in rows]
+
+    def failing_write(conn) -> None:
+        conn.execute("INSERT INTO detections (species, confidence) VALUES ('Must roll back', 0.9)")
+        raise RuntimeError("deliberate failure")
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        done = [executor.submit(upload, session_id, rows) for session_id, rows in uploads]
+        failures = [db_writer.submit(failing_write) for _ in range(FAILING_WRITES)]
+        for future in done:
+            future.result()
+    for future in failures:
+        expect(isinstance(future.exception(), RuntimeError), "a failing write did not report its error")
+
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+    expect(count == len(inserted), f"{count} detections stored, {len(inserted)} inserted")
+    expect(not conn.execute("SELECT 1 FROM detections WHERE species = 'Must roll back'").fetchone(),
+           "a failed write's row was committed")
+    statuses = {row[0] for row in conn.execute("SELECT DISTINCT status FROM sessions")}
+    expect(statuses == {"done"}, f"session statuses after upload: {statuses}")
+    expect_rollups(conn, inserted, "after concurrent uploads")
+    print(f"✍️ {UPLOADS} concurrent uploads, {len(inserted)} rows, {FAILING_WRITES} failed writes rolled back")
+
+    # The newest ids go to an old month, so archiving moves them and MAX(id) drops
+    session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    late = make_rows(rng, session_id, months[0], 25)
+    upload(session_id, late)
+    inserted += [(row[12], row[3], row[4]) for row in late]
+    highest_id = conn.execute("SELECT MAX(id) FROM detections").fetchone()[0]
+
+    before = export_rows()
+    written = archive.archive_detections(older_than_days=0)
+    expect(written, "nothing was archived")
+    archived = sum(partition["rows"] for partition in written)
+    live_max = conn.execute("SELECT COALESCE(MAX(id), 0) FROM detections").fetchone()[0]
+    expect(live_max < highest_id, "the newest detections were not archived")
+    expect(export_rows() == before, "exported rows changed when archived")
+    expect_rollups(conn, inserted, "after archiving")
+    print(f"🧊 {archived} rows archived in {len(written)} partitions, exports and rollups unchanged")
+
+    rollups.rebuild(conn)
+    expect_rollups(conn, stored_rows(), "after a rebuild")
+    expect_rollups(conn, inserted, "after a rebuild")
+
+    # New ids must continue above the archived ones, and the writer must roll up exactly the new rows
+    session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    fresh = make_rows(rng, session_id, now, 30)
+    upload(session_id, fresh)
+    inserted += [(row[12], row[3], row[4]) for row in fresh]
+    new_ids = [row[0] for row in conn.execute("SELECT id FROM detections WHERE session_id = ?", (session_id,))]
+    expect(min(new_ids) > highest_id, f"new detection id {min(new_ids)} reuses an archived id (<= {highest_id})")
+    expect_rollups(conn, inserted, "after inserting above archived ids")
+    rollups.rebuild(conn)
+    expect_rollups(conn, inserted, "after the final rebuild")
+    conn.close()
+    db_writer.stop()
+    print(f"📊 Rollups match {len(inserted)} detections after archiving, rebuilds and new uploads")
+
+
+if __name__ == "__main__":
+    main()
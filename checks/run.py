@@ -0,0 +1,55 @@
+"""
+Smoke Checks - Runs every check in this package plus a one-iteration pipeline benchmark,
+each in its own process against its own scratch database, and exits non-zero if any fails.
+Run it before merging so a change that breaks a check or the benchmark does not go unnoticed.
+
+    python -m checks.run
+    python -m checks.run migrations writer
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, module run with `python -m`, its arguments); {tmp} is a scratch directory
+CHECKS: List[Tuple[str, str, List[str]]] = [
+    ("migrations", "checks.check_migrations", ["--workdir", "{tmp}"]),
+    ("writer", "checks.check_writer", ["--workdir", "{tmp}"]),
+    ("queries", "checks.check_queries", ["--workdir", "{tmp}"]),
+    ("bench_pipeline", "benchmarks.bench_pipeline",
+     ["--seconds", "10", "--repeat", "1", "--uploads", "1", "--output", "{tmp}/bench.json"]),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the smoke checks.")
+    parser.add_argument("names", nargs="*", help="Checks to run (default: all)")
+    args = parser.parse_args()
+
+    selected = [check for check in CHECKS if not args.names or check[0] in args.names]
+    failed = []
+    for name, module, arguments in selected:
+        with tempfile.TemporaryDirectory(prefix="aviannet-check-") as tmp:
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-m", module, *(a.format(tmp=tmp) for a in arguments)],
+                cwd=ROOT, capture_output=True, text=True,
+            )
+        elapsed = time.perf_counter() - start
+        if result.returncode == 0:
+            print(f"✅ {name} ({elapsed:.1f}s)")
+        else:
+            failed.append(name)
+            print(f"❌ {name} ({elapsed:.1f}s)\n{result.stdout[-4000:]}{result.stderr[-4000:]}")
+
+    print(f"{len(selected) - len(failed)}/{len(selected)} checks passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
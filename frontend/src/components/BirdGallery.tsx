@@ -1,29 +1,71 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
-import type { BirdDetection, SpeciesInfo } from '../types/bird';
+import type { BirdDetection, DetectionPage, RecordingSession, SessionPage, SpeciesInfo } from '../types/bird';
 import { Card } from './ui/Card';
 import { Badge } from './ui/Badge';
+import { Button } from './ui/Button';
 import { Calendar, Layers, Grid, Maximize2, Bird, MapPin, X, Clock, Activity } from 'lucide-react';
 import { cn } from '../lib/utils';
 
+const SESSIONS_PAGE = 24;
+const ACTIVITY_PAGE = 100;
+
+// Fresh first page wins; sessions from pages loaded earlier keep their place after it
+function mergeSessions(fresh: RecordingSession[], current: RecordingSession[]) {
+    const ids = new Set(fresh.map(s => s.id));
+    return [...fresh, ...current.filter(s => !ids.has(s.id))];
+}
+
 export function BirdGallery() {
-    const [detections, setDetections] = useState<BirdDetection[]>([]);
+    const [sessions, setSessions] = useState<RecordingSession[]>([]);
+    const [sessionsCursor, setSessionsCursor] = useState<string | null>(null);
     const [speciesList, setSpeciesList] = useState<SpeciesInfo[]>([]);
     const [loading, setLoading] = useState(true);
     const [activeTab, setActiveTab] = useState<'sessions' | 'species'>('sessions');
     const [selectedSpecies, setSelectedSpecies] = useState<SpeciesInfo | null>(null);
+    const [speciesDetections, setSpeciesDetections] = useState<BirdDetection[]>([]);
+    const latestId = useRef<number | null>(null);
+    // Ids and statuses of the first sessions page last shown, to spot uploads that moved on
+    const lastSessions = useRef<string | null>(null);
     const navigate = useNavigate();
 
     useEffect(() => {
+        const sessionsKey = (page: SessionPage) => page.sessions.map(s => `${s.id}:${s.status}`).join(',');
+
+        const showSessions = (page: SessionPage) => {
+            lastSessions.current = sessionsKey(page);
+            setSessions(current => mergeSessions(page.sessions, current));
+            setSessionsCursor(cursor => cursor ?? page.next_cursor);
+        };
+
         const fetchData = async () => {
             try {
-                const [detectionsRes, speciesRes] = await Promise.all([
-                    axios.get('/api/detections'),
-                    axios.get('/api/species-summary')
+                if (latestId.current === null) {
+                    const latest = await axios.get<DetectionPage>('/api/v2/detections', { params: { limit: 1 } });
+                    latestId.current = latest.data.latest_id;
+                    const [sessionsRes, speciesRes] = await Promise.all([
+                        axios.get<SessionPage>('/api/sessions', { params: { limit: SESSIONS_PAGE } }),
+                        axios.get('/api/species-summary')
+                    ]);
+                    showSessions(sessionsRes.data);
+                    setSpeciesList(speciesRes.data);
+                    return;
+                }
+                // Only rows added since the last poll, plus the newest sessions: an upload going
+                // queued -> processing -> done | failed changes them even when it found no birds
+                const [news, sessionsRes] = await Promise.all([
+                    axios.get<DetectionPage>('/api/v2/detections', { params: { since: latestId.current } }),
+                    axios.get<SessionPage>('/api/sessions', { params: { limit: SESSIONS_PAGE } })
                 ]);
-                setDetections(detectionsRes.data);
-                setSpeciesList(speciesRes.data);
+                latestId.current = news.data.latest_id;
+                if (news.data.detections.length || sessionsKey(sessionsRes.data) !== lastSessions.current) {
+                    showSessions(sessionsRes.data);
+                }
+                if (news.data.detections.length) {
+                    const speciesRes = await axios.get('/api/species-summary');
+                    setSpeciesList(speciesRes.data);
+                }
             } catch (error) {
                 console.error("Failed to fetch data:", error);
             } finally {
@@ -36,30 +78,27 @@ export function BirdGallery() {
         return () => clearInterval(interval);
     }, []);
 
-    // Get detections for a specific species (for the modal)
-    const getDetectionsForSpecies = (speciesName: string) => {
-        return detections
-            .filter(d => d.species === speciesName)
-            .sort((a, b) => new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime());
-    };
-
-    // Group by Session (Image URL) Logic
-    const sessionGroups = detections.reduce((acc, bird) => {
-        const key = bird.image_url || 'unknown_session';
-
-        if (!acc[key]) {
-            acc[key] = {
-                masterImage: bird.image_url,
-                startTime: bird.timestamp,
-                detections: []
-            };
+    // Detections of the species shown in the modal
+    useEffect(() => {
+        if (!selectedSpecies) {
+            setSpeciesDetections([]);
+            return;
         }
-        acc[key].detections.push(bird);
-        if (new Date(bird.timestamp) < new Date(acc[key].startTime)) {
-            acc[key].startTime = bird.timestamp;
+        axios.get<DetectionPage>('/api/v2/detections', { params: { species: selectedSpecies.name, limit: ACTIVITY_PAGE } })
+            .then(res => setSpeciesDetections(res.data.detections))
+            .catch(error => console.error("Failed to fetch species detections:", error));
+    }, [selectedSpecies]);
+
+    const loadMoreSessions = async () => {
+        if (!sessionsCursor) return;
+        try {
+            const res = await axios.get<SessionPage>('/api/sessions', { params: { limit: SESSIONS_PAGE, cursor: sessionsCursor } });
+            setSessions(current => mergeSessions(current, res.data.sessions));
+            setSessionsCursor(res.data.next_cursor);
+        } catch (error) {
+            console.error("Failed to fetch sessions:", error);
         }
-        return acc;
-    }, {} as Record<string, { masterImage: string; startTime: string; detections: BirdDetection[] }>);
+    };
 
     if (loading) {
         return (
@@ -111,7 +150,7 @@ export function BirdGallery() {
                 </div>
 
                 {/* Content */}
-                {detections.length === 0 ? (
+                {sessions.length === 0 ? (
                     <div className="text-center py-20 bg-white border-3 border-dashed border-ink-black rounded-2xl">
                         <Bird className="w-16 h-16 mx-auto text-ink-gray mb-4" />
                         <p className="text-2xl font-display text-ink-black">No birds detected yet.</p>
@@ -120,20 +159,24 @@ export function BirdGallery() {
                 ) : (
                     <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-8">
                         {/* SESSIONS VIEW */}
-                        {activeTab === 'sessions' && Object.entries(sessionGroups)
-                            .sort(([, a], [, b]) => new Date(b.startTime).getTime() - new Date(a.startTime).getTime())
-                            .map(([key, session]) => (
-                                <div key={key}>
+                        {activeTab === 'sessions' && sessions.map((session) => (
+                                <div key={session.id}>
                                     <Card
                                         className="h-full flex flex-col cursor-pointer"
-                                        onClick={() => navigate(`/session/${encodeURIComponent(session.masterImage)}`)}
+                                        onClick={() => navigate(`/session/${session.id}`)}
                                     >
                                         <div className="relative aspect-video bg-ink-black overflow-hidden mb-4 rounded-lg border-2 border-ink-black">
-                                            <img
-                                                src={session.masterImage || session.detections[0].single_image_url}
-                                                alt="Session Spectrogram"
-                                                className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-110"
-                                            />
+                                            {session.image_url ? (
+                                                <img
+                                                    src={session.image_url}
+                                                    alt="Session Spectrogram"
+                                                    className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-110"
+                                                />
+                                            ) : (
+                                                <div className="w-full h-full flex items-center justify-center text-white/70 font-bold uppercase tracking-wider text-sm">
+                                                    {session.status}
+                                                </div>
+                                            )}
                                             <div className="absolute inset-0 bg-ink-black/60 opacity-0 group-hover:opacity-100 transition-opacity flex items-center justify-center pointer-events-none">
                                                 <div className="flex items-center gap-2 text-white font-bold bg-sun-yellow text-ink-black px-4 py-2 rounded-lg border-2 border-ink-black">
                                                     <Maximize2 className="w-5 h-5" />
@@ -142,7 +185,7 @@ export function BirdGallery() {
                                             </div>
                                             <div className="absolute top-3 right-3">
                                                 <Badge variant="warning">
-                                                    {session.detections.length} Detections
+                                                    {session.detection_count ?? 0} Detections
                                                 </Badge>
                                             </div>
                                         </div>
@@ -152,15 +195,15 @@ export function BirdGallery() {
                                             <div className="space-y-2 text-sm text-ink-gray font-body">
                                                 <div className="flex items-center gap-2">
                                                     <Calendar className="w-4 h-4 text-coastal-blue" />
-                                                    <span>{new Date(session.startTime).toLocaleString()}</span>
+                                                    <span>{new Date(session.recorded_at).toLocaleString()}</span>
                                                 </div>
                                                 <div className="flex flex-wrap gap-1 mt-2">
-                                                    {Array.from(new Set(session.detections.map(d => d.species))).slice(0, 3).map(species => (
+                                                    {(session.species ?? []).slice(0, 3).map(species => (
                                                         <span key={species} className="text-xs bg-coastal-blue/10 text-coastal-blue font-bold px-2 py-1 rounded-full border border-coastal-blue/30">
                                                             {species}
                                                         </span>
                                                     ))}
-                                                    {new Set(session.detections.map(d => d.species)).size > 3 && (
+                                                    {(session.species ?? []).length > 3 && (
                                                         <span className="text-xs text-ink-gray px-2 py-1">+more</span>
                                                     )}
                                                 </div>
@@ -197,6 +240,14 @@ export function BirdGallery() {
                         ))}
                     </div>
                 )}
+
+                {activeTab === 'sessions' && sessionsCursor && (
+                    <div className="mt-10 flex justify-center">
+                        <Button variant="outline" onClick={loadMoreSessions}>
+                            Load more sessions
+                        </Button>
+                    </div>
+                )}
             </div>
 
             {/* SPECIES DETAIL MODAL */}
@@ -287,7 +338,7 @@ export function BirdGallery() {
                                             Activity Log
                                         </h3>
                                         <div className="space-y-3 max-h-[300px] overflow-y-auto">
-                                            {getDetectionsForSpecies(selectedSpecies.name).map((detection, idx) => (
+                                            {speciesDetections.map((detection, idx) => (
                                                 <div key={detection.id || idx} className="flex items-start gap-3 p-3 bg-sand-light rounded-lg border border-ink-black/10">
                                                     <div className="p-2 bg-coastal-blue/10 rounded-lg">
                                                         <Clock className="w-4 h-4 text-coastal-blue" />
@@ -2,42 +2,44 @@ import { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { ArrowLeft, Calendar, MapPin, Music, Grid, X, Maximize2 } from 'lucide-react';
-import type { BirdDetection } from '../types/bird';
+import type { BirdDetection, RecordingSession } from '../types/bird';
 import { Card } from './ui/Card';
 import { Badge } from './ui/Badge';
 import { Button } from './ui/Button';
+import { SpectrogramTiles } from './SpectrogramTiles';
 
 export function SessionDetail() {
   const { sessionId } = useParams<{ sessionId: string }>();
   const navigate = useNavigate();
+  const [session, setSession] = useState<RecordingSession | null>(null);
   const [sessionDetections, setSessionDetections] = useState<BirdDetection[]>([]);
   const [loading, setLoading] = useState(true);
   const [selectedBird, setSelectedBird] = useState<BirdDetection | null>(null);
 
-  // Decode session ID (which is the image_url)
-  const masterImageUrl = sessionId ? decodeURIComponent(sessionId) : '';
+  // The route param is the upload uuid, or the master image_url in older links
+  // e.g. /storage/<uuid>.png -> <uuid>
+  const uploadId = sessionId ? decodeURIComponent(sessionId).split('/').pop()?.split('.')[0] ?? '' : '';
 
   useEffect(() => {
-    const fetchDetections = async () => {
+    const fetchSession = async () => {
       try {
-        // Ideally, we'd have an API endpoint like /api/sessions/:id
-        // But for now we fetch all and filter client-side as per plan
-        const response = await axios.get('/api/detections');
-        const data: BirdDetection[] = response.data;
-
-        if (masterImageUrl) {
-          const filtered = data.filter(d => d.image_url === masterImageUrl);
-          setSessionDetections(filtered);
-        }
+        const response = await axios.get(`/api/sessions/${uploadId}`);
+        const data: RecordingSession = response.data;
+        setSession(data);
+        setSessionDetections(data.detections ?? []);
       } catch (error) {
-        console.error("Failed to fetch detections:", error);
+        console.error("Failed to fetch session:", error);
       } finally {
         setLoading(false);
       }
     };
 
-    fetchDetections();
-  }, [masterImageUrl]);
+    if (uploadId) {
+      fetchSession();
+    } else {
+      setLoading(false);
+    }
+  }, [uploadId]);
 
   if (loading) {
     return (
@@ -47,7 +49,7 @@ export function SessionDetail() {
     );
   }
 
-  if (!sessionDetections.length) {
+  if (!session) {
     return (
       <div className="max-w-7xl mx-auto px-6 py-20 text-center">
         <h2 className="text-2xl font-bold text-slate-700">Session Not Found</h2>
@@ -56,10 +58,9 @@ export function SessionDetail() {
     );
   }
 
-  // Determine session start time (earliest detection)
-  const startTime = sessionDetections.reduce((earliest, current) => {
-    return new Date(current.timestamp) < new Date(earliest) ? current.timestamp : earliest;
-  }, sessionDetections[0].timestamp);
+  const startTime = session.recorded_at;
+  const masterImageUrl = session.image_url;
+  const audioUrl = session.audio_url;
 
   return (
     <section className="max-w-7xl mx-auto px-6 py-12 animate-in fade-in duration-500">
@@ -90,16 +91,11 @@ export function SessionDetail() {
           </div>
         </div>
 
-        <div className="bg-black rounded-xl overflow-hidden shadow-2xl border-4 border-white ring-1 ring-slate-200">
-          <img
-            src={masterImageUrl}
-            alt="Full Session Spectrogram"
-            className="w-full h-auto max-h-[500px] object-contain mx-auto"
-          />
-        </div>
+        {/* Level 0 of the tile pyramid is the overview; zooming in loads only the visible tiles */}
+        {uploadId && <SpectrogramTiles sessionId={uploadId} fallbackImageUrl={masterImageUrl} />}
 
         {/* Full-Length Audio Player */}
-        {sessionDetections.length > 0 && sessionDetections[0].audio_url && (
+        {audioUrl && (
           <div className="mt-6 bg-slate-100 rounded-xl p-6 border border-slate-200">
             <div className="flex items-center gap-3 mb-4">
               <div className="p-2 bg-kingfisher-royal rounded-lg text-white">
@@ -115,7 +111,7 @@ export function SessionDetail() {
               </div>
             </div>
             <audio controls className="w-full rounded-lg">
-              <source src={sessionDetections[0].audio_url} type="audio/wav" />
+              <source src={audioUrl} type="audio/wav" />
               Your browser does not support the audio element.
             </audio>
           </div>
@@ -0,0 +1,102 @@
+import { useEffect, useState } from 'react';
+import axios from 'axios';
+import { ZoomIn, ZoomOut } from 'lucide-react';
+import { Button } from './ui/Button';
+
+interface TileLevel {
+  zoom: number;
+  tiles: number;
+  seconds_per_tile: number;
+}
+
+interface TileInfo {
+  tile_width: number;
+  tile_height: number;
+  duration: number;
+  max_zoom: number;
+  levels: TileLevel[];
+  format: string;
+  detections: { species: string; start_time: number; end_time: number }[];
+}
+
+interface SpectrogramTilesProps {
+  sessionId: string;
+  // Shown instead when the session has no tile pyramid (recordings without a mel sidecar)
+  fallbackImageUrl?: string | null;
+}
+
+// Zoomable session spectrogram built from /api/sessions/:id/tiles/:z/:x
+export function SpectrogramTiles({ sessionId, fallbackImageUrl }: SpectrogramTilesProps) {
+  const [info, setInfo] = useState<TileInfo | null>(null);
+  const [unavailable, setUnavailable] = useState(false);
+  const [zoom, setZoom] = useState(0);
+
+  useEffect(() => {
+    setInfo(null);
+    setUnavailable(false);
+    setZoom(0);
+    axios.get(`/api/sessions/${sessionId}/tiles`)
+      .then(response => setInfo(response.data))
+      .catch(error => {
+        console.error("Failed to fetch spectrogram tiles:", error);
+        setUnavailable(true);
+      });
+  }, [sessionId]);
+
+  if (unavailable && fallbackImageUrl) {
+    return (
+      <div className="bg-black rounded-xl overflow-hidden shadow-2xl border-4 border-white ring-1 ring-slate-200">
+        <img
+          src={fallbackImageUrl}
+          alt="Full Session Spectrogram"
+          className="w-full h-auto max-h-[500px] object-contain mx-auto"
+        />
+      </div>
+    );
+  }
+
+  if (!info) return null;
+
+  const level = info.levels[zoom];
+  const pixelsPerSecond = info.tile_width / level.seconds_per_tile;
+  const width = Math.ceil(info.duration * pixelsPerSecond);
+
+  return (
+    <div>
+      <div className="flex items-center justify-end gap-2 mb-2">
+        <span className="text-sm text-slate-500">Zoom {zoom}/{info.max_zoom}</span>
+        <Button variant="outline" size="sm" onClick={() => setZoom(zoom - 1)} disabled={zoom === 0}>
+          <ZoomOut className="w-4 h-4" />
+        </Button>
+        <Button variant="outline" size="sm" onClick={() => setZoom(zoom + 1)} disabled={zoom === info.max_zoom}>
+          <ZoomIn className="w-4 h-4" />
+        </Button>
+      </div>
+
+      <div className="bg-black rounded-xl overflow-x-auto shadow-2xl border-4 border-white ring-1 ring-slate-200">
+        <div className="relative" style={{ width, height: info.tile_height }}>
+          {Array.from({ length: level.tiles }, (_, x) => (
+            <img
+              key={`${zoom}-${x}`}
+              src={`/api/sessions/${sessionId}/tiles/${zoom}/${x}.${info.format}`}
+              alt=""
+              loading="lazy"
+              className="absolute top-0 max-w-none"
+              style={{ left: x * info.tile_width, width: info.tile_width, height: info.tile_height }}
+            />
+          ))}
+          {info.detections.map((d, idx) => (
+            <div
+              key={idx}
+              title={d.species}
+              className="absolute top-0 h-full border-2 border-red-500 bg-red-500/10"
+              style={{ left: d.start_time * pixelsPerSecond, width: (d.end_time - d.start_time) * pixelsPerSecond }}
+            >
+              <span className="absolute top-1 left-1 text-xs font-bold text-white drop-shadow">{d.species}</span>
+            </div>
+          ))}
+        </div>
+      </div>
+    </div>
+  );
+}
@@ -10,6 +10,26 @@ export interface BirdDetection {
     image_url: string;
     single_image_url: string;
     bird_photo_url: string | null;
+    start_time: number | null;
+    end_time: number | null;
+    session_id: string | null;
+}
+
+export interface RecordingSession {
+    id: string;
+    device: string | null;
+    recorded_at: string;
+    recorded_at_ms: number;
+    lat: number | null;
+    lon: number | null;
+    duration: number | null;
+    audio_url: string;
+    image_url: string | null;
+    status: 'queued' | 'processing' | 'done' | 'failed';
+    created_at: string;
+    detection_count?: number;
+    species?: string[];
+    detections?: BirdDetection[];
 }
 
 export interface SpeciesInfo {
@@ -25,3 +45,14 @@ export interface SpeciesInfo {
     habitat: string | null;
     conservation_status: string | null;
 }
+
+export interface DetectionPage {
+    detections: BirdDetection[];
+    next_cursor: string | null;
+    latest_id: number;
+}
+
+export interface SessionPage {
+    sessions: RecordingSession[];
+    next_cursor: string | null;
+}